@@ -0,0 +1,186 @@
+"""Running analytics of a match: worm, Manhattan, run rates, projections and phase splits.
+
+Match keeps an InningsAnalytics for each innings up to date as balls are
+added, so what the displays show costs the same to produce at the last ball
+as at the first, instead of every screen walking every over on every update.
+Rewinds need nothing extra: they restore the analytics along with the rest
+of the match state. Undoing the latest balls takes them back out with
+remove_ball(). Bulk replays count them once at the end with from_overs().
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+PHASES = ("powerplay", "middle", "death")
+# Run rates a first innings total is projected at, besides the current one
+PROJECTION_RATES = (6, 8, 10, 12)
+# Deliveries listed in recent_balls
+RECENT_BALLS = 12
+
+def phase_bounds(total_overs: int) -> Tuple[int, int]:
+    """Last powerplay over and last middle over for a format"""
+    if total_overs == 20:
+        return 6, 15
+    if total_overs == 50:
+        return 10, 40
+    powerplay = max(1, round(total_overs * 0.3))
+    death_overs = max(1, round(total_overs * 0.25))
+    return powerplay, max(powerplay, total_overs - death_overs)
+
+def phase_index(over_number: int, bounds: Tuple[int, int]) -> int:
+    """Index into PHASES of an over (numbered from 1)"""
+    powerplay_end, middle_end = bounds
+    return 0 if over_number <= powerplay_end else 1 if over_number <= middle_end else 2
+
+def recent_entry(over_number: int, ball) -> Dict[str, Any]:
+    """How a delivery is listed in recent_balls"""
+    return {
+        "over": over_number,
+        "runs": ball.runs,
+        "extra_type": ball.extra_type.value if ball.extra_type else None,
+        "extra_runs": ball.extra_runs,
+        "is_wicket": ball.is_wicket
+    }
+
+class InningsAnalytics:
+    """Per-over and per-phase figures of one innings"""
+    
+    def __init__(self, number: int, total_overs: int):
+        self.number = number
+        self.bounds = phase_bounds(total_overs)
+        # Runs and wickets in each over, and the total after each (the last over may be in progress)
+        self.manhattan: List[int] = []
+        self.wickets: List[int] = []
+        self.worm: List[int] = []
+        # [runs, wickets, legal balls] in each of PHASES
+        self.phases: List[List[int]] = [[0, 0, 0] for _ in PHASES]
+        # The latest deliveries, oldest first
+        self.recent: List[Dict[str, Any]] = []
+    
+    def add_ball(self, over_number: int, ball):
+        """Count a delivery just added to an over"""
+        while len(self.manhattan) < over_number:
+            self.manhattan.append(0)
+            self.wickets.append(0)
+            self.worm.append(self.worm[-1] if self.worm else 0)
+        runs = ball.total_runs
+        wicket = 1 if ball.is_wicket else 0
+        index = over_number - 1
+        self.manhattan[index] += runs
+        self.wickets[index] += wicket
+        self.worm[index] += runs
+        phase = self.phases[phase_index(over_number, self.bounds)]
+        phase[0] += runs
+        phase[1] += wicket
+        phase[2] += 1 if ball.is_legal_delivery else 0
+        self.recent.append(recent_entry(over_number, ball))
+        if len(self.recent) > RECENT_BALLS:
+            del self.recent[0]
+    
+    def remove_ball(self, over_number: int, ball, over_emptied: bool, earlier: Optional[Tuple[int, Any]] = None):
+        """Take back the last delivery counted, from an over now left with no balls if over_emptied.
+        
+        earlier is the (over number, ball) that becomes the oldest of the recent
+        balls again, if the innings has had more than RECENT_BALLS deliveries.
+        """
+        runs = ball.total_runs
+        wicket = 1 if ball.is_wicket else 0
+        index = over_number - 1
+        if over_emptied:
+            del self.manhattan[index:], self.wickets[index:], self.worm[index:]
+        else:
+            self.manhattan[index] -= runs
+            self.wickets[index] -= wicket
+            self.worm[index] -= runs
+        phase = self.phases[phase_index(over_number, self.bounds)]
+        phase[0] -= runs
+        phase[1] -= wicket
+        phase[2] -= 1 if ball.is_legal_delivery else 0
+        del self.recent[-1]
+        if earlier:
+            self.recent.insert(0, recent_entry(*earlier))
+    
+    @classmethod
+    def from_overs(cls, number: int, total_overs: int, overs) -> 'InningsAnalytics':
+        """The figures add_ball() would have reached over an innings' overs, from their running totals"""
+        analytics = cls(number, total_overs)
+        for over in overs:
+            if not over.balls:
+                continue
+            while len(analytics.manhattan) < over.over_number:
+                analytics.manhattan.append(0)
+                analytics.wickets.append(0)
+                analytics.worm.append(analytics.worm[-1] if analytics.worm else 0)
+            index = over.over_number - 1
+            analytics.manhattan[index] += over.runs
+            analytics.wickets[index] += over.wickets
+            analytics.worm[index] += over.runs
+            phase = analytics.phases[phase_index(over.over_number, analytics.bounds)]
+            phase[0] += over.runs
+            phase[1] += over.wickets
+            phase[2] += over.legal_balls
+        for over in reversed(overs):
+            for ball in reversed(over.balls):
+                if len(analytics.recent) == RECENT_BALLS:
+                    break
+                analytics.recent.append(recent_entry(over.over_number, ball))
+        analytics.recent.reverse()
+        return analytics
+    
+    def copy(self) -> 'InningsAnalytics':
+        """Copy that adding balls to won't change this one"""
+        copy = object.__new__(InningsAnalytics)
+        copy.__dict__ = self.__dict__.copy()
+        copy.manhattan = list(self.manhattan)
+        copy.wickets = list(self.wickets)
+        copy.worm = list(self.worm)
+        copy.phases = [list(phase) for phase in self.phases]
+        # The ball dicts themselves are never changed
+        copy.recent = list(self.recent)
+        return copy
+    
+    def phase_data(self) -> Dict[str, Dict[str, int]]:
+        return {name: {"runs": runs, "wickets": wickets, "balls": balls}
+                for name, (runs, wickets, balls) in zip(PHASES, self.phases)}
+    
+    def data(self) -> Dict[str, Any]:
+        return {
+            "number": self.number,
+            "manhattan": list(self.manhattan),
+            "wickets": list(self.wickets),
+            "worm": list(self.worm),
+            "phases": self.phase_data(),
+            "recent_balls": list(self.recent)
+        }
+    
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], total_overs: int) -> 'InningsAnalytics':
+        analytics = cls(data["number"], total_overs)
+        analytics.manhattan = list(data["manhattan"])
+        analytics.wickets = list(data["wickets"])
+        analytics.worm = list(data["worm"])
+        analytics.phases = [[data["phases"][name][key] for key in ("runs", "wickets", "balls")] for name in PHASES]
+        analytics.recent = list(data["recent_balls"])
+        return analytics
+
+def live_figures(innings: InningsAnalytics, runs: int, balls_bowled: int, total_overs: int,
+                 target: Optional[int]) -> Dict[str, Any]:
+    """Run rates, balls left and projections (or what is needed, with a target) for the innings in progress"""
+    balls_remaining = max(total_overs * 6 - balls_bowled, 0)
+    run_rate = runs * 6 / balls_bowled if balls_bowled else 0.0
+    figures = {
+        "innings": innings.number,
+        "balls_bowled": balls_bowled,
+        "balls_remaining": balls_remaining,
+        "current_run_rate": round(run_rate, 2),
+        "last_over_runs": innings.manhattan[-1] if innings.manhattan else 0,
+        "phases": innings.phase_data(),
+        "recent_balls": list(innings.recent)
+    }
+    if target is None:
+        figures["projected_total"] = runs + round(run_rate * balls_remaining / 6)
+        figures["projections"] = [[rate, runs + round(rate * balls_remaining / 6)] for rate in PROJECTION_RATES]
+    else:
+        needed = max(target - runs, 0)
+        figures["target"] = target
+        figures["runs_needed"] = needed
+        figures["required_run_rate"] = round(needed * 6 / balls_remaining, 2) if balls_remaining else None
+    return figures
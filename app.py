@@ -1,20 +1,50 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit
+# Must come first: in gevent mode it patches the standard library
+import concurrency
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
+import atexit
 import os
 import json
-import uuid
+import threading
 from werkzeug.utils import secure_filename
-from models import Match, WicketType, ExtraType
+from models import Match, WicketType, ExtraType, diff_status, read_innings_file
+from registry import MatchRegistry, LiveMatch, MatchOwnedElsewhere
+from cluster import Cluster, make_client_manager, serve, ANNOUNCE_INTERVAL
+from catalog import MatchCatalog
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
 from typing import Optional
+import fastjson
+import flags
+import metrics
+import stats
+import statusfeed
+import winprob
+import wire
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'cricket_scoring_secret_key'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'static/uploads/flags'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Set by cluster.py when this is one of several worker processes sharing a port
+client_manager = make_client_manager(os.environ.get('CRICKET_MESSAGE_QUEUE'))
+# A WebSocket session is one TCP connection, so it stays on the worker that
+# accepted it; long-polling requests could land on any worker
+SOCKET_TRANSPORTS = ['websocket'] if client_manager else ['polling', 'websocket']
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=concurrency.ASYNC_MODE, json=fastjson.SocketIOJSON,
+                    client_manager=client_manager, transports=SOCKET_TRANSPORTS)
+# The other worker processes, if any
+cluster = Cluster(client_manager)
 
-# Create upload directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Uploaded flags, stored by content hash and served from /flags/
+flag_store = flags.FlagStore(app.config['UPLOAD_FOLDER'])
+flag_store.import_legacy()
+if flags.Image is None:
+    print("Warning: Pillow is not installed, so uploaded flags are stored without resized copies "
+          "(pip install -r requirements.txt)")
+# Stored flags never change, so browsers and proxies may keep them for a year
+FLAG_MAX_AGE = 365 * 24 * 3600
 
 # Allowed file extensions for flags
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg'}
@@ -23,8 +53,232 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Global match instance
-current_match: Optional[Match] = None
+# Index of saved matches, picking up any files added to data/ while we were down
+catalog = MatchCatalog()
+catalog.sync()
+
+# Live matches, one per ground, each broadcasting to its own Socket.IO room
+registry = MatchRegistry(catalog=catalog)
+# Write out changes still waiting for the background persister
+atexit.register(registry.close)
+
+def close_inherited_match_locks():
+    """Worker pool initializer; a module function so spawned processes can find it too"""
+    registry.close_inherited_locks()
+
+def new_worker_pool() -> ProcessPoolExecutor:
+    """A pool of one worker process, which drops the match locks it inherits when it is forked"""
+    return ProcessPoolExecutor(max_workers=1, initializer=close_inherited_match_locks)
+
+# Statistics run in a separate process that keeps the loaded archive cached,
+# so a large data/ directory never stalls the Socket.IO server
+stats_pool = new_worker_pool()
+STATS_TIMEOUT = 60
+# Held while replacing a stats pool whose process died
+stats_pool_lock = threading.Lock()
+
+# Latest broadcast status of every live match, for the HTTP read path
+status_feed = statusfeed.StatusFeed()
+
+def publish_win_probability(estimate):
+    cluster.publish('win_probability', match_id=estimate['match_id'], estimate=estimate)
+
+# Win probability is simulated in a process of its own, so estimates never wait
+# behind a stats query; each one goes out as a win_probability event. The
+# process is started with the server (see __main__), not on import
+win_probability = winprob.WinProbabilityWorker(new_worker_pool, publish_win_probability)
+
+def get_live_match(data) -> Optional[LiveMatch]:
+    """Resolve the live match a socket event refers to by its match_id"""
+    return registry.get((data or {}).get('match_id'))
+
+def latest_match_id() -> Optional[str]:
+    """The most recently active match in any worker"""
+    entry = registry.latest()
+    candidates = [(remote.last_active, match_id) for match_id, remote in cluster.remote_matches().items()]
+    if entry:
+        candidates.append((entry.last_active, entry.match.id))
+    return max(candidates)[1] if candidates else None
+
+def broadcast_match_update(entry: LiveMatch, full: bool = False):
+    """Broadcast a match to its room, as a match_delta when clients already hold this match.
+    
+    Runs on the match's writer thread so broadcasts go out in version order.
+    """
+    entry.touch()
+    status = entry.match.get_current_status()
+    if not full and entry.last_broadcast_status:
+        delta = diff_status(entry.last_broadcast_status, status)
+        overs_changed = delta['overs_from'] < max(len(status['overs']), len(entry.last_broadcast_status['overs']))
+        if not (delta['changes'].keys() - {'version'} or delta['players'] or overs_changed):
+            # Nothing visible changed (e.g. a rejected undo), keep the old base
+            return
+        with metrics.BROADCAST_SECONDS.time('delta'):
+            emit_to_match(entry, 'match_delta', delta, status)
+    else:
+        with metrics.BROADCAST_SECONDS.time('full'):
+            emit_to_match(entry, 'match_update', status, status)
+    entry.last_broadcast_status = status
+
+def emit_to_match(entry: LiveMatch, event: str, payload, status):
+    """Emit a match payload to every client of a match, in every worker"""
+    cluster.publish('match_update', match_id=entry.match.id, event=event, payload=payload,
+                    status=status, last_active=entry.last_active)
+
+@cluster.on('match_update')
+def deliver_match_update(message):
+    """Send a match payload to this worker's clients of the match, encoded once per wire format in use"""
+    cluster.remember(message)
+    match_id, event, payload = message['match_id'], message['event'], message['payload']
+    status_feed.publish(match_id, message['status'])
+    socketio.emit(event, payload, to=match_id, ignore_queue=True)
+    for wire_format in wire.variants():
+        room = wire.room(match_id, wire_format)
+        if wire_format.is_binary and room_has_clients(room):
+            socketio.emit(event, wire.encode(payload, wire_format), to=room, ignore_queue=True)
+
+@cluster.on('win_probability')
+def deliver_win_probability(message):
+    """Send an estimate to this worker's clients of the match; it is small enough to go as JSON in every format"""
+    match_id = message['match_id']
+    for room in {wire.room(match_id, wire_format) for wire_format in wire.variants()}:
+        if room_has_clients(room):
+            socketio.emit('win_probability', message['estimate'], to=room, ignore_queue=True)
+
+def room_has_clients(room: str) -> bool:
+    try:
+        return next(socketio.server.manager.get_participants('/', room), None) is not None
+    except KeyError:
+        # No client has connected to this worker yet
+        return False
+
+def emit_match(event: str, payload):
+    """Emit a match payload to the requesting client in its wire format"""
+    emit(event, wire.encode(payload, client_wire_format()))
+
+def client_wire_format() -> wire.WireFormat:
+    """Wire format of the requesting client (forwarded events bring it from the client's worker)"""
+    return getattr(request, 'wire_format', None) or client_wire_formats.get(request.sid, wire.DEFAULT)
+
+def execute_command(entry: LiveMatch, command):
+    """Apply command(match) on the match's writer thread, broadcast, and return its result"""
+    def apply():
+        was_finished = entry.match.is_finished
+        innings_over = len(entry.match.completed_innings)
+        result = command(entry.match)
+        broadcast_match_update(entry)
+        # Written in the background; a result is snapshotted straight away so the catalog
+        # shows it, and so is a finished innings so other workers can serve its file
+        registry.mark_dirty(entry, urgent=(entry.match.is_finished and not was_finished)
+                            or len(entry.match.completed_innings) > innings_over)
+        win_probability.request(entry.match)
+        return result
+    return entry.run(apply)
+
+def read_status(entry: LiveMatch):
+    """Full match status, read on the writer thread so it never sees a half-applied ball"""
+    return entry.run(entry.match.get_current_status)
+
+def join_match_room(match_id: str):
+    """Move the requesting client into a match's room, leaving any other match room"""
+    if not socketio.server.manager.is_connected(request.sid, '/'):
+        # Forwarded from the client's own worker, which has moved it already
+        return
+    for room in rooms():
+        if room != request.sid:
+            leave_room(room)
+    join_room(wire.room(match_id, client_wire_format()))
+
+def socket_event(event: str, forward: bool = False):
+    """socketio.on() that also records the handler's latency.
+    
+    With forward, an event naming a match that is live in another worker
+    process is passed on to that worker and handled there.
+    """
+    def decorator(handler):
+        handler = metrics.timed(metrics.SOCKET_HANDLER_SECONDS, event)(handler)
+        if not forward:
+            return socketio.on(event)(handler)
+        forwarded_handlers[event] = handler
+        
+        @wraps(handler)
+        def handle(data=None):
+            match_id = (data or {}).get('match_id')
+            if match_id and not registry.get(match_id) and match_id in cluster.remote_matches():
+                forward_event(event, data)
+                return
+            return handler(data)
+        return socketio.on(event)(handle)
+    return decorator
+
+# Handlers that run events forwarded by other workers, by event name
+forwarded_handlers = {}
+
+def forward_event(event: str, data):
+    """Pass the requesting client's event to the worker that owns its match"""
+    # The client's room membership lives here, in the worker holding its connection
+    join_match_room(data['match_id'])
+    cluster.publish('event', match_id=data['match_id'], event=event, data=data,
+                    sid=request.sid, wire_format=tuple(client_wire_format()))
+
+@cluster.on('event')
+def handle_forwarded_event(message):
+    """Run an event forwarded by another worker if this one owns its match"""
+    if not registry.get(message['match_id']):
+        return
+    # The same request state Flask-SocketIO sets up for its handlers; emits go
+    # back to the client through the message queue
+    with app.test_request_context('/socket.io/'):
+        request.sid = message['sid']
+        request.namespace = '/'
+        request.event = {'message': message['event'], 'args': (message['data'],)}
+        request.wire_format = wire.WireFormat(*message['wire_format'])
+        forwarded_handlers[message['event']](message['data'])
+
+def announce_live_matches():
+    """Tell the other workers which matches this one owns"""
+    for entry in registry.live_matches():
+        status = entry.last_broadcast_status
+        if status:
+            cluster.publish('match_live', match_id=entry.match.id, status=status, last_active=entry.last_active)
+
+def evict_finished_matches():
+    for match_id in registry.evict_finished():
+        win_probability.forget(match_id)
+        cluster.publish('match_closed', match_id=match_id)
+
+@cluster.on('hello')
+def handle_hello(message):
+    """A worker has started, tell it about our matches"""
+    if message['worker_id'] != cluster.worker_id:
+        announce_live_matches()
+
+@cluster.on('match_live')
+def handle_match_live(message):
+    cluster.remember(message)
+    status_feed.publish(message['match_id'], message['status'])
+
+@cluster.on('match_closed')
+def handle_match_closed(message):
+    cluster.forget(message['match_id'])
+    status_feed.close(message['match_id'])
+
+def emit_error(message: str, kind: str = 'rejected'):
+    """Send an error to the requesting client, counted per event and kind (rejected or exception)"""
+    metrics.SOCKET_HANDLER_ERRORS.inc(request.event['message'], kind)
+    emit('error', {'message': message})
+
+# Socket.IO client id -> page it was opened from, for the per-page client gauge
+client_pages = {}
+# Socket.IO client id -> wire format it asked for match payloads in
+client_wire_formats = {}
+
+# Registry state, read at scrape time
+metrics.Gauge("cricket_live_matches", "Matches held in memory",
+              callback=lambda: {(): len(registry.live_matches())})
+metrics.Gauge("cricket_unsnapshotted_commands", "Commands applied in memory but not yet in the match snapshot",
+              ["match_id"], callback=lambda: {(lag['match_id'],): lag['unsnapshotted_commands']
+                                              for lag in registry.persister.lag()})
 
 @app.route('/')
 def index():
@@ -34,32 +288,235 @@ def index():
 @app.route('/control')
 def control():
     """Match control panel"""
-    return render_template('control.html')
+    return render_template('control.html', socket_transports=SOCKET_TRANSPORTS)
 
 @app.route('/display')
 def display():
     """Live match display dashboard"""
-    return render_template('display.html')
+    return render_template('display.html', socket_transports=SOCKET_TRANSPORTS)
 
 # API Routes
 @app.route('/api/matches')
 def get_saved_matches():
-    """Get list of saved matches"""
-    matches = []
-    if os.path.exists('data'):
-        for filename in os.listdir('data'):
-            if filename.startswith('match_') and filename.endswith('.json'):
-                match_id = filename[6:-5]  # Remove 'match_' and '.json'
-                matches.append({'id': match_id, 'filename': filename})
-    return jsonify(matches)
+    """Get a page of saved matches, newest first by default.
+    
+    Query parameters: team, from/to (YYYY-MM-DD), finished (1/0),
+    sort (date, team1, team2, overs; prefix "-" for descending), page, per_page.
+    The total number of matching matches is returned in X-Total-Count.
+    """
+    try:
+        finished = request.args.get('finished')
+        matches, total = catalog.query(
+            team=request.args.get('team'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            finished=None if finished is None else finished in ('1', 'true'),
+            sort=request.args.get('sort', '-date'),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(matches)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+def status_snapshot(match_id: Optional[str]) -> Optional[statusfeed.StatusSnapshot]:
+    """Latest broadcast status of a match live in any worker"""
+    entry = registry.get(match_id)
+    remote = cluster.remote_matches().get(match_id)
+    if not entry and not remote:
+        return None
+    snapshot = status_feed.latest(match_id)
+    if snapshot:
+        return snapshot
+    # Not broadcast since this worker started
+    return status_feed.publish(match_id, read_status(entry) if entry else remote.status)
 
 @app.route('/api/match/status')
 def get_match_status():
-    """Get current match status"""
-    global current_match
-    if current_match:
-        return jsonify(current_match.get_current_status())
-    return jsonify({'error': 'No active match'})
+    """Get status of a live match (the most recently active one if no match_id is given).
+    
+    Answers If-None-Match with 304 while the match version is unchanged. With
+    ?wait=<seconds> the request is held until the match moves past the
+    version the client has (?since=<version> or its ETag).
+    """
+    match_id = request.args.get('match_id') or latest_match_id()
+    snapshot = status_snapshot(match_id)
+    if not snapshot:
+        return jsonify({'error': 'No active match'})
+    wait = min(request.args.get('wait', 0, type=float), statusfeed.MAX_WAIT)
+    if wait <= 0:
+        return statusfeed.status_response(snapshot, request)
+    since = statusfeed.held_version(request, match_id)
+    if since is not None:
+        snapshot = status_feed.wait(match_id, since, wait) or snapshot
+    return statusfeed.status_response(snapshot, request, cacheable=False)
+
+@app.route('/api/match/events')
+def get_match_events():
+    """Server-Sent Events stream of a live match's status, for clients without Socket.IO"""
+    match_id = request.args.get('match_id') or latest_match_id()
+    snapshot = status_snapshot(match_id)
+    if not snapshot:
+        return jsonify({'error': 'No active match'}), 404
+    last_version = request.headers.get('Last-Event-ID', type=int)
+    response = Response(statusfeed.event_stream(status_feed, snapshot, last_version), mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    # Stop nginx buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/match/innings/<int:number>')
+def get_match_innings(number):
+    """Overs, partnerships and fall of wickets of a completed innings (of the most recently active match if no match_id is given).
+    
+    The live status only carries the current innings. A completed innings
+    only changes if the scorer undoes back into it, so clients revalidate it
+    with its ETag rather than fetching it again.
+    """
+    match_id = request.args.get('match_id') or latest_match_id()
+    if not match_id or secure_filename(match_id) != match_id:
+        return jsonify({'error': 'No such match'}), 404
+    entry = registry.get(match_id)
+    if entry:
+        innings = entry.run(entry.match.find_innings, number)
+        record = innings.record() if innings else None
+    else:
+        # Saved, or live in another worker, which writes an innings out when it ends
+        record = read_innings_file(registry.snapshot_path(match_id), number)
+    if record is None:
+        return jsonify({'error': f'Innings {number} is not over'}), 404
+    response = Response(fastjson.dumps(record), mimetype='application/json')
+    response.set_etag(f"{match_id}.innings{number}.{record['ended_at']}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/match/analytics')
+def get_match_analytics():
+    """Worm, Manhattan and phase splits of every innings of a match, with the live figures from its status.
+    
+    The status only carries the live figures. Matches not live in this
+    worker are answered from their last snapshot.
+    """
+    match_id = request.args.get('match_id') or latest_match_id()
+    if not match_id or secure_filename(match_id) != match_id:
+        return jsonify({'error': 'No such match'}), 404
+    entry = registry.get(match_id)
+    if entry:
+        data = entry.run(entry.match.analytics_data)
+    else:
+        try:
+            with open(registry.snapshot_path(match_id), 'r') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return jsonify({'error': 'No such match'}), 404
+        remote = cluster.remote_matches().get(match_id)
+        data = {
+            'match_id': match_id,
+            'version': saved['match_info'].get('version', 0),
+            'live': remote.status.get('analytics') if remote else None,
+            'innings': saved.get('analytics', [])
+        }
+    response = Response(fastjson.dumps(data), mimetype='application/json')
+    response.set_etag(f"{match_id}.{data['version']}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/live-matches')
+def get_live_matches():
+    """Get matches currently held in memory (by any worker)"""
+    return jsonify([
+        {
+            'id': entry.match.id,
+            'team1': entry.match.team1.name,
+            'team2': entry.match.team2.name,
+            'is_started': entry.match.is_started,
+            'is_finished': entry.match.is_finished
+        }
+        for entry in registry.live_matches()
+    ] + [
+        {
+            'id': match_id,
+            'team1': remote.status['team1']['name'],
+            'team2': remote.status['team2']['name'],
+            'is_started': remote.status['is_started'],
+            'is_finished': remote.status['is_finished']
+        }
+        for match_id, remote in cluster.remote_matches().items()
+    ])
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/persistence')
+def get_persistence_lag():
+    """How far each live match's files trail its in-memory state"""
+    return jsonify(registry.persister.lag())
+
+def run_stats_query(query: str, **params):
+    """Run a stats query in the stats process and return it as a JSON response"""
+    global stats_pool
+    pool = stats_pool
+    try:
+        result = pool.submit(stats.run_query, 'data', query, **params).result(timeout=STATS_TIMEOUT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except TimeoutError:
+        return jsonify({'error': f'Stats query took longer than {STATS_TIMEOUT}s'}), 504
+    except BrokenProcessPool:
+        # The stats process died (e.g. killed for memory); the next query starts a new one
+        with stats_pool_lock:
+            if stats_pool is pool:
+                stats_pool = new_worker_pool()
+        pool.shutdown(wait=False)
+        response = jsonify({'error': 'Stats are unavailable, try again'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify(result)
+
+def stats_filters(sort_default: str):
+    """Common query parameters of the stats tables"""
+    return dict(
+        season=request.args.get('season', type=int),
+        phase=request.args.get('phase') or None,
+        team=request.args.get('team') or None,
+        min_balls=request.args.get('min_balls', 1, type=int),
+        sort=request.args.get('sort', sort_default),
+        limit=max(1, min(request.args.get('limit', 50, type=int), 500))
+    )
+
+@app.route('/api/stats/seasons')
+def get_stats_seasons():
+    """Seasons present in the archive, with match and ball counts"""
+    return run_stats_query('seasons')
+
+@app.route('/api/stats/batting')
+def get_batting_stats():
+    """Batting table across saved matches.
+    
+    Query parameters: season (year), phase (powerplay, middle, death), team,
+    min_balls, sort (runs, average, strike_rate, balls, fours, sixes,
+    boundary_pct, dot_pct) and limit.
+    """
+    return run_stats_query('batting', **stats_filters('runs'))
+
+@app.route('/api/stats/bowling')
+def get_bowling_stats():
+    """Bowling table across saved matches.
+    
+    Query parameters as for /api/stats/batting; sort is one of wickets,
+    economy, average, strike_rate, balls, runs, dot_pct.
+    """
+    return run_stats_query('bowling', **stats_filters('wickets'))
+
+@app.route('/api/stats/player/<path:name>')
+def get_player_stats(name):
+    """One player's batting and bowling, overall and per phase, optionally for one season"""
+    return run_stats_query('player', name=name, season=request.args.get('season', type=int))
 
 @app.route('/api/upload-flag', methods=['POST'])
 def upload_flag():
@@ -75,125 +532,170 @@ def upload_flag():
             return jsonify({'error': 'No file selected'}), 400
         
         if file and allowed_file(file.filename):
-            # Generate unique filename
-            filename = secure_filename(file.filename)
-            unique_filename = f"{team_name}_{uuid.uuid4().hex[:8]}.{filename.rsplit('.', 1)[1].lower()}"
-            
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
-            
-            # Return the URL path for the uploaded flag
-            flag_url = f"/static/uploads/flags/{unique_filename}"
+            extension = secure_filename(file.filename).rsplit('.', 1)[1]
+            try:
+                record = flag_store.save(file.read(), extension, team_name)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
+            # The URL to use as team1_flag/team2_flag, and smaller copies for previews
             return jsonify({
                 'success': True,
-                'flag_url': flag_url,
-                'filename': unique_filename
+                'flag_url': record.url(),
+                'thumbnail_url': record.thumbnail_url(),
+                'urls': {variant: record.url(variant) for variant in record.files},
+                'filename': record.files['original']
             })
         else:
             return jsonify({'error': 'Invalid file type. Please upload PNG, JPG, JPEG, GIF, or SVG files.'}), 400
-            
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/saved-flags')
 def get_saved_flags():
-    """Get list of saved flag files"""
+    """Get a page of saved flags, one per team a flag was uploaded for, by team name.
+    
+    Query parameters: q (team name prefix, any case), page, per_page.
+    The total number of matching flags is returned in X-Total-Count.
+    """
     try:
-        flags = []
-        flags_dir = app.config['UPLOAD_FOLDER']
-        
-        if os.path.exists(flags_dir):
-            for filename in os.listdir(flags_dir):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.svg')):
-                    # Extract team name from filename (before the first underscore and UUID)
-                    team_name = filename.split('_')[0] if '_' in filename else filename.rsplit('.', 1)[0]
-                    
-                    flags.append({
-                        'filename': filename,
-                        'team_name': team_name,
-                        'url': f"/static/uploads/flags/{filename}"
-                    })
-        
-        # Sort by team name for better organization
-        flags.sort(key=lambda x: x['team_name'].lower())
-        
-        return jsonify({'flags': flags})
-        
+        flags, total = flag_store.search(
+            prefix=request.args.get('q', ''),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int)
+        )
+        response = jsonify({'flags': flags, 'total': total})
+        response.headers['X-Total-Count'] = str(total)
+        return response
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/flags/<path:filename>')
+def get_flag(filename):
+    """A stored flag image; its name is its content hash, so it can be cached forever"""
+    if not flags.is_stored_name(filename):
+        return jsonify({'error': 'Flag not found'}), 404
+    response = send_from_directory(os.path.abspath(flag_store.directory), filename, max_age=FLAG_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 # WebSocket Events
-@socketio.on('connect')
+@socket_event('connect')
 def handle_connect():
     """Handle client connection"""
-    print('Client connected')
-    if current_match:
-        emit('match_update', current_match.get_current_status())
+    page = request.args.get('page', 'other')
+    if page not in ('control', 'display'):
+        page = 'other'
+    client_pages[request.sid] = page
+    metrics.CONNECTED_CLIENTS.inc(page)
+    wire_format = wire.negotiate(request.args.get('format'), request.args.get('compression'))
+    if wire_format.is_binary:
+        client_wire_formats[request.sid] = wire_format
+    # Confirm the format, which may be plainer than asked for if the server lacks msgpack
+    emit('wire_format', wire_format._asdict())
 
-@socketio.on('disconnect')
+@socket_event('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    print('Client disconnected')
+    page = client_pages.pop(request.sid, None)
+    if page:
+        metrics.CONNECTED_CLIENTS.dec(page)
+    client_wire_formats.pop(request.sid, None)
 
-@socketio.on('create_match')
+@socket_event('join_match', forward=True)
+def handle_join_match(data=None):
+    """Subscribe a client to a match room (the most recently active match if none is named)"""
+    match_id = (data or {}).get('match_id')
+    if not match_id:
+        match_id = latest_match_id()
+        if match_id and not registry.get(match_id):
+            forward_event('join_match', {'match_id': match_id})
+            return
+    entry = registry.get(match_id)
+    if entry:
+        join_match_room(entry.match.id)
+        emit_match('match_update', read_status(entry))
+        estimate = win_probability.latest(entry.match.id)
+        if estimate:
+            emit('win_probability', estimate)
+        else:
+            # e.g. a match reloaded after a restart; the estimate follows when ready
+            entry.run(win_probability.request, entry.match)
+    elif match_id:
+        emit_error(f'Match {match_id} is not live')
+
+@socket_event('request_resync', forward=True)
+def handle_request_resync(data=None):
+    """Send a full snapshot to a client whose delta sequence fell out of step"""
+    entry = get_live_match(data)
+    if entry:
+        emit_match('match_update', read_status(entry))
+
+@socket_event('create_match')
 def handle_create_match(data):
     """Create a new match"""
-    global current_match
     try:
-        current_match = Match(
+        match = Match(
             team1_name=data['team1'],
             team2_name=data['team2'],
             total_overs=int(data['total_overs']),
             team1_flag=data.get('team1_flag', ''),
             team2_flag=data.get('team2_flag', '')
         )
+        team1_players = data['team1_players']
+        team2_players = data['team2_players']
+        toss_winner, toss_decision = data['toss_winner'], data['toss_decision']
         
-        # Add players
-        for player in data['team1_players']:
-            current_match.add_player(player, data['team1'])
-        
-        for player in data['team2_players']:
-            current_match.add_player(player, data['team2'])
+        # Save match and journal every command from here on
+        evict_finished_matches()
+        entry = registry.add(match)
+        join_match_room(match.id)
         
-        # Set toss
-        current_match.set_toss(data['toss_winner'], data['toss_decision'])
-        
-        # Save match
-        current_match.save_to_file()
-        
-        emit('match_created', current_match.get_current_status())
-        socketio.emit('match_update', current_match.get_current_status())
+        def set_up(match):
+            # Add players
+            for player in team1_players:
+                match.add_player(player, data['team1'])
+            
+            for player in team2_players:
+                match.add_player(player, data['team2'])
+            
+            # Set toss
+            match.set_toss(toss_winner, toss_decision)
         
+        execute_command(entry, set_up)
+        emit_match('match_created', read_status(entry))
+        socketio.emit('match_available', {'match_id': match.id})
+    
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('start_innings')
+@socket_event('start_innings', forward=True)
 def handle_start_innings(data):
     """Start the innings"""
-    global current_match
     try:
-        if current_match:
-            current_match.start_innings(
+        entry = get_live_match(data)
+        if entry:
+            execute_command(entry, lambda match: match.start_innings(
                 striker=data['striker'],
                 non_striker=data['non_striker'],
                 bowler=data['bowler']
-            )
-            current_match.save_to_file()
-            socketio.emit('match_update', current_match.get_current_status())
+            ))
             emit('innings_started', {'success': True})
         else:
-            emit('error', {'message': 'No active match'})
+            emit_error('No active match')
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('add_ball')
+@socket_event('add_ball', forward=True)
 def handle_add_ball(data):
     """Add a ball to the match"""
-    global current_match
     try:
-        if not current_match:
-            emit('error', {'message': 'No active match'})
+        entry = get_live_match(data)
+        if not entry:
+            emit_error('No active match')
             return
         
         # Parse wicket type
@@ -206,143 +708,209 @@ def handle_add_ball(data):
         if data.get('extra_type'):
             extra_type = ExtraType(data['extra_type'])
         
-        result = current_match.add_ball(
+        result = execute_command(entry, lambda match: match.add_ball(
             runs=int(data.get('runs', 0)),
             is_wicket=data.get('is_wicket', False),
             wicket_type=wicket_type,
             dismissed_player=data.get('dismissed_player'),
             extra_type=extra_type,
             extra_runs=int(data.get('extra_runs', 0))
-        )
+        ))
         
-        current_match.save_to_file()
-        socketio.emit('match_update', current_match.get_current_status())
+        if 'error' in result:
+            # E.g. a ball before the second innings has its openers
+            emit_error(result['error'])
+            return
         emit('ball_added', result)
-        
+    
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('undo_last_ball')
-def handle_undo_last_ball():
-    """Undo the last ball"""
-    global current_match
+def move_through_history(data, event: str, command):
+    """Run an undo, redo or rewind command and tell the client how it went"""
     try:
-        if not current_match:
-            emit('error', {'message': 'No active match'})
+        entry = get_live_match(data)
+        if not entry:
+            emit_error('No active match')
             return
         
-        result = current_match.undo_last_ball()
+        result = execute_command(entry, command)
         if result['success']:
-            current_match.save_to_file()
-            socketio.emit('match_update', current_match.get_current_status())
-            emit('ball_undone', result)
+            emit(event, result)
         else:
-            emit('error', {'message': result['message']})
-        
+            emit_error(result['message'])
+    
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
+
+@socket_event('undo_last_ball', forward=True)
+def handle_undo_last_ball(data=None):
+    """Undo the last ball"""
+    move_through_history(data, 'ball_undone', lambda match: match.undo_last_ball())
+
+@socket_event('undo', forward=True)
+def handle_undo(data):
+    """Undo any number of balls (data['steps'], default 1)"""
+    move_through_history(data, 'ball_undone', lambda match: match.undo(int(data.get('steps', 1))))
 
-@socketio.on('set_new_bowler')
+@socket_event('redo', forward=True)
+def handle_redo(data):
+    """Bring back undone balls (data['steps'], default 1)"""
+    move_through_history(data, 'ball_redone', lambda match: match.redo(int(data.get('steps', 1))))
+
+@socket_event('rewind_to', forward=True)
+def handle_rewind_to(data):
+    """Go back to just after ball data['over'] ("12.3") of data['innings'] (default: the current innings)"""
+    try:
+        over, _, ball = str(data['over']).partition('.')
+        over, ball = int(over), int(ball or 0)
+    except (KeyError, ValueError):
+        emit_error(f"Not an over: {data.get('over')}")
+        return
+    innings = data.get('innings')
+    move_through_history(data, 'match_rewound', lambda match: match.rewind_to(
+        int(innings) if innings else match.current_innings, over, ball))
+
+@socket_event('set_new_bowler', forward=True)
 def handle_new_bowler(data):
     """Set new bowler for next over"""
-    global current_match
     try:
-        if current_match:
-            current_match.set_new_bowler(data['bowler'])
-            current_match.save_to_file()
-            socketio.emit('match_update', current_match.get_current_status())
+        entry = get_live_match(data)
+        if entry:
+            execute_command(entry, lambda match: match.set_new_bowler(data['bowler']))
             emit('bowler_set', {'success': True})
         else:
-            emit('error', {'message': 'No active match'})
+            emit_error('No active match')
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('set_new_batter')
+@socket_event('set_new_batter', forward=True)
 def handle_new_batter(data):
     """Set new batter after wicket"""
-    global current_match
     try:
-        if current_match:
-            current_match.set_new_batter(data['batter'])
-            current_match.save_to_file()
-            socketio.emit('match_update', current_match.get_current_status())
+        entry = get_live_match(data)
+        if entry:
+            execute_command(entry, lambda match: match.set_new_batter(data['batter']))
             emit('batter_set', {'success': True})
         else:
-            emit('error', {'message': 'No active match'})
+            emit_error('No active match')
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('load_match')
+@socket_event('load_match', forward=True)
 def handle_load_match(data):
     """Load a saved match"""
-    global current_match
     try:
-        filepath = f"data/match_{data['match_id']}.json"
-        current_match = Match.load_from_file(filepath)
-        socketio.emit('match_update', current_match.get_current_status())
-        emit('match_loaded', {'success': True})
+        evict_finished_matches()
+        try:
+            entry = registry.load(data['match_id'])
+        except MatchOwnedElsewhere:
+            # Live in another worker that hasn't announced it yet
+            forward_event('load_match', data)
+            return
+        join_match_room(entry.match.id)
+        entry.run(broadcast_match_update, entry, True)
+        socketio.emit('match_available', {'match_id': entry.match.id})
+        emit('match_loaded', {'success': True, 'match_id': entry.match.id})
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('save_match')
-def handle_save_match():
+@socket_event('save_match', forward=True)
+def handle_save_match(data=None):
     """Save current match"""
-    global current_match
     try:
-        if current_match:
-            current_match.save_to_file()
+        entry = get_live_match(data)
+        if entry:
+            registry.persister.save_now(entry)
             emit('match_saved', {'success': True})
         else:
-            emit('error', {'message': 'No active match'})
+            emit_error('No active match')
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('start_second_innings')
+@socket_event('close_match', forward=True)
+def handle_close_match(data):
+    """Write a final snapshot and evict a match from memory"""
+    try:
+        if registry.evict(data['match_id']):
+            cluster.publish('match_closed', match_id=data['match_id'])
+            emit('match_closed', {'success': True, 'match_id': data['match_id']})
+        else:
+            emit_error('No active match')
+    except Exception as e:
+        emit_error(str(e), 'exception')
+
+@socket_event('start_second_innings', forward=True)
 def handle_start_second_innings(data):
     """Start the second innings with opening players"""
-    global current_match
     try:
-        if not current_match:
-            emit('error', {'message': 'No active match'})
-            return
-            
-        if current_match.current_innings != 2:
-            emit('error', {'message': 'Not ready for second innings'})
+        entry = get_live_match(data)
+        if not entry:
+            emit_error('No active match')
             return
         
-        current_match.start_second_innings(
-            data['striker'],
-            data['non_striker'], 
-            data['bowler']
-        )
+        def start_second_innings(match):
+            if match.current_innings != 2:
+                return False
+            match.start_second_innings(
+                data['striker'],
+                data['non_striker'], 
+                data['bowler']
+            )
+            return True
         
-        current_match.save_to_file()
-        socketio.emit('match_update', current_match.get_current_status())
-        emit('second_innings_started', {'success': True})
+        if not execute_command(entry, start_second_innings):
+            emit_error('Not ready for second innings')
+            return
         
+        emit('second_innings_started', {'success': True})
+    
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
 
-@socketio.on('get_players')
+@socket_event('get_players', forward=True)
 def handle_get_players(data):
     """Get players for a team"""
-    global current_match
     try:
-        if current_match:
+        entry = get_live_match(data)
+        if entry:
             team_name = data['team']
-            if team_name.lower() == current_match.team1.name.lower():
-                players = current_match.team1.players
+            if team_name.lower() == entry.match.team1.name.lower():
+                players = entry.match.team1.players
             else:
-                players = current_match.team2.players
+                players = entry.match.team2.players
             emit('players_list', {'players': players})
         else:
-            emit('error', {'message': 'No active match'})
+            emit_error('No active match')
     except Exception as e:
-        emit('error', {'message': str(e)})
+        emit_error(str(e), 'exception')
+
+def announce_periodically():
+    while True:
+        socketio.sleep(ANNOUNCE_INTERVAL)
+        announce_live_matches()
+
+def start_cluster_worker():
+    """Join the other workers: listen to them straight away and learn their live matches"""
+    socketio.server.manager_initialized = True
+    socketio.server.manager.initialize()
+    socketio.start_background_task(announce_periodically)
+    cluster.publish('hello')
 
 if __name__ == '__main__':
     # Create data directory if it doesn't exist
     os.makedirs('data', exist_ok=True)
+    win_probability.start()
     
-    # Run the application
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    listen_fd = os.environ.get('CRICKET_LISTEN_FD')
+    if listen_fd:
+        # One of several workers started by cluster.py
+        start_cluster_worker()
+        try:
+            serve(app, socketio, int(listen_fd))
+        except KeyboardInterrupt:
+            # The launcher stopping; atexit flushes live matches
+            pass
+    else:
+        # Run the application
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,242 @@
+import json
+import os
+from array import array
+from typing import List, Dict, Optional, Iterator
+from models import Ball, Over, WicketType, ExtraType
+
+# Small-int codes for the enums, 0 meaning "none"
+WICKET_CODES = {None: 0, **{wicket_type: code for code, wicket_type in enumerate(WicketType, 1)}}
+EXTRA_CODES = {None: 0, **{extra_type: code for code, extra_type in enumerate(ExtraType, 1)}}
+WICKET_TYPES = {code: wicket_type for wicket_type, code in WICKET_CODES.items()}
+EXTRA_TYPES = {code: extra_type for extra_type, code in EXTRA_CODES.items()}
+
+NO_PLAYER = -1
+
+class PlayerTable:
+    """Interned player names, each stored once and referenced by a small int id"""
+    
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+    
+    def id_for(self, name: Optional[str]) -> int:
+        if not name:
+            return NO_PLAYER
+        player_id = self._ids.get(name)
+        if player_id is None:
+            player_id = len(self.names)
+            self.names.append(name)
+            self._ids[name] = player_id
+        return player_id
+    
+    def name_for(self, player_id: int) -> Optional[str]:
+        return self.names[player_id] if player_id != NO_PLAYER else None
+
+class BallStore:
+    """Column-per-field storage for the balls of many overs and matches.
+    
+    Each delivery costs a few bytes across typed arrays instead of a Ball object
+    with its own __dict__. Balls and overs are read back through BallView and
+    OverView, which offer the same read API as Ball and Over.
+    """
+    
+    def __init__(self, players: Optional[PlayerTable] = None):
+        self.players = players or PlayerTable()
+        # Ball columns
+        self.runs = array('b')
+        self.extra_runs = array('b')
+        self.is_wicket = array('b')
+        self.wicket_code = array('b')
+        self.extra_code = array('b')
+        self.bowler = array('i')
+        self.dismissed = array('i')
+        self.prev_striker = array('i')
+        self.prev_non_striker = array('i')
+        # Over columns: index of each over's first ball, its number and bowler
+        self.over_start = array('i')
+        self.over_number = array('h')
+        self.over_bowler = array('i')
+        # Match columns: index of each match's first over
+        self.match_ids: List[str] = []
+        self.match_over_start = array('i')
+    
+    def __len__(self) -> int:
+        return len(self.runs)
+    
+    @property
+    def over_count(self) -> int:
+        return len(self.over_start)
+    
+    def append_ball(self, ball: Ball):
+        players = self.players
+        self.runs.append(ball.runs)
+        self.extra_runs.append(ball.extra_runs)
+        self.is_wicket.append(1 if ball.is_wicket else 0)
+        self.wicket_code.append(WICKET_CODES[ball.wicket_type])
+        self.extra_code.append(EXTRA_CODES[ball.extra_type])
+        self.bowler.append(players.id_for(ball.bowler))
+        self.dismissed.append(players.id_for(ball.dismissed_player))
+        self.prev_striker.append(players.id_for(ball.prev_striker))
+        self.prev_non_striker.append(players.id_for(ball.prev_non_striker))
+    
+    def append_over(self, over: Over):
+        self.over_start.append(len(self.runs))
+        self.over_number.append(over.over_number)
+        self.over_bowler.append(self.players.id_for(over.bowler))
+        for ball in over.balls:
+            self.append_ball(ball)
+    
+    def append_match(self, match_id: str, overs: List[Over]):
+        self.match_ids.append(match_id)
+        self.match_over_start.append(len(self.over_start))
+        for over in overs:
+            self.append_over(over)
+    
+    def append_match_file(self, filepath: str):
+        """Add the overs of a saved match without building a full Match"""
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+        overs = []
+        for over_data in data["overs"]:
+            balls = []
+            for ball_data in over_data["balls"]:
+                ball_data = dict(ball_data)
+                if ball_data.get("wicket_type"):
+                    ball_data["wicket_type"] = WicketType(ball_data["wicket_type"])
+                if ball_data.get("extra_type"):
+                    ball_data["extra_type"] = ExtraType(ball_data["extra_type"])
+                balls.append(Ball(**ball_data))
+            overs.append(Over(over_data["over_number"], over_data["bowler"], balls))
+        self.append_match(data["match_info"]["id"], overs)
+    
+    @classmethod
+    def from_directory(cls, data_dir: str = "data") -> 'BallStore':
+        """Load every saved match in data_dir into one store"""
+        store = cls()
+        for filename in sorted(os.listdir(data_dir)):
+            if filename.startswith('match_') and filename.endswith('.json'):
+                store.append_match_file(os.path.join(data_dir, filename))
+        return store
+    
+    def ball(self, index: int) -> 'BallView':
+        return BallView(self, index)
+    
+    def over(self, index: int) -> 'OverView':
+        return OverView(self, index)
+    
+    def over_range(self, index: int) -> range:
+        start = self.over_start[index]
+        end = self.over_start[index + 1] if index + 1 < len(self.over_start) else len(self.runs)
+        return range(start, end)
+    
+    def match_overs(self, match_index: int) -> Iterator['OverView']:
+        start = self.match_over_start[match_index]
+        end = (self.match_over_start[match_index + 1]
+               if match_index + 1 < len(self.match_over_start) else len(self.over_start))
+        return (OverView(self, index) for index in range(start, end))
+    
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (excluding the shared player names)"""
+        columns = [self.runs, self.extra_runs, self.is_wicket, self.wicket_code, self.extra_code,
+                   self.bowler, self.dismissed, self.prev_striker, self.prev_non_striker,
+                   self.over_start, self.over_number, self.over_bowler, self.match_over_start]
+        return sum(column.itemsize * len(column) for column in columns)
+
+class BallView:
+    """Read-only Ball lookalike over one row of a BallStore"""
+    __slots__ = ('_store', '_index')
+    
+    def __init__(self, store: BallStore, index: int):
+        self._store = store
+        self._index = index
+    
+    @property
+    def runs(self) -> int:
+        return self._store.runs[self._index]
+    
+    @property
+    def extra_runs(self) -> int:
+        return self._store.extra_runs[self._index]
+    
+    @property
+    def is_wicket(self) -> bool:
+        return bool(self._store.is_wicket[self._index])
+    
+    @property
+    def wicket_type(self) -> Optional[WicketType]:
+        return WICKET_TYPES[self._store.wicket_code[self._index]]
+    
+    @property
+    def extra_type(self) -> Optional[ExtraType]:
+        return EXTRA_TYPES[self._store.extra_code[self._index]]
+    
+    @property
+    def dismissed_player(self) -> Optional[str]:
+        return self._store.players.name_for(self._store.dismissed[self._index])
+    
+    @property
+    def bowler(self) -> str:
+        return self._store.players.name_for(self._store.bowler[self._index]) or ""
+    
+    @property
+    def prev_striker(self) -> Optional[str]:
+        return self._store.players.name_for(self._store.prev_striker[self._index])
+    
+    @property
+    def prev_non_striker(self) -> Optional[str]:
+        return self._store.players.name_for(self._store.prev_non_striker[self._index])
+    
+    total_runs = Ball.total_runs
+    is_legal_delivery = Ball.is_legal_delivery
+    summary_token = Ball.summary_token
+    
+    def to_ball(self) -> Ball:
+        """Materialize a full Ball, e.g. to feed back into a live Match"""
+        return Ball(self.runs, self.is_wicket, self.wicket_type, self.dismissed_player,
+                    self.extra_type, self.extra_runs, self.bowler,
+                    self.prev_striker, self.prev_non_striker)
+
+class OverView:
+    """Read-only Over lookalike over one over of a BallStore"""
+    __slots__ = ('_store', '_index')
+    
+    def __init__(self, store: BallStore, index: int):
+        self._store = store
+        self._index = index
+    
+    @property
+    def over_number(self) -> int:
+        return self._store.over_number[self._index]
+    
+    @property
+    def bowler(self) -> str:
+        return self._store.players.name_for(self._store.over_bowler[self._index]) or ""
+    
+    @property
+    def balls(self) -> List[BallView]:
+        return [BallView(self._store, index) for index in self._store.over_range(self._index)]
+    
+    @property
+    def runs(self) -> int:
+        store = self._store
+        return sum(store.runs[i] + store.extra_runs[i] for i in store.over_range(self._index))
+    
+    @property
+    def wickets(self) -> int:
+        store = self._store
+        return sum(store.is_wicket[i] for i in store.over_range(self._index))
+    
+    @property
+    def legal_balls(self) -> int:
+        return sum(1 for ball in self.balls if ball.is_legal_delivery)
+    
+    @property
+    def is_complete(self) -> bool:
+        return self.legal_balls >= 6
+    
+    @property
+    def summary(self) -> str:
+        return ' '.join(ball.summary_token for ball in self.balls)
+    
+    def to_over(self) -> Over:
+        return Over(self.over_number, self.bowler, [ball.to_ball() for ball in self.balls])
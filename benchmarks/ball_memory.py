@@ -0,0 +1,83 @@
+"""Memory used by a season of balls: Ball/Over objects vs the columnar BallStore.
+
+Run from the repository root:
+
+    python benchmarks/ball_memory.py [--matches 200] [--overs 40]
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Ball, Over, WicketType, ExtraType
+from ballstore import BallStore
+
+def synthetic_ball(rng: random.Random, squad):
+    """One delivery with a realistic extras/wicket mix, names decoded fresh as json.load would"""
+    roll = rng.random()
+    ball = Ball(runs=rng.choice([0, 0, 0, 1, 1, 2, 4, 6]), bowler="".join(rng.choice(squad)))
+    if roll < 0.04:
+        ball.runs = 0
+        ball.is_wicket = True
+        ball.wicket_type = rng.choice(list(WicketType))
+        ball.dismissed_player = "".join(rng.choice(squad))
+    elif roll < 0.08:
+        ball.runs = 0
+        ball.extra_type = ExtraType.WIDE
+        ball.extra_runs = 1
+    elif roll < 0.10:
+        ball.extra_type = rng.choice([ExtraType.NO_BALL, ExtraType.BYE, ExtraType.LEG_BYE])
+        ball.extra_runs = 1
+    ball.prev_striker = "".join(rng.choice(squad))
+    ball.prev_non_striker = "".join(rng.choice(squad))
+    return ball
+
+def synthetic_season(matches: int, overs_per_match: int, seed: int = 1):
+    rng = random.Random(seed)
+    squad = [f"Player {number}" for number in range(300)]
+    season = []
+    for match_number in range(matches):
+        overs = []
+        for over_number in range(1, overs_per_match + 1):
+            balls = [synthetic_ball(rng, squad) for _ in range(6)]
+            while rng.random() < 0.1:
+                balls.append(synthetic_ball(rng, squad))
+            overs.append(Over(over_number, balls[0].bowler, balls))
+        season.append((f"match_{match_number}", overs))
+    return season
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=200)
+    parser.add_argument("--overs", type=int, default=40, help="overs per match (both innings)")
+    args = parser.parse_args()
+    
+    season, object_bytes = measure(lambda: synthetic_season(args.matches, args.overs))
+    balls = sum(len(over.balls) for _, overs in season for over in overs)
+    
+    def build_store():
+        store = BallStore()
+        for match_id, overs in season:
+            store.append_match(match_id, overs)
+        return store
+    
+    store, store_bytes = measure(build_store)
+    
+    print(f"{args.matches} matches, {store.over_count} overs, {balls} balls")
+    print(f"Ball/Over objects: {object_bytes / 1024 / 1024:8.2f} MiB  ({object_bytes / balls:6.1f} bytes/ball)")
+    print(f"BallStore:         {store_bytes / 1024 / 1024:8.2f} MiB  ({store_bytes / balls:6.1f} bytes/ball)")
+    print(f"Columns only:      {store.nbytes() / 1024 / 1024:8.2f} MiB")
+    print(f"Reduction:         {object_bytes / store_bytes:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Replay throughput of replay.replay() in balls per second.
+
+Run from the repository root:
+
+    python benchmarks/replay_throughput.py [--target 50000] [--rounds 20]
+
+Exits with status 1 when any format replays slower than the target.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Match
+from journal import MatchJournal
+from replay import replay, diff_match
+from synthetic import FORMATS, play_match
+
+# Balls per second a single process must sustain for every format
+DEFAULT_TARGET = 50000
+
+def command_stream(total_overs: int, seed: int, directory: str):
+    """Score a synthetic match with a journal attached and return the journal's records"""
+    match = Match("Lions", "Tigers", total_overs)
+    match.id = f"bench_{total_overs}_{seed}"
+    snapshot_path = os.path.join(directory, f"match_{match.id}.json")
+    match.open_journal(snapshot_path)
+    for number in range(1, 12):
+        match.add_player(f"Lions {number}", "Lions")
+        match.add_player(f"Tigers {number}", "Tigers")
+    match.set_toss("Lions", "bat")
+    play_match(match, seed)
+    match.journal.close()
+    return match, MatchJournal.read(match.journal.path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure match replay throughput")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET, help="minimum balls/sec")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    
+    below_target = False
+    with tempfile.TemporaryDirectory() as directory:
+        for name, overs in FORMATS.items():
+            live, records = command_stream(overs, seed=7, directory=directory)
+            if diff_match(live, replay(records)):
+                print(f"{name}: replay does not reproduce the live match")
+                sys.exit(1)
+            
+            balls = sum(1 for record in records if record["cmd"] == "add_ball")
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                replay(records)
+            elapsed = time.perf_counter() - started
+            rate = balls * args.rounds / elapsed
+            below_target |= rate < args.target
+            flag = "" if rate >= args.target else "  BELOW TARGET"
+            print(f"{name:5} {balls:5} balls  {elapsed / args.rounds * 1000:8.2f} ms/match  {rate:12,.0f} balls/sec{flag}")
+    
+    print(f"target: {args.target:,.0f} balls/sec")
+    sys.exit(1 if below_target else 0)
+
+if __name__ == "__main__":
+    main()
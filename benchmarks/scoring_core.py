@@ -0,0 +1,245 @@
+"""Micro-benchmarks for the models.py scoring core, compared against a stored baseline.
+
+Covers Match.add_ball, undo_last_ball, get_current_status (uncached),
+serialize_dataclass, save_to_file and load_from_file on synthetic T20,
+50-over and long-format matches. Each benchmark reports the best time per
+operation over several rounds.
+
+Run from the repository root:
+
+    python benchmarks/scoring_core.py                   # compare with the baseline
+    python benchmarks/scoring_core.py --save-baseline   # record a new baseline
+
+Exits with status 1 when any benchmark is slower than its baseline by more
+than the threshold (25% by default). Baselines are machine specific, so
+record one on the machine that runs the comparison and commit it with the
+models.py change it measures.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import List, Dict, Callable, Any, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Match, WicketType, ExtraType, serialize_dataclass
+from synthetic import FORMATS
+from replay_throughput import command_stream
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_core_baseline.json")
+
+# Allowed slowdown against the baseline before a benchmark counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+def prepare_calls(records: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Journal records as ready-to-call (method name, arguments) pairs"""
+    calls = []
+    for record in records[1:]:
+        args = dict(record["args"])
+        if args.get("wicket_type"):
+            args["wicket_type"] = WicketType(args["wicket_type"])
+        if args.get("extra_type"):
+            args["extra_type"] = ExtraType(args["extra_type"])
+        calls.append((record["cmd"], args))
+    return calls
+
+class Fixture:
+    """One synthetic match: its command stream, the finished match and a saved copy"""
+    
+    def __init__(self, total_overs: int, directory: str):
+        self.match, records = command_stream(total_overs, seed=7, directory=directory)
+        self.create_args = records[0]["args"]
+        self.calls = prepare_calls(records)
+        self.balls = sum(1 for cmd, _ in self.calls if cmd == "add_ball")
+        self.snapshot_path = os.path.join(directory, f"bench_{total_overs}.json")
+        self.match.save_to_file(self.snapshot_path)
+    
+    def replay_until(self, count: int) -> Match:
+        match = Match.create(**self.create_args)
+        for cmd, args in self.calls[:count]:
+            getattr(match, cmd)(**args)
+        return match
+    
+    def undo_point(self) -> int:
+        """Number of calls up to a mid-innings ball that can be undone and re-added over and over"""
+        for index in range(len(self.calls) // 2, len(self.calls) - 1):
+            cmd, args = self.calls[index]
+            if cmd == "add_ball" and not args.get("is_wicket") and self.calls[index + 1][0] == "add_ball":
+                return index + 1
+        raise ValueError("No undoable ball found")
+
+def bench_add_ball(fixture: Fixture) -> Tuple[float, int]:
+    match = Match.create(**fixture.create_args)
+    elapsed = 0.0
+    for cmd, args in fixture.calls:
+        if cmd == "add_ball":
+            started = time.perf_counter()
+            match.add_ball(**args)
+            elapsed += time.perf_counter() - started
+        else:
+            getattr(match, cmd)(**args)
+    return elapsed, fixture.balls
+
+def bench_undo_last_ball(fixture: Fixture, repeats: int = 200) -> Tuple[float, int]:
+    count = fixture.undo_point()
+    match = fixture.replay_until(count)
+    last_ball = fixture.calls[count - 1][1]
+    elapsed = 0.0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        match.undo_last_ball()
+        elapsed += time.perf_counter() - started
+        match.add_ball(**last_ball)
+    return elapsed, repeats
+
+def bench_get_current_status(fixture: Fixture, repeats: int = 50) -> Tuple[float, int]:
+    """Building the status from scratch, as happens once per version"""
+    match = fixture.match
+    started = time.perf_counter()
+    for _ in range(repeats):
+        match._build_current_status()
+    return time.perf_counter() - started, repeats
+
+def bench_serialize_dataclass(fixture: Fixture) -> Tuple[float, int]:
+    match = fixture.match
+    objects = list(match.players.values()) + match.partnerships + \
+        [ball for over in match.overs for ball in over.balls] + [match.team1, match.team2]
+    started = time.perf_counter()
+    for obj in objects:
+        serialize_dataclass(obj)
+    return time.perf_counter() - started, len(objects)
+
+def bench_save_to_file(fixture: Fixture, repeats: int = 10) -> Tuple[float, int]:
+    path = fixture.snapshot_path + ".save"
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fixture.match.save_to_file(path)
+    return time.perf_counter() - started, repeats
+
+def bench_load_from_file(fixture: Fixture, repeats: int = 10) -> Tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        Match.load_from_file(fixture.snapshot_path)
+    return time.perf_counter() - started, repeats
+
+BENCHMARKS: Dict[str, Callable[[Fixture], Tuple[float, int]]] = {
+    "add_ball": bench_add_ball,
+    "undo_last_ball": bench_undo_last_ball,
+    "get_current_status": bench_get_current_status,
+    "serialize_dataclass": bench_serialize_dataclass,
+    "save_to_file": bench_save_to_file,
+    "load_from_file": bench_load_from_file,
+}
+
+def calibration_workload(fixture: Fixture = None) -> Tuple[float, int]:
+    """Fixed pure-Python work (dicts, attribute access, JSON) used as the unit of machine speed"""
+    class Row:
+        def __init__(self, number):
+            self.number = number
+            self.label = str(number)
+    rows = [Row(number) for number in range(2000)]
+    started = time.perf_counter()
+    encoded = json.dumps([{"number": row.number, "label": row.label, "even": row.number % 2 == 0} for row in rows])
+    json.loads(encoded)
+    return time.perf_counter() - started, 1
+
+def timed(bench: Callable[[Fixture], Tuple[float, int]], fixture: Fixture) -> float:
+    """Seconds per operation for one round, with the garbage collector paused as timeit does"""
+    gc.collect()
+    gc.disable()
+    try:
+        elapsed, operations = bench(fixture)
+    finally:
+        gc.enable()
+    return elapsed / operations
+
+def run_benchmarks(rounds: int, only: str = None) -> Dict[str, Dict[str, float]]:
+    """Best seconds per operation for every format and benchmark.
+    
+    Rounds of each benchmark are interleaved with rounds of the calibration
+    workload, so "relative" (time per operation in calibration units) cancels
+    out how fast the machine happens to be running at that moment.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for format_name, overs in FORMATS.items():
+            fixture = Fixture(overs, directory)
+            for bench_name, bench in BENCHMARKS.items():
+                name = f"{format_name}.{bench_name}"
+                if only and only not in name:
+                    continue
+                times, calibration = [], []
+                for _ in range(rounds):
+                    calibration.append(timed(calibration_workload, fixture))
+                    times.append(timed(bench, fixture))
+                results[name] = {"seconds": min(times), "relative": min(times) / min(calibration)}
+    return results
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    """Results of the stored baseline, empty if none has been recorded"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def slowdowns(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """Change against the baseline (0.1 = 10% slower) of every benchmark the baseline has"""
+    return {name: result["relative"] / baseline[name]["relative"] - 1
+            for name, result in results.items() if name in baseline}
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds * 1e6:9.2f} us"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the models.py scoring core against a stored baseline")
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the new baseline")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this, e.g. t20 or add_ball")
+    args = parser.parse_args()
+    
+    results = run_benchmarks(args.rounds, args.only)
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        for name, result in results.items():
+            print(f"{name:30} {format_time(result['seconds'])}")
+        print(f"Baseline saved to {args.baseline}")
+        return
+    
+    baseline = load_baseline(args.baseline)
+    changes = slowdowns(results, baseline)
+    regressions = []
+    for name, result in results.items():
+        if name not in changes:
+            print(f"{name:30} {format_time(result['seconds'])}   (no baseline)")
+            continue
+        change = changes[name]
+        flag = ""
+        if change > args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:30} {format_time(result['seconds'])}   baseline {format_time(baseline[name]['seconds'])}   "
+              f"{change:+7.1%}{flag}")
+    
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than the baseline")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
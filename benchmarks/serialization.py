@@ -0,0 +1,80 @@
+"""Generated serializers and the JSON backend against the reflective serializer and json.
+
+Times serializing every Team, Player, Partnership, Over and Ball of a
+synthetic match, and encoding the match status (as sent to displays) and the
+snapshot (as written by save_to_file), checking the output is byte-identical.
+
+Run from the repository root:
+
+    python benchmarks/serialization.py [--rounds 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastjson
+import models
+from models import serialize_dataclass, _serialize_reflective
+from synthetic import FORMATS, new_match, play_match
+
+def reflective(fn):
+    """fn with every type (nested ones too) serialized the old, reflective way"""
+    def run():
+        compiled = dict(models._serializers)
+        models._serializers.update({cls: _serialize_reflective for cls in compiled})
+        try:
+            fn()
+        finally:
+            models._serializers.update(compiled)
+    return run
+
+def best_time(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def report(label: str, before: float, after: float):
+    print(f"  {label:34} {before * 1000:9.3f} ms -> {after * 1000:9.3f} ms   {before / after:5.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark match serialization")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    
+    print(f"JSON backend: {fastjson.BACKEND}")
+    for name, overs in FORMATS.items():
+        match = play_match(new_match(overs), seed=3)
+        objects = [match.team1, match.team2, *match.players.values(), *match.partnerships, *match.overs]
+        status = match._build_current_status()
+        snapshot = match.snapshot_data("bench.json")
+        
+        if [serialize_dataclass(obj) for obj in objects] != [_serialize_reflective(obj) for obj in objects] \
+                or fastjson.dumps(status) != json.dumps(status, separators=(",", ":")).encode() \
+                or fastjson.dumps_indented(snapshot) != json.dumps(snapshot, indent=2).encode():
+            print(f"{name}: output differs from the reflective serializer / json module")
+            sys.exit(1)
+        
+        balls = sum(len(over.balls) for over in match.overs)
+        print(f"{name} ({len(match.overs)} overs, {balls} balls)")
+        report("serialize_dataclass (all objects)",
+               best_time(reflective(lambda: [serialize_dataclass(obj) for obj in objects]), args.rounds),
+               best_time(lambda: [serialize_dataclass(obj) for obj in objects], args.rounds))
+        report("get_current_status build",
+               best_time(reflective(match._build_current_status), args.rounds),
+               best_time(match._build_current_status, args.rounds))
+        report("status JSON (Socket.IO payload)",
+               best_time(lambda: json.dumps(status, separators=(",", ":")), args.rounds),
+               best_time(lambda: fastjson.dumps(status), args.rounds))
+        report("snapshot JSON (save_to_file)",
+               best_time(lambda: json.dumps(snapshot, indent=2), args.rounds),
+               best_time(lambda: fastjson.dumps_indented(snapshot), args.rounds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""End-to-end broadcast latency of app.py with many display clients.
+
+Starts the app in a scratch directory, connects N simulated display.html
+clients and one scorer, creates a match and scores a full innings with
+add_ball events. For each ball it measures the time from the scorer's emit to
+each display receiving the resulting match_delta/match_update, and reports
+latency percentiles, broadcast payload sizes and server CPU for every
+combination of client count and innings length. Once every display has
+joined, it also records the server's threads and resident memory, which is
+what limits how many connections one server can hold.
+
+Run from the repository root (needs the client extras: pip install "python-socketio[client]"):
+
+    python benchmarks/socket_load.py [--clients 10,100,1000] [--overs 5,20] [--client-processes 4]
+    python benchmarks/socket_load.py --async-modes threading,gevent   # compare server modes
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from inspect import signature
+from enum import Enum
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socketio
+from synthetic import new_match, play_match
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Longest wait for the final broadcast to reach every display
+DRAIN_TIMEOUT = 120
+
+# Commands the scorer sends as the control panel does, under the same event names
+SCORER_EVENTS = {"start_innings", "add_ball", "undo_last_ball", "set_new_bowler", "set_new_batter"}
+
+def serve(port: int):
+    """Run the app on localhost (in the current directory's data/)"""
+    from app import app, socketio as server
+    server.run(app, host="127.0.0.1", port=port, log_output=False, allow_unsafe_werkzeug=True)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port: int, workdir: str, async_mode: str) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=ROOT, CRICKET_ASYNC_MODE=async_mode)
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process (Linux /proc)"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def process_status(pid: int) -> Dict[str, float]:
+    """Thread count and resident memory (MB) of a process (Linux /proc)"""
+    with open(f"/proc/{pid}/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return {"threads": int(fields["Threads"]), "rss_mb": int(fields["VmRSS"].split()[0]) / 1024}
+
+def run_displays(url: str, count: int, conn):
+    """Client process: connect count display clients and record every broadcast they receive.
+    
+    Reports "connected" and "joined" over conn, then sends the recorded
+    (version, received_at, payload_bytes) tuples once every client has the
+    final version the parent names (or DRAIN_TIMEOUT has passed).
+    """
+    received: List[tuple] = []
+    lock = threading.Lock()
+    joined = threading.Semaphore(0)
+    clients = []
+    
+    def make_client():
+        client = socketio.Client(reconnection=False)
+        state = {"joined": False}
+        
+        def record(data):
+            size = len(json.dumps(data, separators=(",", ":")))
+            with lock:
+                received.append((data.get("version"), time.time(), size))
+            if not state["joined"]:
+                state["joined"] = True
+                joined.release()
+        
+        # display.js follows a newly created match and gets a full update on joining
+        client.on("match_available", lambda data: client.emit("join_match", {"match_id": data["match_id"]}))
+        client.on("match_update", record)
+        client.on("match_delta", record)
+        client.connect(url, transports=["websocket"])
+        return client
+    
+    for _ in range(count):
+        clients.append(make_client())
+    conn.send("connected")
+    for _ in range(count):
+        joined.acquire()
+    conn.send("joined")
+    final_version = conn.recv()
+    deadline = time.time() + DRAIN_TIMEOUT
+    while time.time() < deadline:
+        with lock:
+            if sum(1 for version, _, _ in received if version == final_version) >= count:
+                break
+        time.sleep(0.05)
+    with lock:
+        conn.send(list(received))
+    for client in clients:
+        client.disconnect()
+
+class RemoteScorer:
+    """Match stand-in for play_match() that sends each command to the server like the control panel.
+    
+    Commands are applied to a local shadow Match too, so play_match() can pick
+    batters and bowlers and the expected version of each broadcast is known.
+    """
+    
+    def __init__(self, shadow, client: socketio.Client, match_id: str):
+        self.shadow = shadow
+        self.client = client
+        self.match_id = match_id
+        # Version broadcast after each add_ball -> time the scorer emitted it
+        self.ball_sent_at: Dict[int, float] = {}
+    
+    def __getattr__(self, name):
+        attribute = getattr(self.shadow, name)
+        if name not in SCORER_EVENTS:
+            return attribute
+        
+        def command(*args, **kwargs):
+            arguments = signature(attribute).bind(*args, **kwargs).arguments
+            payload = {key: value.value if isinstance(value, Enum) else value for key, value in arguments.items()}
+            payload["match_id"] = self.match_id
+            sent_at = time.time()
+            # call() waits for the handler to finish, as a scorer waits for the panel
+            self.client.call(name, payload, timeout=60)
+            result = attribute(*args, **kwargs)
+            if name == "add_ball":
+                self.ball_sent_at[self.shadow.version] = sent_at
+            return result
+        return command
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def run_scenario(async_mode: str, clients: int, overs: int, client_processes: int, seed: int) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="socket_load_")
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = start_server(port, workdir, async_mode)
+    workers = []
+    try:
+        processes = max(1, min(client_processes, clients))
+        for index in range(processes):
+            parent_end, child_end = multiprocessing.Pipe()
+            share = clients // processes + (1 if index < clients % processes else 0)
+            process = multiprocessing.Process(target=run_displays, args=(url, share, child_end), daemon=True)
+            process.start()
+            workers.append((process, parent_end))
+        for _, conn in workers:
+            conn.recv()
+        
+        scorer = socketio.Client(reconnection=False)
+        created = threading.Event()
+        match_ids = []
+        scorer.on("match_created", lambda data: (match_ids.append(data["match_id"]), created.set()))
+        scorer.connect(url, transports=["websocket"])
+        shadow = new_match(overs)
+        scorer.emit("create_match", {
+            "team1": "Lions", "team2": "Tigers", "total_overs": overs,
+            "toss_winner": "Lions", "toss_decision": "bat",
+            "team1_players": shadow.team1.players, "team2_players": shadow.team2.players,
+        })
+        if not created.wait(60):
+            raise RuntimeError("Match was not created")
+        for _, conn in workers:
+            conn.recv()
+        connected = process_status(server.pid)
+        
+        remote = RemoteScorer(shadow, scorer, match_ids[0])
+        cpu_before, started = cpu_seconds(server.pid), time.time()
+        play_match(remote, seed=seed, undo_rate=0.0, innings=1)
+        elapsed = time.time() - started
+        
+        received = []
+        for _, conn in workers:
+            conn.send(shadow.version)
+        for _, conn in workers:
+            received.extend(conn.recv())
+        cpu_used = cpu_seconds(server.pid) - cpu_before
+        cpu_elapsed = time.time() - started
+        scorer.disconnect()
+    finally:
+        for process, _ in workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+        server.kill()
+        server.wait()
+    
+    latencies, sizes = [], []
+    for version, received_at, size in received:
+        sent_at = remote.ball_sent_at.get(version)
+        if sent_at is not None:
+            latencies.append((received_at - sent_at) * 1000)
+            sizes.append(size)
+    balls = len(remote.ball_sent_at)
+    return {
+        "async_mode": async_mode,
+        "clients": clients,
+        "overs": overs,
+        "balls": balls,
+        "delivered": len(latencies) / max(balls * clients, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "payload_avg": sum(sizes) / len(sizes) if sizes else 0,
+        "payload_max": max(sizes) if sizes else 0,
+        "server_cpu_pct": 100 * cpu_used / cpu_elapsed if cpu_elapsed else 0.0,
+        "balls_per_sec": balls / elapsed if elapsed else 0.0,
+        "server_threads": connected["threads"],
+        "server_rss_mb": connected["rss_mb"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Socket.IO broadcast latency with many display clients")
+    parser.add_argument("--async-modes", default="threading", help="comma-separated server modes (CRICKET_ASYNC_MODE)")
+    parser.add_argument("--clients", default="10,100,1000", help="comma-separated display client counts")
+    parser.add_argument("--overs", default="5,20", help="comma-separated innings lengths")
+    parser.add_argument("--client-processes", type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help="processes the display clients are spread over")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.serve)
+        return
+    
+    results = []
+    for async_mode in args.async_modes.split(","):
+        for clients in [int(value) for value in args.clients.split(",")]:
+            for overs in [int(value) for value in args.overs.split(",")]:
+                result = run_scenario(async_mode, clients, overs, args.client_processes, args.seed)
+                results.append(result)
+                if not args.json:
+                    print(f"{result['async_mode']:9} {result['clients']:6} clients {result['overs']:3} overs "
+                          f"{result['balls']:4} balls  "
+                          f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+                          f"payload {result['payload_avg']:6.0f} B avg {result['payload_max']:6} B max  "
+                          f"server CPU {result['server_cpu_pct']:5.1f}%  "
+                          f"{result['server_threads']:5} threads {result['server_rss_mb']:6.1f} MB  "
+                          f"delivered {result['delivered']:.1%}",
+                          flush=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Synthetic matches for benchmarks, scored through the public Match API like the control panel does"""
+import os
+import random
+import sys
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Match, WicketType, ExtraType
+
+# Formats benchmarked by default: name -> overs per innings
+FORMATS = {
+    "t20": 20,
+    "odi": 50,
+    "long": 90,
+}
+
+# Chance of a wicket off any delivery; about ten in an ODI innings
+WICKET_RATE = 0.035
+# Innings longer than an ODI lose wickets more slowly, so they last their overs
+# rather than ending all out after as many balls as an ODI innings
+LONG_WICKET_RATE = 0.012
+
+def new_match(total_overs: int, squad_size: int = 11) -> Match:
+    match = Match("Lions", "Tigers", total_overs)
+    for number in range(1, squad_size + 1):
+        match.add_player(f"Lions {number}", "Lions")
+        match.add_player(f"Tigers {number}", "Tigers")
+    match.set_toss("Lions", "bat")
+    return match
+
+def _wicket_rate(total_overs: int) -> float:
+    return LONG_WICKET_RATE if total_overs > FORMATS["odi"] else WICKET_RATE
+
+def random_delivery(rng: random.Random, match: Match):
+    """add_ball() arguments with a realistic mix of dots, boundaries, extras and wickets"""
+    roll = rng.random()
+    rate = _wicket_rate(match.total_overs)
+    if roll < rate:
+        wicket_type = rng.choice([WicketType.BOWLED, WicketType.CAUGHT, WicketType.LBW,
+                                  WicketType.CAUGHT, WicketType.RUN_OUT, WicketType.STUMPED])
+        return dict(runs=0, is_wicket=True, wicket_type=wicket_type, dismissed_player=match.striker)
+    roll -= rate
+    if roll < 0.03:
+        return dict(runs=0, extra_type=ExtraType.WIDE, extra_runs=1)
+    if roll < 0.04:
+        return dict(runs=rng.choice([0, 0, 1, 4]), extra_type=ExtraType.NO_BALL, extra_runs=1)
+    if roll < 0.055:
+        return dict(runs=0, extra_type=rng.choice([ExtraType.BYE, ExtraType.LEG_BYE]), extra_runs=rng.choice([1, 1, 4]))
+    return dict(runs=rng.choice([0, 0, 0, 0, 1, 1, 1, 2, 2, 3, 4, 4, 6]))
+
+def _next_batter(match: Match) -> Optional[str]:
+    out = {wicket["player"] for wicket in match.fall_of_wickets}
+    for player in match.batting_team.players:
+        if player not in out and player not in (match.striker, match.non_striker) \
+                and match.players[player].balls_faced == 0:
+            return player
+    return None
+
+def _next_bowler(rng: random.Random, match: Match) -> str:
+    previous = match.overs[-1].bowler if match.overs else None
+    return rng.choice([player for player in match.bowling_team.players[-5:] if player != previous])
+
+def play_match(match: Match, seed: int = 1, undo_rate: float = 0.01, max_balls: Optional[int] = None,
+               innings: int = 2) -> Match:
+    """Score a whole match (both innings, or just the first) ball by ball, with the odd undo"""
+    rng = random.Random(seed)
+    batting = match.batting_team.players
+    match.start_innings(batting[0], batting[1], _next_bowler(rng, match))
+    balls = 0
+    while not match.is_finished and (max_balls is None or balls < max_balls):
+        if balls and rng.random() < undo_rate and match.overs[-1].balls \
+                and not match.overs[-1].balls[-1].is_wicket:
+            match.undo_last_ball()
+        result = match.add_ball(**random_delivery(rng, match))
+        balls += 1
+        action = result.get("action")
+        if action == "innings_complete":
+            if innings == 1:
+                break
+            batting = match.batting_team.players
+            match.start_second_innings(batting[0], batting[1], _next_bowler(rng, match))
+            continue
+        if action == "over_complete":
+            match.set_new_bowler(_next_bowler(rng, match))
+        if action == "wicket" or result.get("wicket"):
+            batter = _next_batter(match)
+            if batter:
+                match.set_new_batter(batter)
+    return match
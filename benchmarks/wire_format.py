@@ -0,0 +1,98 @@
+"""Bytes sent to a display per wire format, for the matches saved in data/.
+
+Replays each match's command stream (or one inferred from the stored balls)
+and counts what a display following it would receive: the full match_update
+on joining, then one match_delta per visible change, as app.py broadcasts
+them. Every encoding is checked to decode back to the original payload.
+
+For comparison, the "+ websocket deflate" rows estimate the uncompressed
+formats sent over a WebSocket with permessage-deflate (one compression
+context kept for the whole connection), which browsers negotiate on their
+own when the server and any proxies in between allow it.
+
+Run from the repository root:
+
+    python benchmarks/wire_format.py [data_dir]
+"""
+import argparse
+import glob
+import os
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastjson
+import wire
+from models import Match, diff_status
+from replay import read_command_stream, synthesize_command_stream
+
+def broadcast_payloads(snapshot_path: str):
+    """Payloads a display receives while the match is scored: the final match_update and every match_delta"""
+    records = read_command_stream(snapshot_path) or synthesize_command_stream(Match.load_from_file(snapshot_path))
+    match = Match.create(**records[0]["args"])
+    previous = match.get_current_status()
+    deltas = []
+    for record in records[1:]:
+        match._replay_command(record)
+        status = match.get_current_status()
+        delta = diff_status(previous, status)
+        if delta["changes"].keys() - {"version"} or delta["players"] or delta["overs"]:
+            deltas.append(delta)
+        previous = status
+    return previous, deltas
+
+def websocket_deflate_size(payloads, wire_format: wire.WireFormat) -> int:
+    """Size of payloads sent as WebSocket messages through one permessage-deflate context"""
+    compressor = zlib.compressobj(wire.DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    total = 0
+    for payload in payloads:
+        encoded = wire.encode(payload, wire_format)
+        data = encoded if wire_format.is_binary else fastjson.dumps(encoded)
+        # Each message is flushed and sent without its trailing 00 00 ff ff (RFC 7692)
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+def encoded_size(payloads, wire_format: wire.WireFormat) -> int:
+    total = 0
+    for payload in payloads:
+        encoded = wire.encode(payload, wire_format)
+        if wire.decode(encoded, wire_format) != payload:
+            raise AssertionError(f"{wire_format.name} does not round-trip")
+        total += len(encoded if wire_format.is_binary else fastjson.dumps(encoded))
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure match payload sizes per wire format")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    args = parser.parse_args()
+    
+    paths = sorted(glob.glob(os.path.join(args.data_dir, "match_*.json")))
+    if not paths:
+        print(f"No saved matches in {args.data_dir}")
+        sys.exit(1)
+    
+    formats = wire.variants()
+    totals = {"full": {}, "deltas": {}}
+    for path in paths:
+        status, deltas = broadcast_payloads(path)
+        for kind, payloads in (("full", [status]), ("deltas", deltas)):
+            sizes = totals[kind]
+            for wire_format in formats:
+                sizes[wire_format.name] = sizes.get(wire_format.name, 0) + encoded_size(payloads, wire_format)
+            for wire_format in formats:
+                if wire_format.compression == "none":
+                    name = f"{wire_format.name} + websocket deflate"
+                    sizes[name] = sizes.get(name, 0) + websocket_deflate_size(payloads, wire_format)
+        print(f"{os.path.basename(path)}: {len(deltas)} deltas, final status {len(fastjson.dumps(status))} bytes as JSON")
+    
+    if "msgpack" not in wire.FORMATS:
+        print("msgpack is not installed, only JSON formats measured")
+    for kind, label in (("full", "match_update (final status, once per match)"), ("deltas", "match_delta (whole match)")):
+        sizes = totals[kind]
+        print(f"\n{label}")
+        for name, size in sizes.items():
+            print(f"  {name:28} {size:10,} bytes   {1 - size / sizes['json']:6.1%} smaller than JSON")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Tuple
+
+# Sort orders accepted by MatchCatalog.query(), "-" prefix for descending
+SORT_COLUMNS = {
+    "date": "played_at",
+    "team1": "team1 COLLATE NOCASE",
+    "team2": "team2 COLLATE NOCASE",
+    "overs": "total_overs",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    team1 TEXT NOT NULL,
+    team2 TEXT NOT NULL,
+    played_at TEXT NOT NULL,
+    total_overs INTEGER NOT NULL,
+    is_started INTEGER NOT NULL,
+    is_finished INTEGER NOT NULL,
+    winner TEXT NOT NULL,
+    match_result TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_played_at ON matches (played_at);
+CREATE INDEX IF NOT EXISTS matches_team1 ON matches (team1 COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS matches_team2 ON matches (team2 COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS matches_finished ON matches (is_finished, played_at);
+"""
+
+def played_at_from_id(match_id: str) -> str:
+    """Match ids start with their creation time, e.g. 20250922_174906_3fa2c1 -> 2025-09-22 17:49:06"""
+    try:
+        return datetime.strptime(match_id[:15], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return ""
+
+def _check_date(value: str, name: str) -> str:
+    """A filter date as YYYY-MM-DD, or ValueError"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid {name} date: {value!r} (expected YYYY-MM-DD)")
+
+class MatchCatalog:
+    """SQLite index of saved match metadata, so listing never opens match files"""
+
+    def __init__(self, data_dir: str = "data", db_path: str = None):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self.db_path = db_path or os.path.join(data_dir, "catalog.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def record(self, filepath: str, match_data: Dict[str, Any]):
+        """Index (or re-index) a match from the dict written by Match.save_to_file"""
+        info = match_data["match_info"]
+        row = (
+            info["id"],
+            os.path.basename(filepath),
+            info["team1_name"],
+            info["team2_name"],
+            played_at_from_id(info["id"]),
+            info["total_overs"],
+            int(info["is_started"]),
+            int(info["is_finished"]),
+            info["winner"],
+            info.get("match_result", ""),
+            os.path.getmtime(filepath) if os.path.exists(filepath) else 0.0,
+        )
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def sync(self) -> int:
+        """Index match files that are new or changed since they were last indexed.
+
+        Only needed for files written outside the app (or before the catalog
+        existed); saves made by the app update the index directly.
+        """
+        with self._lock:
+            known = {row["filename"]: row["mtime"] for row in self._db.execute("SELECT filename, mtime FROM matches")}
+
+        updated = 0
+        on_disk = set()
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if not (entry.name.startswith("match_") and entry.name.endswith(".json")):
+                    continue
+                on_disk.add(entry.name)
+                if known.get(entry.name) == entry.stat().st_mtime:
+                    continue
+                try:
+                    with open(entry.path, "r") as f:
+                        self.record(entry.path, json.load(f))
+                    updated += 1
+                except (OSError, ValueError, KeyError):
+                    # Unreadable or foreign file, leave it out of the listing
+                    continue
+
+        removed = [(filename,) for filename in known if filename not in on_disk]
+        if removed:
+            with self._lock, self._db:
+                self._db.executemany("DELETE FROM matches WHERE filename = ?", removed)
+        return updated
+
+    def query(self, team: str = None, date_from: str = None, date_to: str = None,
+              finished: Optional[bool] = None, sort: str = "-date",
+              page: int = 1, per_page: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """Filtered, sorted page of matches plus the total number of matches that match"""
+        where, params = [], []
+        if team:
+            where.append("(team1 = ? COLLATE NOCASE OR team2 = ? COLLATE NOCASE)")
+            params += [team, team]
+        if date_from:
+            where.append("played_at >= ?")
+            params.append(_check_date(date_from, "from"))
+        if date_to:
+            # Inclusive of the whole end day
+            where.append("played_at < date(?, '+1 day')")
+            params.append(_check_date(date_to, "to"))
+        if finished is not None:
+            where.append("is_finished = ?")
+            params.append(int(finished))
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        descending = sort.startswith("-")
+        column = SORT_COLUMNS.get(sort.lstrip("-"))
+        if not column:
+            raise ValueError(f"Unknown sort order: {sort}")
+        order_sql = f"ORDER BY {column} {'DESC' if descending else 'ASC'}, id {'DESC' if descending else 'ASC'}"
+
+        page = max(page, 1)
+        per_page = max(1, min(per_page, 500))
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM matches {where_sql}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT * FROM matches {where_sql} {order_sql} LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+
+        matches = [
+            {
+                "id": row["id"],
+                "filename": row["filename"],
+                "team1": row["team1"],
+                "team2": row["team2"],
+                "played_at": row["played_at"],
+                "total_overs": row["total_overs"],
+                "is_started": bool(row["is_started"]),
+                "is_finished": bool(row["is_finished"]),
+                "winner": row["winner"],
+                "match_result": row["match_result"],
+            }
+            for row in rows
+        ]
+        return matches, total
@@ -0,0 +1,356 @@
+"""Several server processes behind one port, with match updates fanned out between them.
+
+    python cluster.py --workers 4 [--port 5000] [--message-queue redis://localhost:6379/0]
+
+Each live match is owned by the one worker that created or loaded it (an
+flock on data/match_<id>.lock, see registry.py). Workers share a pub/sub
+channel: the owner publishes every match update on it and each worker sends
+it on to its own display clients, and events naming a match owned by another
+worker are passed on to the owner. The channel is a python-socketio pub/sub
+client manager, so emits to a client on another worker also go through it.
+
+Without --message-queue the launcher runs a LocalHub, a Unix socket that
+relays every message to every worker, so nothing else needs installing.
+redis://, kafka:// and Kombu URLs (amqp://...) use those brokers instead.
+
+Workers accept connections from one listening socket they inherit from the
+launcher. Socket.IO is limited to the WebSocket transport in this mode, so a
+session is a single TCP connection and always stays on the worker that
+accepted it; HTTP long-polling would need sticky routing in front instead.
+"""
+import argparse
+import os
+import pickle
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import socketio
+
+# Marks pub/sub messages meant for Cluster rather than python-socketio
+CLUSTER_METHOD = "cricket_cluster"
+# Workers re-announce their live matches this often, and the others forget a
+# match not announced for three intervals (its worker has died)
+ANNOUNCE_INTERVAL = 5.0
+
+_FRAME_HEADER = struct.Struct("!I")
+
+def _send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def _recv_frame(sock: socket.socket) -> Optional[bytes]:
+    header = _recv_exactly(sock, _FRAME_HEADER.size)
+    if header is None:
+        return None
+    return _recv_exactly(sock, _FRAME_HEADER.unpack(header)[0])
+
+class LocalHub:
+    """Pub/sub relay on a Unix socket: every frame a worker sends is passed to every connected worker"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._clients: Dict[socket.socket, threading.Lock] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen()
+    
+    def start(self):
+        threading.Thread(target=self._accept, name="cluster-hub", daemon=True).start()
+    
+    def _accept(self):
+        while True:
+            client, _ = self._server.accept()
+            with self._lock:
+                self._clients[client] = threading.Lock()
+            threading.Thread(target=self._relay, args=(client,), name="cluster-hub-client", daemon=True).start()
+    
+    def _relay(self, client: socket.socket):
+        try:
+            while True:
+                frame = _recv_frame(client)
+                if frame is None:
+                    break
+                with self._lock:
+                    clients = list(self._clients.items())
+                for other, send_lock in clients:
+                    try:
+                        with send_lock:
+                            _send_frame(other, frame)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._clients.pop(client, None)
+            client.close()
+
+class ClusterMessages:
+    """Mixin for python-socketio pub/sub managers that hands Cluster messages to a callback.
+    
+    Everything else on the channel goes on to python-socketio as usual.
+    """
+    cluster_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    
+    def publish_cluster(self, message: Dict[str, Any]):
+        self._publish(dict(message, method=CLUSTER_METHOD))
+    
+    def _listen(self):
+        for message in super()._listen():
+            data = message
+            if isinstance(message, bytes):
+                try:
+                    data = pickle.loads(message)
+                except Exception:
+                    # Not ours; python-socketio also accepts JSON messages
+                    yield message
+                    continue
+            if isinstance(data, dict) and data.get("method") == CLUSTER_METHOD:
+                if self.cluster_callback:
+                    try:
+                        self.cluster_callback(data)
+                    except Exception:
+                        self._get_logger().exception("Cluster message %s failed", data.get("kind"))
+            else:
+                yield data
+
+class LocalHubManager(socketio.PubSubManager):
+    """python-socketio client manager using a LocalHub (unix:///path/to/hub.sock) as its message queue"""
+    name = "local"
+    
+    def __init__(self, url: str, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = urlparse(url).path
+        self._publisher: Optional[socket.socket] = None
+        self._publish_lock = threading.Lock()
+    
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        return sock
+    
+    def _publish(self, data):
+        payload = pickle.dumps(data)
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect()
+                    _send_frame(self._publisher, payload)
+                    return
+                except OSError:
+                    if self._publisher:
+                        self._publisher.close()
+                    self._publisher = None
+                    if attempt:
+                        raise
+    
+    def _listen(self):
+        while True:
+            try:
+                sock = self._connect()
+            except OSError:
+                time.sleep(1)
+                continue
+            try:
+                while True:
+                    frame = _recv_frame(sock)
+                    if frame is None:
+                        break
+                    yield frame
+            except OSError:
+                pass
+            finally:
+                sock.close()
+            # Lost the hub, keep trying until it is back
+            time.sleep(1)
+
+class LocalClusterManager(ClusterMessages, LocalHubManager):
+    pass
+
+class RedisClusterManager(ClusterMessages, socketio.RedisManager):
+    pass
+
+class KafkaClusterManager(ClusterMessages, socketio.KafkaManager):
+    pass
+
+class KombuClusterManager(ClusterMessages, socketio.KombuManager):
+    pass
+
+def make_client_manager(url: Optional[str]) -> Optional[socketio.PubSubManager]:
+    """python-socketio client manager for a message queue URL, or None for a single process"""
+    if not url:
+        return None
+    scheme = urlparse(url).scheme
+    if scheme == "unix":
+        return LocalClusterManager(url)
+    if scheme in ("redis", "rediss"):
+        return RedisClusterManager(url)
+    if scheme == "kafka":
+        return KafkaClusterManager(url)
+    return KombuClusterManager(url)
+
+@dataclass
+class RemoteMatch:
+    """A match live in another worker, as of its latest update"""
+    status: Dict[str, Any]
+    last_active: float
+    worker_id: str
+    heard_at: float
+
+class Cluster:
+    """The other worker processes, as seen from this one.
+    
+    Messages are dicts with a "kind"; handlers for each kind are registered
+    with on(). Without a pub/sub manager there is only this process, and
+    publish() calls the handler directly. Matches live in other workers are
+    tracked from their updates and announcements with remember().
+    """
+    
+    def __init__(self, manager: Optional[socketio.PubSubManager] = None):
+        self.manager = manager
+        self.worker_id = uuid.uuid4().hex
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._remote: Dict[str, RemoteMatch] = {}
+        self._lock = threading.Lock()
+        if manager:
+            manager.cluster_callback = self._dispatch
+    
+    @property
+    def enabled(self) -> bool:
+        return self.manager is not None
+    
+    def on(self, kind: str):
+        """Decorator registering the handler for one kind of message"""
+        def decorator(handler):
+            self._handlers[kind] = handler
+            return handler
+        return decorator
+    
+    def publish(self, kind: str, **fields):
+        """Send a message to every worker, this one included"""
+        message = dict(fields, kind=kind, worker_id=self.worker_id)
+        if self.manager:
+            self.manager.publish_cluster(message)
+        else:
+            self._dispatch(message)
+    
+    def remember(self, message: Dict[str, Any]):
+        """Note a match announced or updated by another worker"""
+        if message["worker_id"] == self.worker_id:
+            return
+        with self._lock:
+            self._remote[message["match_id"]] = RemoteMatch(
+                message["status"], message["last_active"], message["worker_id"], time.monotonic())
+    
+    def forget(self, match_id: str):
+        with self._lock:
+            self._remote.pop(match_id, None)
+    
+    def remote_matches(self) -> Dict[str, RemoteMatch]:
+        """Matches live in other workers"""
+        cutoff = time.monotonic() - 3 * ANNOUNCE_INTERVAL
+        with self._lock:
+            for match_id in [match_id for match_id, remote in self._remote.items() if remote.heard_at < cutoff]:
+                del self._remote[match_id]
+            return dict(self._remote)
+    
+    def _dispatch(self, message: Dict[str, Any]):
+        handler = self._handlers.get(message.get("kind"))
+        if handler:
+            handler(message)
+
+def serve(app, socketio_server, listen_fd: int, log_output: bool = True):
+    """Serve the app from a listening socket inherited from the launcher"""
+    sock = socket.socket(fileno=listen_fd)
+    if socketio_server.server.eio.async_mode == "gevent":
+        from gevent import pywsgi
+        try:
+            from geventwebsocket.handler import WebSocketHandler
+            options = {"handler_class": WebSocketHandler}
+        except ImportError:
+            options = {}
+        pywsgi.WSGIServer(sock, app, log="default" if log_output else None, **options).serve_forever()
+    else:
+        from werkzeug.serving import make_server
+        host, port = sock.getsockname()[:2]
+        make_server(host, port, app, threaded=True, fd=sock.detach()).serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several app.py workers behind one port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--message-queue", help="redis://, kafka:// or Kombu URL (default: a local hub)")
+    args = parser.parse_args()
+    
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+    
+    message_queue = args.message_queue
+    if not message_queue:
+        hub = LocalHub(os.path.join(tempfile.mkdtemp(prefix="cricket_"), "hub.sock"))
+        hub.start()
+        message_queue = f"unix://{hub.path}"
+    
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    env = dict(os.environ, CRICKET_MESSAGE_QUEUE=message_queue, CRICKET_LISTEN_FD=str(listener.fileno()))
+    
+    def start_worker() -> subprocess.Popen:
+        return subprocess.Popen([sys.executable, app_path], env=env, pass_fds=(listener.fileno(),))
+    
+    workers = [start_worker() for _ in range(args.workers)]
+    print(f"{args.workers} workers on http://{args.host}:{args.port} sharing {message_queue}")
+    
+    stopping = False
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while not stopping:
+            time.sleep(0.5)
+            for index, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    # A crashed worker's matches are unlocked and can be loaded again elsewhere
+                    print(f"Worker {worker.pid} exited with status {worker.returncode}, restarting")
+                    workers[index] = start_worker()
+    finally:
+        for worker in workers:
+            worker.send_signal(signal.SIGINT)
+        for worker in workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+if __name__ == "__main__":
+    main()
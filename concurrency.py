@@ -0,0 +1,30 @@
+"""How the server handles concurrent connections, chosen with CRICKET_ASYNC_MODE.
+
+"threading" (the default) serves each Socket.IO connection from its own OS
+thread. "gevent" serves them all from green threads on one event loop, so
+thousands of idle displays cost little more than their sockets; it needs
+pip install gevent gevent-websocket.
+
+gevent has to patch the standard library before anything else imports it,
+so app.py imports this module first. Blocking work that would stall every
+connection while it runs (fsyncs, waiting for the stats process) goes
+through run_blocking(), which hands it to a real OS thread in gevent mode.
+"""
+import os
+
+ASYNC_MODES = ("threading", "gevent")
+ASYNC_MODE = os.environ.get("CRICKET_ASYNC_MODE", "threading")
+
+if ASYNC_MODE not in ASYNC_MODES:
+    raise ValueError(f"CRICKET_ASYNC_MODE must be one of {', '.join(ASYNC_MODES)}, not {ASYNC_MODE!r}")
+
+if ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    import gevent
+
+def run_blocking(fn, *args, **kwargs):
+    """fn(*args, **kwargs), run off the event loop when there is one"""
+    if ASYNC_MODE == "gevent":
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
@@ -0,0 +1,57 @@
+"""JSON encoding through orjson when it is installed, with the standard library as fallback.
+
+Output is byte-for-byte what the json module produces with the same settings
+(ASCII-only, compact or indent=2), so saved files and Socket.IO payloads don't
+depend on which backend is in use. orjson is only trusted for all-ASCII output
+with string keys; anything else is re-encoded with the json module.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON, as json.dumps(obj, separators=(",", ":"))"""
+    if orjson:
+        try:
+            encoded = orjson.dumps(obj)
+            if encoded.isascii():
+                return encoded
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode("ascii")
+
+def dumps_indented(obj: Any) -> bytes:
+    """Indented JSON, as json.dumps(obj, indent=2)"""
+    if orjson:
+        try:
+            encoded = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+            if encoded.isascii():
+                return encoded
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=2).encode("ascii")
+
+class SocketIOJSON:
+    """json-module stand-in for python-socketio's packet encoder"""
+    
+    @staticmethod
+    def dumps(obj: Any, *args, **kwargs) -> str:
+        if not args and kwargs == {"separators": (",", ":")}:
+            return dumps(obj).decode("ascii")
+        return json.dumps(obj, *args, **kwargs)
+    
+    @staticmethod
+    def loads(s, *args, **kwargs) -> Any:
+        if orjson and not args and not kwargs:
+            try:
+                return orjson.loads(s)
+            except ValueError:
+                # e.g. integers beyond 64 bits, which json accepts
+                pass
+        return json.loads(s, *args, **kwargs)
@@ -0,0 +1,219 @@
+"""Content-addressed storage for uploaded team flags.
+
+An upload is stored once under the hash of its bytes, however many times and
+for however many teams it is uploaded, and resized at upload time to the sizes
+the pages show flags at, as PNG and (where Pillow supports it) WebP. Stored
+files never change, so the app serves them from /flags/ with immutable
+caching. A JSON record next to each image lists its files and the teams it
+was uploaded for.
+
+The list of flags by team is kept in memory, sorted by team name for prefix
+search, and read again from the records only when the directory's mtime shows
+that something else (another worker process, a copied-in file) changed it.
+
+Resizing needs Pillow (in requirements.txt). Without it, and for SVGs, only
+the original is stored, and the app warns about it at startup.
+"""
+import bisect
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional, Any, Tuple
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError, features
+except ImportError:
+    Image = None
+
+# Boxes each flag is fitted into: the control panel's previews and the display's
+# 180x120 flag, both at twice their CSS size for high-density screens
+SIZES = {"thumb": (96, 64), "display": (360, 240)}
+WEBP = bool(Image) and features.check("webp")
+HASH_LENGTH = 16
+URL_PREFIX = "/flags/"
+# Names of stored files: the hash, then the size for resized copies
+STORED_NAME = re.compile(r"^[0-9a-f]{%d}(-[a-z]+)?\.[a-z]+$" % HASH_LENGTH)
+# Uploads saved by earlier versions as {team}_{uuid}.ext
+LEGACY_NAME = re.compile(r"^(.+)_[0-9a-f]{8}\.(png|jpe?g|gif|svg)$", re.IGNORECASE)
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def is_stored_name(filename: str) -> bool:
+    """Whether filename is one of the store's images (and so never changes)"""
+    return bool(STORED_NAME.match(filename)) and not filename.endswith(".json")
+
+@dataclass
+class FlagRecord:
+    """One stored image: its files by variant ("original", "display", "display_webp", ...) and its teams"""
+    hash: str
+    files: Dict[str, str]
+    teams: List[str] = field(default_factory=list)
+    uploaded_at: float = 0.0
+    
+    def url(self, variant: Optional[str] = None) -> str:
+        """URL of a variant, by default the best one for showing the flag on a display"""
+        if variant is None:
+            variant = next(name for name in ("display_webp", "display", "original") if name in self.files)
+        return URL_PREFIX + self.files[variant]
+    
+    def thumbnail_url(self) -> str:
+        variant = next(name for name in ("thumb_webp", "thumb", "original") if name in self.files)
+        return self.url(variant)
+    
+    def entry(self, team_name: str) -> Dict[str, Any]:
+        """How /api/saved-flags lists this flag for one of its teams"""
+        return {
+            "filename": self.files["original"],
+            "team_name": team_name,
+            "url": self.url(),
+            "thumbnail_url": self.thumbnail_url()
+        }
+
+class FlagStore:
+    """Flag images in one directory, named by content hash"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Held while a record is read, changed and written back, and around the index
+        self._lock = threading.Lock()
+        # (lowercased team name, team name, hash) of every flag and team, sorted, with
+        # the entries they list in the same order; None until first searched
+        self._keys: Optional[List[Tuple[str, str, str]]] = None
+        self._entries: List[Dict[str, Any]] = []
+        # Directory mtime the index reflects
+        self._index_mtime = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def record_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.json")
+    
+    def read(self, digest: str) -> Optional[FlagRecord]:
+        try:
+            with open(self.record_path(digest)) as f:
+                return FlagRecord(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+    
+    def records(self) -> List[FlagRecord]:
+        """Every stored flag"""
+        records = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json") and STORED_NAME.match(filename):
+                record = self.read(filename[:-len(".json")])
+                if record:
+                    records.append(record)
+        return records
+    
+    def save(self, data: bytes, extension: str, team_name: str = "") -> FlagRecord:
+        """Store an upload (once per distinct content) and note the team it is for.
+        
+        Raises ValueError if Pillow is installed and cannot read a raster image.
+        """
+        extension = extension.lower().replace("jpeg", "jpg")
+        digest = content_hash(data)
+        with self._lock:
+            # Only an index that was current before these writes can be kept current
+            index_current = self._keys is not None and self._directory_mtime() == self._index_mtime
+            record = self.read(digest)
+            if record is None:
+                files = {"original": f"{digest}.{extension}"}
+                if extension != "svg":
+                    files.update(self._resize(digest, data))
+                self._write(files["original"], data)
+                record = FlagRecord(digest, files, uploaded_at=time.time())
+            elif not team_name or team_name in record.teams:
+                return record
+            if team_name:
+                record.teams.append(team_name)
+            self._write(f"{digest}.json", json.dumps(asdict(record), indent=2).encode())
+            if index_current and team_name:
+                self._add_to_index(record, team_name)
+                self._index_mtime = self._directory_mtime()
+            return record
+    
+    def search(self, prefix: str = "", page: int = 1, per_page: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """A page of flags whose team name starts with prefix (ignoring case), by team name, plus how many match"""
+        page = max(page, 1)
+        per_page = max(1, min(per_page, 500))
+        prefix = prefix.lower()
+        with self._lock:
+            if self._keys is None or self._directory_mtime() != self._index_mtime:
+                self._rebuild_index()
+            start = bisect.bisect_left(self._keys, (prefix,))
+            end = bisect.bisect_left(self._keys, (prefix + "\U0010ffff",)) if prefix else len(self._keys)
+            first = start + (page - 1) * per_page
+            return self._entries[first:min(first + per_page, end)], end - start
+    
+    def _directory_mtime(self) -> int:
+        # Adding, replacing or removing a file changes it, and every write here ends in an os.replace()
+        return os.stat(self.directory).st_mtime_ns
+    
+    def _rebuild_index(self):
+        self._index_mtime = self._directory_mtime()
+        rows = sorted(((team_name.lower(), team_name, record.hash), record)
+                      for record in self.records() for team_name in record.teams)
+        self._keys = [key for key, _ in rows]
+        self._entries = [record.entry(key[1]) for key, record in rows]
+    
+    def _add_to_index(self, record: FlagRecord, team_name: str):
+        key = (team_name.lower(), team_name, record.hash)
+        position = bisect.bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._entries.insert(position, record.entry(team_name))
+    
+    def import_legacy(self) -> int:
+        """Store uploads saved as {team}_{uuid}.ext before flags were content-addressed; returns how many.
+        
+        The old files stay where they are, since saved matches link to them.
+        """
+        imported = 0
+        for filename in sorted(os.listdir(self.directory)):
+            legacy = LEGACY_NAME.match(filename)
+            if not legacy:
+                continue
+            with open(os.path.join(self.directory, filename), "rb") as f:
+                data = f.read()
+            try:
+                self.save(data, legacy.group(2), legacy.group(1))
+                imported += 1
+            except ValueError as e:
+                print(f"Skipping flag {filename}: {e}")
+        return imported
+    
+    def _resize(self, digest: str, data: bytes) -> Dict[str, str]:
+        """Write a copy fitted into each of SIZES; returns their files by variant"""
+        if Image is None:
+            return {}
+        try:
+            image = Image.open(io.BytesIO(data))
+            image = ImageOps.exif_transpose(image).convert("RGBA")
+        except (UnidentifiedImageError, OSError):
+            raise ValueError("Not a readable image")
+        files = {}
+        for variant, size in SIZES.items():
+            resized = image.copy()
+            # Only ever shrinks, so small flags keep their size
+            resized.thumbnail(size, Image.LANCZOS)
+            formats = [("png", variant, {"optimize": True})]
+            if WEBP:
+                formats.append(("webp", f"{variant}_webp", {"quality": 90, "method": 6}))
+            for extension, name, options in formats:
+                buffer = io.BytesIO()
+                resized.save(buffer, extension.upper(), **options)
+                files[name] = f"{digest}-{variant}.{extension}"
+                self._write(files[name], buffer.getvalue())
+        return files
+    
+    def _write(self, filename: str, data: bytes):
+        """Write a file through a temp file swapped in, so readers never see part of it"""
+        path = os.path.join(self.directory, filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
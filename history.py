@@ -0,0 +1,167 @@
+"""Command history of a match, for undo, redo and rewinding to any ball.
+
+Every scoring command that changes the match is recorded in order, along with
+a checkpoint of the match state every CHECKPOINT_INTERVAL commands. Moving to
+another point in the history restores the nearest checkpoint at or before it
+and re-runs the commands from there, so it costs at most CHECKPOINT_INTERVAL
+commands however long the match is. Commands undone stay recorded for redo
+until a new command replaces them.
+
+Going back over balls of the over in progress (and the new batters after
+them) skips the checkpoint: the match takes the balls back out directly.
+
+Undo, redo and rewinds move between "ball boundaries": the state just before
+a ball is bowled, which includes any bowler or batter changes after the
+previous ball.
+"""
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+# Commands between checkpoints. Lower makes undo faster and scoring slower;
+# 30 is about five overs with their bowler changes.
+CHECKPOINT_INTERVAL = 30
+
+# Marks where a point in the history is: (innings, legal balls bowled in it)
+Mark = Tuple[int, int]
+
+def ball_mark(match) -> Mark:
+    return match.current_innings, (match.current_over - 1) * 6 + match.current_ball
+
+class MatchHistory:
+    """The commands applied to one match and where in them the match currently is.
+    
+    A match loaded from a snapshot starts with an incomplete history that
+    only knows the commands since; Match rebuilds it from the journal the
+    first time something asks to move.
+    """
+    
+    def __init__(self, complete: bool = True, journal_path: Optional[str] = None, redo_saved: bool = False):
+        self.complete = complete
+        self.journal_path = journal_path
+        # Whether the snapshot an incomplete history was loaded with had balls to redo
+        self.redo_saved = redo_saved
+        self.started = False
+        # (command, args, kwargs) of every recorded command, including undone ones
+        self.commands: List[Tuple[str, tuple, Dict[str, Any]]] = []
+        # Match.version each command was first applied at (its journal seq),
+        # which it is applied at again when replayed
+        self.versions: List[int] = []
+        # Number of commands in effect; commands[position:] can be redone
+        self.position = 0
+        # ball_mark() after each number of commands, which only ever grows
+        self.marks: List[Mark] = []
+        # Number of commands -> Match._checkpoint() of the state after them
+        self.checkpoints: Dict[int, Any] = {}
+        # Index of the first add_ball in commands
+        self.first_ball: Optional[int] = None
+        # Off while commands are replayed in bulk; seek() takes the checkpoints missed
+        self.checkpointing = True
+    
+    def begin(self, match):
+        """Take the state before the first recorded command as the starting point"""
+        self.started = True
+        self.checkpoints[0] = match._checkpoint()
+        self.marks.append(ball_mark(match))
+    
+    def record(self, match, command: str, args: tuple, kwargs: Dict[str, Any]):
+        """Add a command just applied to the match, dropping anything that could have been redone"""
+        if self.position < len(self.commands):
+            self._truncate()
+        if self.first_ball is None and command == "add_ball":
+            self.first_ball = self.position
+        self.commands.append((command, args, kwargs))
+        self.versions.append(match.version)
+        # ball_mark(), inlined as this runs for every command
+        self.marks.append((match.current_innings, (match.current_over - 1) * 6 + match.current_ball))
+        self.position += 1
+        if self.checkpointing and not self.position % CHECKPOINT_INTERVAL:
+            self.checkpoints[self.position] = match._checkpoint()
+    
+    def extend(self, later: 'MatchHistory', joined: Any, joined_mark: Mark):
+        """Carry on with the commands of a history that started where this one ends.
+        
+        joined is the checkpoint of the state at the join (later's starting point,
+        which this history may only have approximated) and joined_mark its ball_mark().
+        """
+        offset = len(self.commands)
+        self.checkpoints[offset] = joined
+        self.marks[offset] = joined_mark
+        self.marks.extend(later.marks[1:])
+        self.commands.extend(later.commands)
+        self.versions.extend(later.versions)
+        self.checkpoints.update((offset + position, checkpoint) for position, checkpoint in later.checkpoints.items()
+                                if position)
+        if self.first_ball is None and later.first_ball is not None:
+            self.first_ball = offset + later.first_ball
+        self.position = offset + later.position
+    
+    def _truncate(self):
+        """Forget the undone commands"""
+        del self.commands[self.position:]
+        del self.versions[self.position:]
+        del self.marks[self.position + 1:]
+        for position in [position for position in self.checkpoints if position > self.position]:
+            del self.checkpoints[position]
+        if self.first_ball is not None and self.first_ball >= self.position:
+            self.first_ball = None
+    
+    def is_boundary(self, position: int) -> bool:
+        return position == len(self.commands) or self.commands[position][0] == "add_ball"
+    
+    @property
+    def can_undo(self) -> bool:
+        if not self.complete:
+            return True
+        return self.first_ball is not None and self.first_ball < self.position
+    
+    @property
+    def can_redo(self) -> bool:
+        if not self.complete:
+            # Any command since the snapshot has replaced what could be redone
+            return self.redo_saved and not self.commands
+        return self.position < len(self.commands)
+    
+    def undo_target(self, steps: int) -> Tuple[int, int]:
+        """(position, balls undone) going back up to steps balls"""
+        position, undone = self.position, 0
+        while undone < steps and self.first_ball is not None and position > self.first_ball:
+            position -= 1
+            while position > self.first_ball and not self.is_boundary(position):
+                position -= 1
+            undone += 1
+        return position, undone
+    
+    def redo_target(self, steps: int) -> Tuple[int, int]:
+        """(position, balls redone) going forward up to steps balls"""
+        position, redone = self.position, 0
+        while redone < steps and position < len(self.commands):
+            position += 1
+            while not self.is_boundary(position):
+                position += 1
+            redone += 1
+        return position, redone
+    
+    def ball_position(self, innings: int, balls: int) -> Optional[int]:
+        """The ball boundary right after a given legal ball of an innings, if the history reaches it"""
+        position = bisect_left(self.marks, (innings, balls))
+        while position < len(self.marks) and self.marks[position] == (innings, balls):
+            if self.is_boundary(position):
+                return position
+            position += 1
+        return None
+    
+    def seek(self, match, position: int):
+        """Bring the match to its state after the first position commands"""
+        if position < self.position and match._take_back(self.commands[position:self.position]):
+            self.position = position
+            return
+        checkpoint = max(index for index in self.checkpoints if index <= position)
+        if not checkpoint <= self.position <= position:
+            # Going back, or further forward than the nearest checkpoint
+            match._restore(self.checkpoints[checkpoint])
+            self.position = checkpoint
+        for command, args, kwargs in self.commands[self.position:position]:
+            match._apply_command(command, args, kwargs, self.versions[self.position])
+            self.position += 1
+            if self.checkpointing and not self.position % CHECKPOINT_INTERVAL and self.position not in self.checkpoints:
+                self.checkpoints[self.position] = match._checkpoint()
@@ -0,0 +1,112 @@
+import json
+import os
+from typing import List, Dict, Any
+
+# Number of journalled commands after which the match snapshot is rewritten
+# without waiting for the persistence worker's usual coalescing delay
+JOURNAL_COMPACT_INTERVAL = 60
+
+# Sequence number of the header record naming the Match constructor arguments
+CREATE_SEQ = -1
+
+def journal_path_for(snapshot_path: str) -> str:
+    """Journal file that sits next to a match snapshot (data/match_<id>.journal)"""
+    return os.path.splitext(snapshot_path)[0] + ".journal"
+
+class MatchJournal:
+    """Append-only write-ahead log of scoring commands for one match.
+    
+    The journal holds the match's full command stream. Snapshots record the
+    byte offset they cover, so loading only reads the tail written after the
+    last snapshot, while replay.py can rebuild the match from the whole log.
+    
+    With sync_each_append=False records reach the OS on append (so they survive
+    the process dying) but are only fsynced by sync(), which lets a background
+    thread batch the fsyncs of rapid commands.
+    """
+    
+    def __init__(self, snapshot_path: str, sync_each_append: bool = True):
+        self.snapshot_path = snapshot_path
+        self.path = journal_path_for(snapshot_path)
+        self.sync_each_append = sync_each_append
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._truncate_torn_tail()
+        self._file = open(self.path, "a")
+        # Records appended since the last snapshot
+        self.pending = 0
+        # Records appended but not yet fsynced
+        self.unsynced = 0
+    
+    def _truncate_torn_tail(self):
+        """Cut the journal back to its last complete record, so new records don't follow a torn line.
+        
+        read() stops at the first line it can't parse, so anything appended after
+        a crash mid-append would otherwise be lost on the next load.
+        """
+        if not os.path.exists(self.path):
+            return
+        end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                end += len(line)
+            size = f.seek(0, os.SEEK_END)
+        if end < size:
+            os.truncate(self.path, end)
+    
+    @property
+    def offset(self) -> int:
+        """Byte offset of the end of the journal"""
+        return self._file.tell()
+    
+    @property
+    def is_empty(self) -> bool:
+        return self.offset == 0
+    
+    def append(self, seq: int, command: str, args: Dict[str, Any]):
+        """Append one command as a compact JSON line, durable at once unless syncing is deferred"""
+        record = {"seq": seq, "cmd": command, "args": args}
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.pending += 1
+        self.unsynced += 1
+        if self.sync_each_append:
+            self.sync()
+    
+    def sync(self):
+        """Make every record appended so far durable"""
+        if self.unsynced:
+            self.unsynced = 0
+            os.fsync(self._file.fileno())
+    
+    @property
+    def needs_compaction(self) -> bool:
+        return self.pending >= JOURNAL_COMPACT_INTERVAL
+    
+    def mark_snapshot(self):
+        """Everything journalled so far is now covered by a snapshot"""
+        self.pending = 0
+    
+    def close(self):
+        self.sync()
+        self._file.close()
+    
+    @staticmethod
+    def read(path: str, offset: int = 0) -> List[Dict[str, Any]]:
+        """Read journal records from a byte offset, ignoring a final line torn by a crash mid-append"""
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
@@ -0,0 +1,189 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Recording is a dict lookup and a couple of additions under a lock, cheap
+enough to leave on for every ball and every socket event.
+"""
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Tuple, Callable, Iterable
+
+# Latency buckets in seconds, from sub-millisecond handlers to multi-second saves
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Payload buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_metrics: List['Metric'] = []
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in values]
+
+class Gauge(Metric):
+    """Value set directly, or read from a callback at scrape time"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 callback: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self) -> List[str]:
+        if self._callback:
+            values = sorted(self._callback().items())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in values]
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels: str) -> 'Timer':
+        """Context manager observing the duration of its block"""
+        return Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, ([*counts], total, count)) for labels, (counts, total, count) in self._series.items())
+        lines = []
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+class Timer:
+    __slots__ = ('_histogram', '_labels', '_started')
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started, *self._labels)
+
+def timed(histogram: Histogram, *labels: str):
+    """Decorator observing each call's duration in histogram"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format (version 0.0.4)"""
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metrics recorded by the scoring core and the web app
+SOCKET_HANDLER_SECONDS = Histogram(
+    "cricket_socket_handler_seconds", "Time spent handling each Socket.IO event", ["event"])
+SOCKET_HANDLER_ERRORS = Counter(
+    "cricket_socket_handler_errors_total", "Socket.IO events answered with an error", ["event", "kind"])
+SNAPSHOT_WRITE_SECONDS = Histogram(
+    "cricket_snapshot_write_seconds", "Time to encode and write a match snapshot (save_to_file)")
+SNAPSHOT_WRITE_BYTES = Histogram(
+    "cricket_snapshot_write_bytes", "Size of written match snapshots", buckets=SIZE_BUCKETS)
+STATUS_BUILD_SECONDS = Histogram(
+    "cricket_status_build_seconds", "Time to build get_current_status() for a new match version")
+STATUS_ENCODE_SECONDS = Histogram(
+    "cricket_status_encode_seconds", "Time to JSON-encode the match status for a new match version")
+STATUS_BYTES = Histogram(
+    "cricket_status_bytes", "Size of the JSON-encoded match status", buckets=SIZE_BUCKETS)
+BROADCAST_SECONDS = Histogram(
+    "cricket_broadcast_seconds", "Time to fan a match update out to its room", ["kind"])
+WIN_PROBABILITY_SECONDS = Histogram(
+    "cricket_win_probability_seconds", "Time the worker process spent simulating each win probability estimate")
+CONNECTED_CLIENTS = Gauge(
+    "cricket_connected_clients", "Connected Socket.IO clients by page", ["page"])
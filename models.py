@@ -1,15 +1,31 @@
 import json
 import os
+import time
+import uuid
 from datetime import datetime
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Optional, Any, Callable, Iterable, Union, get_args, get_origin, get_type_hints
+from dataclasses import dataclass, asdict, fields, is_dataclass
 from enum import Enum
+from functools import wraps
+from inspect import signature
+from journal import MatchJournal, journal_path_for, CREATE_SEQ
+from history import MatchHistory, ball_mark
+from analytics import InningsAnalytics, live_figures, RECENT_BALLS
+import metrics
+import fastjson
 
-def serialize_dataclass(obj):
-    """Custom serialization to handle enums and other non-JSON types"""
+# Recompute every running aggregate from scratch after each change and fail
+# loudly on a mismatch. Far too slow for live scoring, meant for tests.
+CHECK_AGGREGATES = os.environ.get("CRICKET_CHECK_AGGREGATES") == "1"
+
+def _serialize_reflective(obj):
+    """Walk obj.__dict__, the general case behind serialize_dataclass"""
     if hasattr(obj, '__dict__'):
         result = {}
         for key, value in obj.__dict__.items():
+            if key.startswith('_'):
+                # Private bookkeeping (cached aggregates etc.) is not part of the schema
+                continue
             if isinstance(value, Enum):
                 result[key] = value.value
             elif hasattr(value, '__dict__'):
@@ -24,6 +40,141 @@ def serialize_dataclass(obj):
     else:
         return obj
 
+# type -> serializer producing exactly what _serialize_reflective would
+_serializers: Dict[type, Callable[[Any], Any]] = {}
+
+_PLAIN_TYPES = (int, float, str, bool)
+
+def _field_expression(annotation, value: str) -> Optional[str]:
+    """Source for serializing a field of the given type, or None if it needs the general case"""
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    if get_origin(annotation) is Union and len(args) == 1:
+        annotation = args[0]
+    if annotation in _PLAIN_TYPES:
+        return value
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return f"({value}.value if isinstance({value}, Enum) else {value})"
+    if is_dataclass(annotation):
+        return f"(serialize_dataclass({value}) if {value} is not None else None)"
+    if get_origin(annotation) is list and len(get_args(annotation)) == 1:
+        item_type = get_args(annotation)[0]
+        if item_type in _PLAIN_TYPES:
+            return f"list({value})"
+        if is_dataclass(item_type):
+            return f"[serialize_dataclass(item) for item in {value}]"
+    return None
+
+def _compile_serializer(obj) -> Callable[[Any], Any]:
+    """Generate a serializer for type(obj) with its fields unrolled.
+    
+    Only dataclasses whose instances hold exactly their fields (plus private
+    attributes) in declaration order get one; the generated code checks the
+    attribute count and defers to the general case for any odd instance.
+    """
+    cls = type(obj)
+    if not is_dataclass(cls) or isinstance(obj, type):
+        return _serialize_reflective
+    names = [name for name in obj.__dict__ if not name.startswith('_')]
+    if names != [f.name for f in fields(cls)]:
+        return _serialize_reflective
+    
+    hints = get_type_hints(cls)
+    items = []
+    for name in names:
+        expression = _field_expression(hints.get(name), "d[" + repr(name) + "]")
+        if expression is None:
+            expression = "_serialize_value(d[" + repr(name) + "])"
+        items.append(f"{name!r}: {expression}")
+    source = (
+        f"def serialize_{cls.__name__}(obj):\n"
+        f"    d = obj.__dict__\n"
+        f"    if len(d) != {len(obj.__dict__)}:\n"
+        f"        return _serialize_reflective(obj)\n"
+        f"    return {{{', '.join(items)}}}\n"
+    )
+    namespace = {"Enum": Enum, "serialize_dataclass": serialize_dataclass,
+                 "_serialize_reflective": _serialize_reflective, "_serialize_value": _serialize_value}
+    exec(source, namespace)
+    return namespace[f"serialize_{cls.__name__}"]
+
+def _serialize_value(value):
+    """One attribute value, as _serialize_reflective treats it"""
+    if isinstance(value, Enum):
+        return value.value
+    elif hasattr(value, '__dict__'):
+        return serialize_dataclass(value)
+    elif isinstance(value, list):
+        return [serialize_dataclass(item) if hasattr(item, '__dict__') else (item.value if isinstance(item, Enum) else item) for item in value]
+    return value
+
+def serialize_dataclass(obj):
+    """Custom serialization to handle enums and other non-JSON types.
+    
+    Uses a serializer generated once per dataclass on first use.
+    """
+    serializer = _serializers.get(type(obj))
+    if serializer is None:
+        serializer = _serializers[type(obj)] = _compile_serializer(obj)
+    return serializer(obj)
+
+def diff_status(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a match_delta payload holding only what changed between two get_current_status() dicts"""
+    changes = {key: value for key, value in new.items()
+               if key not in ("players", "overs") and old.get(key) != value}
+    old_players = old.get("players", {})
+    players = {name: line for name, line in new["players"].items() if old_players.get(name) != line}
+    
+    # Overs only change at the tail (new ball, undo, new bowler) or get replaced
+    # wholesale at an innings break, so send everything from the first difference
+    old_overs, new_overs = old.get("overs", []), new["overs"]
+    overs_from = 0
+    limit = min(len(old_overs), len(new_overs))
+    while overs_from < limit and old_overs[overs_from] == new_overs[overs_from]:
+        overs_from += 1
+    
+    return {
+        "match_id": new["match_id"],
+        "version": new["version"],
+        "base_version": old.get("version"),
+        "changes": changes,
+        "players": players,
+        "overs_from": overs_from,
+        "overs": new_overs[overs_from:]
+    }
+
+# Names of the Match methods decorated with @mutation, the commands a journal can hold
+MATCH_COMMANDS = set()
+# Commands that move through the match history rather than being recorded in it
+HISTORY_COMMANDS = {"undo_last_ball", "undo", "redo", "rewind_to"}
+
+def mutation(method):
+    """Bump Match.version after a state-changing call, append it to the match journal and record it for undo.
+    
+    Calls that raise or return an error are journalled (replay rejects them
+    the same way) but change nothing, so the history skips them.
+    """
+    method_signature = signature(method)
+    MATCH_COMMANDS.add(method.__name__)
+    recorded = method.__name__ not in HISTORY_COMMANDS
+    
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.history.started:
+            self.history.begin(self)
+        try:
+            result = method(self, *args, **kwargs)
+            if recorded and not (isinstance(result, dict) and "error" in result):
+                self.history.record(self, method.__name__, args, kwargs)
+            return result
+        finally:
+            if self.journal:
+                bound = method_signature.bind(self, *args, **kwargs).arguments
+                command_args = {name: value.value if isinstance(value, Enum) else value
+                                for name, value in bound.items() if name != "self"}
+                self.journal.append(self.version, method.__name__, command_args)
+            self.version += 1
+    return wrapper
+
 class WicketType(Enum):
     BOWLED = "bowled"
     CAUGHT = "caught"
@@ -72,7 +223,7 @@ class Ball:
     extra_type: Optional[ExtraType] = None
     extra_runs: int = 0
     bowler: str = ""
-    # Store pre-ball state for undo
+    # Batters at the crease before the ball
     prev_striker: Optional[str] = None
     prev_non_striker: Optional[str] = None
     
@@ -83,6 +234,20 @@ class Ball:
     @property
     def is_legal_delivery(self) -> bool:
         return self.extra_type not in [ExtraType.WIDE, ExtraType.NO_BALL]
+    
+    @property
+    def summary_token(self) -> str:
+        """How this ball appears in an over summary, e.g. 'W', 'Wd1', '4'"""
+        if self.is_wicket:
+            return 'W'
+        elif self.extra_type == ExtraType.WIDE:
+            return f'Wd{self.extra_runs}'
+        elif self.extra_type == ExtraType.NO_BALL:
+            return f'Nb{self.total_runs}'
+        elif self.extra_type in [ExtraType.BYE, ExtraType.LEG_BYE]:
+            return f'{self.total_runs}b'
+        else:
+            return str(self.runs)
 
 @dataclass
 class Over:
@@ -90,38 +255,74 @@ class Over:
     bowler: str
     balls: List[Ball]
     
+    def __post_init__(self):
+        # Running aggregates, kept in step by add_ball() so that per-ball
+        # bookkeeping doesn't depend on how long the over gets
+        self._runs = 0
+        self._wickets = 0
+        self._legal_balls = 0
+        self._summary = ''
+        for ball in self.balls:
+            self._count_ball(ball)
+    
+    def _count_ball(self, ball: Ball):
+        self._runs += ball.total_runs
+        self._wickets += 1 if ball.is_wicket else 0
+        self._legal_balls += 1 if ball.is_legal_delivery else 0
+        token = ball.summary_token
+        self._summary = f'{self._summary} {token}' if self._summary else token
+    
+    def add_ball(self, ball: Ball):
+        """Append a delivery to the over"""
+        self.balls.append(ball)
+        self._count_ball(ball)
+        if CHECK_AGGREGATES:
+            self.check_aggregates()
+    
+    def pop_ball(self) -> Ball:
+        """Remove and return the last delivery of the over"""
+        ball = self.balls.pop()
+        self._runs -= ball.total_runs
+        self._wickets -= 1 if ball.is_wicket else 0
+        self._legal_balls -= 1 if ball.is_legal_delivery else 0
+        # Summary tokens never contain spaces
+        self._summary = self._summary.rpartition(' ')[0]
+        if CHECK_AGGREGATES:
+            self.check_aggregates()
+        return ball
+    
+    def check_aggregates(self):
+        """Raise AssertionError if the running aggregates disagree with the balls"""
+        expected = (
+            sum(ball.total_runs for ball in self.balls),
+            sum(1 for ball in self.balls if ball.is_wicket),
+            sum(1 for ball in self.balls if ball.is_legal_delivery),
+            ' '.join(ball.summary_token for ball in self.balls)
+        )
+        actual = (self._runs, self._wickets, self._legal_balls, self._summary)
+        if actual != expected:
+            raise AssertionError(f"Over {self.over_number} aggregates {actual} != {expected}")
+    
     @property
     def runs(self) -> int:
-        return sum(ball.total_runs for ball in self.balls)
+        return self._runs
     
     @property
     def wickets(self) -> int:
-        return sum(1 for ball in self.balls if ball.is_wicket)
+        return self._wickets
     
     @property
     def legal_balls(self) -> int:
-        return sum(1 for ball in self.balls if ball.is_legal_delivery)
+        return self._legal_balls
     
     @property
     def is_complete(self) -> bool:
-        return self.legal_balls >= 6
+        return self._legal_balls >= 6
     
     @property
     def summary(self) -> str:
         """Returns over summary like '1 2 0 W 4 1'"""
-        summary = []
-        for ball in self.balls:
-            if ball.is_wicket:
-                summary.append('W')
-            elif ball.extra_type == ExtraType.WIDE:
-                summary.append(f'Wd{ball.extra_runs}')
-            elif ball.extra_type == ExtraType.NO_BALL:
-                summary.append(f'Nb{ball.total_runs}')
-            elif ball.extra_type in [ExtraType.BYE, ExtraType.LEG_BYE]:
-                summary.append(f'{ball.total_runs}b')
-            else:
-                summary.append(str(ball.runs))
-        return ' '.join(summary)
+        return self._summary
 
 @dataclass
 class Partnership:
@@ -147,9 +348,159 @@ class Team:
     def run_rate(self) -> float:
         return (self.runs / self.overs) if self.overs > 0 else 0.0
 
+def innings_path_for(snapshot_path: str, number: int) -> str:
+    """File holding a completed innings of a saved match (data/match_<id>.innings1)"""
+    return os.path.splitext(snapshot_path)[0] + f".innings{number}"
+
+def read_innings_file(snapshot_path: str, number: int) -> Optional[Dict[str, Any]]:
+    """Record of a completed innings of a saved match, None if it has none yet"""
+    try:
+        with open(innings_path_for(snapshot_path, number), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def over_data(over: Over) -> Dict[str, Any]:
+    """An over as stored in snapshots and innings files"""
+    return {
+        "over_number": over.over_number,
+        "bowler": over.bowler,
+        "balls": [serialize_dataclass(ball) for ball in over.balls],
+        "summary": over.summary
+    }
+
+def over_from_data(data: Dict[str, Any]) -> Over:
+    balls = []
+    for ball_data in data["balls"]:
+        # Convert enum strings back to enum objects
+        if ball_data.get("wicket_type"):
+            ball_data["wicket_type"] = WicketType(ball_data["wicket_type"])
+        if ball_data.get("extra_type"):
+            ball_data["extra_type"] = ExtraType(ball_data["extra_type"])
+        balls.append(Ball(**ball_data))
+    return Over(data["over_number"], data["bowler"], balls)
+
+@dataclass
+class Innings:
+    """A completed innings: its totals and its overs, partnerships and fall of wickets.
+    
+    Innings of a match loaded from disk only hold their totals, and read the
+    rest from their innings file when asked for it.
+    """
+    number: int
+    batting_team: str
+    bowling_team: str
+    runs: int
+    wickets: int
+    overs_bowled: float
+    extras: int
+    # Journal seq of the command that ended the innings, which tells apart the
+    # records of an innings ended again after an undo
+    ended_at: int
+    overs: Optional[List[Over]] = None
+    partnerships: Optional[List[Partnership]] = None
+    fall_of_wickets: Optional[List[Dict[str, Any]]] = None
+    # Innings file to read the overs from, if they aren't held
+    path: Optional[str] = None
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "number": self.number,
+            "batting_team": self.batting_team,
+            "bowling_team": self.bowling_team,
+            "runs": self.runs,
+            "wickets": self.wickets,
+            "overs_bowled": self.overs_bowled,
+            "extras": self.extras,
+            "ended_at": self.ended_at
+        }
+    
+    def record(self) -> Dict[str, Any]:
+        """Summary plus the ball-by-ball record, as stored in the innings file"""
+        if self.overs is None:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        return dict(
+            self.summary(),
+            overs=[over_data(over) for over in self.overs],
+            partnerships=[serialize_dataclass(p) for p in self.partnerships],
+            fall_of_wickets=list(self.fall_of_wickets)
+        )
+    
+    def loaded(self) -> 'Innings':
+        """This innings with its overs, partnerships and fall of wickets, read from its file if need be"""
+        if self.overs is not None:
+            return self
+        return Innings.from_data(self.record())
+    
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], path: Optional[str] = None) -> 'Innings':
+        """Innings from summary() (which leaves the rest on disk at path) or record()"""
+        innings = cls(*(data[key] for key in ("number", "batting_team", "bowling_team", "runs", "wickets",
+                                               "overs_bowled", "extras", "ended_at")), path=path)
+        if "overs" in data:
+            innings.overs = [over_from_data(over) for over in data["overs"]]
+            innings.partnerships = [Partnership(**p) for p in data["partnerships"]]
+            innings.fall_of_wickets = data["fall_of_wickets"]
+        return innings
+
+# Match attributes that aren't part of its scoring state
+_NOT_STATE = {"id", "version", "journal", "save_listeners", "history", "_status_cache", "_innings_files",
+              "_analytics_paused"}
+
+def _clone(obj):
+    """Shallow copy of a plain object, several times quicker than copy.copy()"""
+    clone = object.__new__(type(obj))
+    clone.__dict__ = obj.__dict__.copy()
+    return clone
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of Match state (attribute name -> value) that scoring the copy can't change.
+    
+    Only what later commands modify is copied: teams, players, partnerships
+    and the over in progress. Completed overs, balls, fall-of-wicket entries
+    and innings never change again, so both copies share them.
+    """
+    state = dict(state)
+    teams = {}
+    for key in ("team1", "team2"):
+        team = state[key]
+        teams[id(team)] = state[key] = _clone(team)
+        state[key].players = list(team.players)
+    for key in ("batting_team", "bowling_team"):
+        state[key] = teams.get(id(state[key]))
+    state["players"] = {name: _clone(player) for name, player in state["players"].items()}
+    partnerships = {id(partnership): _clone(partnership) for partnership in state["partnerships"]}
+    state["partnerships"] = list(partnerships.values())
+    current = state["current_partnership"]
+    # Still the last innings' partnership between an innings ending and the next starting
+    state["current_partnership"] = partnerships.get(id(current)) or (_clone(current) if current else None)
+    overs = list(state["overs"])
+    if overs:
+        over = overs[-1] = _clone(overs[-1])
+        over.balls = list(over.balls)
+    state["overs"] = overs
+    state["fall_of_wickets"] = list(state["fall_of_wickets"])
+    state["completed_innings"] = list(state["completed_innings"])
+    analytics = state["innings_analytics"]
+    state["innings_analytics"] = analytics[:-1] + [analytics[-1].copy()]
+    return state
+
+def _write_file(path: str, data: bytes) -> int:
+    """Write a file through a temp file swapped in, so a crash never leaves it truncated; returns its size"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        written = f.tell()
+    os.replace(tmp_path, path)
+    return written
+
 class Match:
     def __init__(self, team1_name: str, team2_name: str, total_overs: int, team1_flag: str = "", team2_flag: str = ""):
-        self.id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Creation time, then a random suffix so matches created in the same second don't share an id
+        self.id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         self.team1 = Team(team1_name, [])
         self.team2 = Team(team2_name, [])
         self.team1_flag = team1_flag
@@ -159,6 +510,17 @@ class Match:
         self.toss_winner = ""
         self.toss_decision = ""  # "bat" or "bowl"
         
+        # Incremented on every state change, sent with each broadcast
+        self.version = 0
+        # Write-ahead journal of scoring commands, attached with open_journal()
+        self.journal: Optional[MatchJournal] = None
+        # Called with (filepath, match_data) after every snapshot, e.g. to update the match catalog
+        self.save_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        # get_current_status() results, reused until the version changes
+        self._status_cache = None
+        # Every command applied, with checkpoints, for undo/redo and rewinds
+        self.history = MatchHistory()
+        
         # Current match state
         self.batting_team = None
         self.bowling_team = None
@@ -174,13 +536,24 @@ class Match:
         self.partnerships: List[Partnership] = []
         self.current_partnership = None
         self.fall_of_wickets = []
+        # Deliveries (including extras) bowled in the current innings
+        self.innings_deliveries = 0
+        # Innings over so far, with their overs; the attributes above only hold the current one
+        self.completed_innings: List[Innings] = []
+        # Innings file path -> Innings.ended_at of the record written there
+        self._innings_files: Dict[str, int] = {}
+        # Worm, Manhattan and phase figures of each innings so far, the last one current
+        self.innings_analytics: List[InningsAnalytics] = [InningsAnalytics(1, total_overs)]
+        # Set while replay_commands() leaves the analytics to be counted at the end
+        self._analytics_paused = False
         
         # Match status
         self.is_started = False
         self.is_finished = False
         self.winner = ""
         self.match_result = ""
-        
+    
+    @mutation
     def add_player(self, name: str, team: str):
         """Add a player to the match"""
         self.players[name] = Player(name)
@@ -189,6 +562,7 @@ class Match:
         else:
             self.team2.players.append(name)
     
+    @mutation
     def set_toss(self, winner: str, decision: str):
         """Set toss result"""
         self.toss_winner = winner
@@ -209,6 +583,7 @@ class Match:
                 self.batting_team = self.team1
                 self.bowling_team = self.team2
     
+    @mutation
     def start_innings(self, striker: str, non_striker: str, bowler: str):
         """Start the innings with opening players"""
         self.striker = striker
@@ -225,12 +600,15 @@ class Match:
         # Create first over
         self.overs.append(Over(self.current_over, bowler, []))
     
+    @mutation
     def add_ball(self, runs: int, is_wicket: bool = False, wicket_type: Optional[WicketType] = None, 
                  dismissed_player: Optional[str] = None, extra_type: Optional[ExtraType] = None, 
                  extra_runs: int = 0) -> Dict[str, Any]:
         """Add a ball to the current over"""
         if not self.is_started:
             return {"error": "Match not started"}
+        if not self.overs:
+            return {"error": "Innings not started"}
         
         ball = Ball(
             runs=runs,
@@ -240,14 +618,16 @@ class Match:
             extra_type=extra_type,
             extra_runs=extra_runs,
             bowler=self.bowler,
-            # Store pre-ball state for undo
             prev_striker=self.striker,
             prev_non_striker=self.non_striker
         )
         
         # Add ball to current over
         current_over = self.overs[-1]
-        current_over.balls.append(ball)
+        current_over.add_ball(ball)
+        self.innings_deliveries += 1
+        if not self._analytics_paused:
+            self.innings_analytics[-1].add_ball(current_over.over_number, ball)
         
         # Update player stats
         if ball.is_legal_delivery:
@@ -321,109 +701,173 @@ class Match:
         if self.current_innings == 2:
             target = self.team1.runs if self.batting_team == self.team2 else self.team2.runs
             if self.batting_team.runs > target:
+                self._archive_innings()
                 self.is_finished = True
                 self._determine_winner()
                 return {"action": "match_complete", "winner": self.winner, "match_result": self.match_result, "target_reached": True}
-
+        
         return {"action": "ball_added"}
     
+    @mutation
     def undo_last_ball(self) -> Dict[str, Any]:
-        """Undo the last ball played"""
-        # Check if there are any balls to undo
-        if not self.overs or (len(self.overs) == 1 and not self.overs[0].balls):
+        """Undo the last ball played, along with any bowler or batter changes made after it"""
+        return self._undo(1)
+    
+    @mutation
+    def undo(self, steps: int = 1) -> Dict[str, Any]:
+        """Undo the last steps balls (as many as there are if fewer)"""
+        return self._undo(steps)
+    
+    def _undo(self, steps: int) -> Dict[str, Any]:
+        history = self._navigable_history()
+        position, undone = history.undo_target(steps)
+        if not undone:
             return {"success": False, "message": "No balls to undo"}
+        history.seek(self, position)
+        message = "Last ball undone successfully" if undone == 1 else f"{undone} balls undone"
+        return {"success": True, "message": message, "undone": undone}
+    
+    @mutation
+    def redo(self, steps: int = 1) -> Dict[str, Any]:
+        """Bring back the last steps undone balls (as many as there are if fewer)"""
+        history = self._navigable_history()
+        position, redone = history.redo_target(steps)
+        if not redone:
+            return {"success": False, "message": "Nothing to redo"}
+        history.seek(self, position)
+        message = "Ball redone" if redone == 1 else f"{redone} balls redone"
+        return {"success": True, "message": message, "redone": redone}
+    
+    @mutation
+    def rewind_to(self, innings: int, over: int, ball: int) -> Dict[str, Any]:
+        """Go back (or, after undoing, forward) to just after ball over.ball of an innings"""
+        if not 0 <= ball < 6 or over < 0:
+            return {"success": False, "message": f"No such ball {over}.{ball}"}
+        history = self._navigable_history()
+        position = history.ball_position(innings, over * 6 + ball)
+        if position is None:
+            return {"success": False, "message": f"Innings {innings} has not reached {over}.{ball}"}
+        history.seek(self, position)
+        return {"success": True, "message": f"Back to {over}.{ball} in innings {innings}"}
+    
+    def _navigable_history(self) -> MatchHistory:
+        """self.history, first rebuilt from the journal if the match was loaded from a snapshot"""
+        if not self.history.complete:
+            records = [record for record in MatchJournal.read(self.history.journal_path)
+                       if record["seq"] < self.version]
+            if records and records[0]["cmd"] == "create":
+                rebuilt = type(self).create(**records[0]["args"])
+                rebuilt.replay_commands(records[1:])
+                self.history = rebuilt.history
+            else:
+                self.history = self._seeded_history()
+        return self.history
+    
+    def _seeded_history(self) -> MatchHistory:
+        """History of a match saved without a journal from its creation.
         
-        # Get the current over
-        current_over = self.overs[-1]
+        The commands up to the snapshot are inferred from its stored balls (as
+        replay.py does), followed by those recorded since it was loaded.
+        """
+        # replay.py builds on this module
+        from replay import synthesize_command_stream
+        since = self.history
+        snapshot = object.__new__(type(self))
+        snapshot.__dict__.update(self.__dict__)
+        if since.started:
+            snapshot.__dict__.update(since.checkpoints[0])
+        joined = since.checkpoints[0] if since.started else self._checkpoint()
+        records = synthesize_command_stream(snapshot)
+        rebuilt = type(self).create(**records[0]["args"])
+        rebuilt.replay_commands(records[1:])
+        history = rebuilt.history
+        if not history.started:
+            history.begin(rebuilt)
+        history.extend(since, joined, since.marks[0] if since.started else ball_mark(self))
+        return history
+    
+    def _checkpoint(self) -> Dict[str, Any]:
+        """Copy of the match state, for MatchHistory"""
+        return _copy_state({key: value for key, value in self.__dict__.items() if key not in _NOT_STATE})
+    
+    def _restore(self, checkpoint: Dict[str, Any]):
+        """Put the match back in a state from _checkpoint()"""
+        for key in [key for key in self.__dict__ if key not in _NOT_STATE and key not in checkpoint]:
+            # Set after the checkpoint was taken, e.g. _innings_just_ended
+            del self.__dict__[key]
+        self.__dict__.update(_copy_state(checkpoint))
+    
+    def _take_back(self, commands: List[tuple]) -> bool:
+        """Reverse the latest commands, from the history, if they are only balls of the over in progress and new batters.
         
-        # If current over has no balls, go to previous over
-        if not current_over.balls:
-            if len(self.overs) == 1:
-                return {"success": False, "message": "No balls to undo"}
-            
-            # Remove empty over (created for new bowler)
-            self.overs.pop()
-            
-            # Get the previous over (the one that was just completed)
-            current_over = self.overs[-1]
-            completed_over_bowler = current_over.bowler
-            
-            # Restore over state
-            self.current_over -= 1
-            self.current_ball = len(current_over.balls)
-            self.batting_team.overs -= 1.0
-            
-            # Restore the bowler from the completed over
-            self.bowler = current_over.bowler
+        Returns False without changing anything for any other commands, or a
+        ball that completed its over or ended the innings or match; those go
+        back by way of a checkpoint instead.
+        """
+        balls = sum(1 for command, _, _ in commands if command == "add_ball")
+        batters = len(commands) - balls
+        over = self.overs[-1] if self.overs else None
+        if (self.is_finished or over is None or over.is_complete or len(over.balls) < balls
+                or len(self.partnerships) <= batters
+                or any(command not in ("add_ball", "set_new_batter") for command, _, _ in commands)
+                or any(ball.prev_striker is None for ball in over.balls[len(over.balls) - balls:])):
+            return False
+        analytics = self.innings_analytics[-1]
+        for command, _, _ in reversed(commands):
+            if command == "set_new_batter":
+                # Who was at the crease comes back with the wicket ball taken back before it
+                self.partnerships.pop()
+                self.current_partnership = self.partnerships[-1]
+                continue
+            ball = over.pop_ball()
+            self.innings_deliveries -= 1
+            if not self._analytics_paused:
+                earlier = None
+                if self.innings_deliveries >= RECENT_BALLS:
+                    # The delivery RECENT_BALLS back, which add_ball dropped from the analytics
+                    back = RECENT_BALLS
+                    for earlier_over in reversed(self.overs):
+                        if back <= len(earlier_over.balls):
+                            earlier = earlier_over.over_number, earlier_over.balls[-back]
+                            break
+                        back -= len(earlier_over.balls)
+                analytics.remove_ball(over.over_number, ball, not over.balls, earlier)
             
-            # Revert bowler stats for the completed over
-            if completed_over_bowler in self.players:
-                self.players[completed_over_bowler].overs_bowled -= 1.0
-                
-                # Check if the completed over was a maiden and revert maiden count
-                # A maiden over has 0 runs and 0 wickets
-                if current_over.runs == 0 and current_over.wickets == 0:
-                    self.players[completed_over_bowler].maidens -= 1
-            
-            # Swap batsmen back (they were swapped at end of over)
-            self.striker, self.non_striker = self.non_striker, self.striker
-        
-        # Get the last ball
-        last_ball = current_over.balls.pop()
-        
-        # Reverse the ball effects
-        self._reverse_ball_effects(last_ball)
-        
-        return {"success": True, "message": "Last ball undone successfully"}
+            self.striker, self.non_striker = ball.prev_striker, ball.prev_non_striker
+            striker, bowler = self.players[self.striker], self.players[ball.bowler]
+            partnership = self.current_partnership
+            total_runs = ball.total_runs
+            if ball.is_legal_delivery:
+                striker.balls_faced -= 1
+                partnership.balls -= 1
+                self.current_ball -= 1
+            striker.runs -= ball.runs
+            self.batting_team.runs -= total_runs
+            bowler.runs_conceded -= total_runs
+            partnership.runs -= total_runs
+            if ball.runs == 4:
+                striker.fours -= 1
+            elif ball.runs == 6:
+                striker.sixes -= 1
+            if ball.is_wicket:
+                self.batting_team.wickets -= 1
+                bowler.wickets_taken -= 1
+                self.fall_of_wickets.pop()
+        return True
     
-    def _reverse_ball_effects(self, ball: Ball):
-        """Reverse all effects of the given ball"""
-        # Reverse runs for striker
-        self.players[self.striker].runs -= ball.runs
-        
-        # Reverse team runs
-        self.batting_team.runs -= ball.total_runs
-        
-        # Reverse bowler runs conceded
-        self.players[ball.bowler].runs_conceded -= ball.total_runs
-        
-        # Reverse current partnership
-        self.current_partnership.runs -= ball.total_runs
-        
-        # Reverse boundaries
-        if ball.runs == 4:
-            self.players[self.striker].fours -= 1
-        elif ball.runs == 6:
-            self.players[self.striker].sixes -= 1
+    def _apply_command(self, command: str, args: tuple, kwargs: Dict[str, Any], version: int):
+        """Re-run a command from the history, without journalling or recording it again.
         
-        # Reverse legal delivery effects
-        if ball.is_legal_delivery:
-            self.players[self.striker].balls_faced -= 1
-            self.current_partnership.balls -= 1
-            self.current_ball -= 1
-        
-        # Reverse wicket effects
-        if ball.is_wicket:
-            self.batting_team.wickets -= 1
-            self.players[ball.bowler].wickets_taken -= 1
-            # Remove from fall of wickets
-            if self.fall_of_wickets:
-                self.fall_of_wickets.pop()
-            
-            # Restore the batsmen to their pre-wicket state
-            if ball.prev_striker and ball.prev_non_striker:
-                self.striker = ball.prev_striker
-                self.non_striker = ball.prev_non_striker
-                
-                # Restore the partnership to before the wicket
-                # Remove the current partnership (created after wicket) and restore the previous one
-                if len(self.partnerships) > 1:
-                    self.partnerships.pop()  # Remove partnership created after wicket
-                    self.current_partnership = self.partnerships[-1]  # Restore previous partnership
-        else:
-            # Only reverse striker swap if it wasn't a wicket (odd runs and no wicket)
-            if ball.runs % 2 == 1:
-                self.striker, self.non_striker = self.non_striker, self.striker
+        It runs at the version it was first applied at, so what it records of
+        the version (e.g. Innings.ended_at) is the same whether a redo replays
+        it or restores a checkpoint taken after it.
+        """
+        current = self.version
+        self.version = version
+        try:
+            getattr(type(self), command).__wrapped__(self, *args, **kwargs)
+        finally:
+            self.version = current
     
     def _complete_over(self):
         """Complete the current over and prepare for next"""
@@ -450,8 +894,17 @@ class Match:
             # Prepare for next over (bowler will be set externally)
             pass
     
+    def _archive_innings(self):
+        """Keep the record of the innings that has just ended"""
+        team = self.batting_team
+        self.completed_innings.append(Innings(
+            self.current_innings, team.name, self.bowling_team.name, team.runs, team.wickets,
+            team.overs, team.extras, self.version,
+            list(self.overs), list(self.partnerships), list(self.fall_of_wickets)))
+    
     def _end_innings(self):
         """End the current innings"""
+        self._archive_innings()
         if self.current_innings == 1:
             # End first innings, start second
             self.current_innings = 2
@@ -460,11 +913,14 @@ class Match:
             # Swap teams
             self.batting_team, self.bowling_team = self.bowling_team, self.batting_team
             
-            # Reset for second innings
+            # Reset for second innings; the first is in completed_innings
             self.current_over = 1
             self.current_ball = 0
+            self.overs = []
+            self.innings_deliveries = 0
             self.partnerships = []
             self.fall_of_wickets = []
+            self.innings_analytics.append(InningsAnalytics(2, self.total_overs))
             
             # Reset bowling team stats for new innings
             self.batting_team.runs = 0
@@ -475,12 +931,13 @@ class Match:
             self.striker = None
             self.non_striker = None
             self.bowler = None
-            
+        
         else:
             # Second innings ended, finish match
             self.is_finished = True
             self._determine_winner()
     
+    @mutation
     def start_second_innings(self, striker: str, non_striker: str, bowler: str):
         """Start the second innings with opening players"""
         if self.current_innings != 2:
@@ -496,9 +953,10 @@ class Match:
         
         # Create first over for second innings
         self.overs = [Over(1, bowler, [])]
+        self.innings_deliveries = 0
         
         return True
-
+    
     def _determine_winner(self):
         """Determine match winner with proper cricket result format"""
         if self.team1.runs > self.team2.runs:
@@ -529,11 +987,13 @@ class Match:
             self.winner = "Tie"
             self.match_result = "Match tied"
     
+    @mutation
     def set_new_bowler(self, bowler: str):
         """Set new bowler for the next over"""
         self.bowler = bowler
         self.overs.append(Over(self.current_over, bowler, []))
     
+    @mutation
     def set_new_batter(self, batter: str):
         """Set new batter after wicket"""
         # Find who was dismissed from the last wicket
@@ -560,12 +1020,48 @@ class Match:
             self.current_partnership = Partnership(staying_player, batter)
             self.partnerships.append(self.current_partnership)
     
+    def find_innings(self, number: int) -> Optional[Innings]:
+        """A completed innings, None if that innings isn't over"""
+        for innings in self.completed_innings:
+            if innings.number == number:
+                return innings
+        return None
+    
+    def live_analytics(self) -> Optional[Dict[str, Any]]:
+        """Run rates, projections or the chase, phase splits and recent balls of the innings in progress"""
+        if not self.batting_team:
+            return None
+        target = self.bowling_team.runs + 1 if self.current_innings == 2 else None
+        balls_bowled = (self.current_over - 1) * 6 + self.current_ball if self.current_over else 0
+        return live_figures(self.innings_analytics[-1], self.batting_team.runs, balls_bowled,
+                            self.total_overs, target)
+    
+    def analytics_data(self) -> Dict[str, Any]:
+        """live_analytics() plus the worm, Manhattan and phases of every innings"""
+        return {
+            "match_id": self.id,
+            "version": self.version,
+            "live": self.live_analytics(),
+            "innings": [analytics.data() for analytics in self.innings_analytics]
+        }
+    
     def get_current_status(self) -> Dict[str, Any]:
-        """Get current match status for display"""
+        """Get current match status for display.
+        
+        The dict is built once per version and shared between callers, so treat it as read-only.
+        """
+        if self._status_cache is None or self._status_cache[0] != self.version:
+            with metrics.STATUS_BUILD_SECONDS.time():
+                self._status_cache = (self.version, self._build_current_status())
+        return self._status_cache[1]
+    
+    def _build_current_status(self) -> Dict[str, Any]:
+        """Serialize the full match state for display"""
         current_over_obj = self.overs[-1] if self.overs else None
         
         return {
             "match_id": self.id,
+            "version": self.version,
             "team1": serialize_dataclass(self.team1),
             "team2": serialize_dataclass(self.team2),
             "team1_flag": self.team1_flag,
@@ -580,13 +1076,19 @@ class Match:
             "bowler": self.bowler,
             "current_over": self.current_over,
             "current_ball": self.current_ball,
+            "innings_deliveries": self.innings_deliveries,
             "current_partnership": serialize_dataclass(self.current_partnership) if self.current_partnership else None,
             "last_over_summary": current_over_obj.summary if current_over_obj else "",
-            "fall_of_wickets": self.fall_of_wickets,
+            "fall_of_wickets": list(self.fall_of_wickets),
             "is_started": self.is_started,
             "is_finished": self.is_finished,
             "winner": self.winner,
             "match_result": self.match_result,
+            "can_undo": self.is_started and self.history.can_undo,
+            "can_redo": self.history.can_redo,
+            # Only the totals of completed innings; their overs are at /api/match/innings/<number>
+            "innings": [innings.summary() for innings in self.completed_innings],
+            "analytics": self.live_analytics(),
             "players": {name: serialize_dataclass(player) for name, player in self.players.items()},
             "total_overs": self.total_overs,
             "overs": [serialize_dataclass(over) for over in self.overs]
@@ -596,9 +1098,10 @@ class Match:
         """Save match data to JSON file"""
         if not filepath:
             filepath = f"data/match_{self.id}.json"
-        
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
+        self.write_snapshot(filepath, self.snapshot_data(filepath))
+    
+    def snapshot_data(self, filepath: str) -> Dict[str, Any]:
+        """Match data as saved to filepath, detached from the live match so it can be written on another thread"""
         match_data = {
             "match_info": {
                 "id": self.id,
@@ -613,7 +1116,10 @@ class Match:
                 "is_started": self.is_started,
                 "is_finished": self.is_finished,
                 "winner": self.winner,
-                "match_result": self.match_result
+                "match_result": self.match_result,
+                "version": self.version,
+                "can_redo": self.history.can_redo,
+                "journal_offset": self.journal.offset if self.journal and self.journal.snapshot_path == filepath else 0
             },
             "current_state": {
                 "batting_team": self.batting_team.name if self.batting_team else "",
@@ -629,21 +1135,141 @@ class Match:
                 "team2": serialize_dataclass(self.team2)
             },
             "players": {name: serialize_dataclass(player) for name, player in self.players.items()},
-            "overs": [
-                {
-                    "over_number": over.over_number,
-                    "bowler": over.bowler,
-                    "balls": [serialize_dataclass(ball) for ball in over.balls],
-                    "summary": over.summary
-                }
-                for over in self.overs
-            ],
+            "overs": [over_data(over) for over in self.overs],
             "partnerships": [serialize_dataclass(p) for p in self.partnerships],
-            "fall_of_wickets": self.fall_of_wickets
+            "fall_of_wickets": list(self.fall_of_wickets),
+            "innings": [innings.summary() for innings in self.completed_innings],
+            "analytics": [analytics.data() for analytics in self.innings_analytics]
         }
         
-        with open(filepath, 'w') as f:
-            json.dump(match_data, f, indent=2)
+        # Completed innings go in files of their own, written once rather than with
+        # every snapshot (None: remove the file, the innings has been undone)
+        innings_files = {}
+        for number in (1, 2):
+            path = innings_path_for(filepath, number)
+            innings = self.find_innings(number)
+            if innings is None:
+                if path in self._innings_files:
+                    innings_files[path] = None
+            elif self._innings_files.get(path) != innings.ended_at:
+                innings_files[path] = innings.record()
+        if innings_files:
+            match_data["innings_files"] = innings_files
+        
+        # Everything journalled so far is part of this snapshot
+        if self.journal and self.journal.snapshot_path == filepath:
+            self.journal.mark_snapshot()
+        return match_data
+    
+    def write_snapshot(self, filepath: str, match_data: Dict[str, Any]):
+        """Write data from snapshot_data() to filepath"""
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        # Innings files go first and come out last, so a snapshot never lists
+        # an innings missing from disk
+        innings_files = match_data.pop("innings_files", {})
+        for path, record in innings_files.items():
+            if record is not None:
+                _write_file(path, fastjson.dumps(record))
+                self._innings_files[path] = record["ended_at"]
+        
+        started = time.perf_counter()
+        written = _write_file(filepath, fastjson.dumps_indented(match_data))
+        metrics.SNAPSHOT_WRITE_SECONDS.observe(time.perf_counter() - started)
+        metrics.SNAPSHOT_WRITE_BYTES.observe(written)
+        
+        for path, record in innings_files.items():
+            if record is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                self._innings_files.pop(path, None)
+        for listener in self.save_listeners:
+            listener(filepath, match_data)
+    
+    def open_journal(self, filepath: str = None, sync_each_append: bool = True):
+        """Start journalling every scoring command next to the match snapshot"""
+        if not filepath:
+            filepath = f"data/match_{self.id}.json"
+        if self.journal:
+            self.journal.close()
+        self.journal = MatchJournal(filepath, sync_each_append)
+        
+        # A fresh match's journal starts with its constructor arguments, so the
+        # journal alone is enough to replay the whole match. (Snapshots saved
+        # before versions were recorded load at version 0 too, but with an
+        # incomplete history.)
+        if self.journal.is_empty and self.version == 0 and self.history.complete:
+            self.journal.append(CREATE_SEQ, "create", self.creation_args())
+    
+    def creation_args(self) -> Dict[str, Any]:
+        """Arguments that recreate this match (before any commands) via Match.create()"""
+        return {
+            "id": self.id,
+            "team1_name": self.team1.name,
+            "team2_name": self.team2.name,
+            "total_overs": self.total_overs,
+            "team1_flag": self.team1_flag,
+            "team2_flag": self.team2_flag
+        }
+    
+    @classmethod
+    def create(cls, id: str, team1_name: str, team2_name: str, total_overs: int,
+               team1_flag: str = "", team2_flag: str = "") -> 'Match':
+        """Build a match from creation_args(), keeping its original id"""
+        match = cls(team1_name, team2_name, total_overs, team1_flag, team2_flag)
+        match.id = id
+        return match
+    
+    def replay_commands(self, records: Iterable[Dict[str, Any]]):
+        """Re-run journalled commands in bulk.
+        
+        The history takes no checkpoints along the way (seek() takes them the
+        first time it replays past them), and the analytics of the innings
+        played are counted once at the end from the overs' running totals.
+        """
+        first_innings = self.current_innings
+        replayed = False
+        history = self.history
+        history.checkpointing = False
+        self._analytics_paused = True
+        try:
+            for record in records:
+                self._replay_command(record)
+                replayed = True
+                if record["cmd"] in HISTORY_COMMANDS:
+                    # Going back may replay from a checkpoint in an earlier innings
+                    first_innings = 1
+        finally:
+            history.checkpointing = True
+            self._analytics_paused = False
+            if replayed:
+                self._count_analytics(first_innings)
+    
+    def _count_analytics(self, first_innings: int):
+        """Count the analytics of innings first_innings onwards again from their overs"""
+        for index, analytics in enumerate(self.innings_analytics):
+            if analytics.number >= first_innings:
+                innings = self.find_innings(analytics.number)
+                overs = innings.loaded().overs if innings else self.overs
+                self.innings_analytics[index] = InningsAnalytics.from_overs(analytics.number, self.total_overs, overs)
+    
+    def _replay_command(self, record: Dict[str, Any]):
+        """Re-run one journalled command against this match"""
+        if record["cmd"] not in MATCH_COMMANDS:
+            raise ValueError(f"Unknown journal command: {record['cmd']}")
+        
+        args = dict(record["args"])
+        if args.get("wicket_type"):
+            args["wicket_type"] = WicketType(args["wicket_type"])
+        if args.get("extra_type"):
+            args["extra_type"] = ExtraType(args["extra_type"])
+        
+        self.version = record["seq"]
+        try:
+            getattr(self, record["cmd"])(**args)
+        except Exception:
+            # The command failed the same way when it was first recorded
+            pass
     
     @classmethod
     def load_from_file(cls, filepath: str) -> 'Match':
@@ -670,6 +1296,7 @@ class Match:
         match.is_finished = match_info["is_finished"]
         match.winner = match_info["winner"]
         match.match_result = match_info.get("match_result", "")
+        match.version = match_info.get("version", 0)
         
         # Restore teams
         team_data = data["teams"]
@@ -704,21 +1331,32 @@ class Match:
         match.fall_of_wickets = data["fall_of_wickets"]
         
         # Restore overs
-        for over_data in data["overs"]:
-            balls = []
-            for ball_data in over_data["balls"]:
-                # Convert enum strings back to enum objects
-                if ball_data.get("wicket_type"):
-                    ball_data["wicket_type"] = WicketType(ball_data["wicket_type"])
-                if ball_data.get("extra_type"):
-                    ball_data["extra_type"] = ExtraType(ball_data["extra_type"])
-                balls.append(Ball(**ball_data))
-            
-            over = Over(
-                over_data["over_number"],
-                over_data["bowler"],
-                balls
-            )
-            match.overs.append(over)
+        match.overs = [over_from_data(over) for over in data["overs"]]
+        match.innings_deliveries = sum(len(over.balls) for over in match.overs)
+        
+        if "analytics" in data:
+            match.innings_analytics = [InningsAnalytics.from_data(analytics, match.total_overs)
+                                       for analytics in data["analytics"]]
+        else:
+            # Saved before analytics were: only the current innings' overs are there to count
+            match.innings_analytics = [InningsAnalytics(number, match.total_overs)
+                                       for number in range(1, match.current_innings + 1)]
+            for over in match.overs:
+                for ball in over.balls:
+                    match.innings_analytics[-1].add_ball(over.over_number, ball)
+        
+        # Completed innings: just their totals until their overs are asked for
+        for summary in data.get("innings", []):
+            path = innings_path_for(filepath, summary["number"])
+            match.completed_innings.append(Innings.from_data(summary, path))
+            match._innings_files[path] = summary["ended_at"]
+        # Only the commands from here on are known until something needs to undo past them
+        match.history = MatchHistory(complete=False, journal_path=journal_path_for(filepath),
+                                     redo_saved=match_info.get("can_redo", False))
+        
+        # Roll forward any commands journalled after the snapshot was written
+        match.replay_commands(record for record in MatchJournal.read(journal_path_for(filepath),
+                                                                      match_info.get("journal_offset", 0))
+                              if record["seq"] >= match.version)
         
         return match
\ No newline at end of file
@@ -0,0 +1,201 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, TYPE_CHECKING
+from concurrency import run_blocking
+
+if TYPE_CHECKING:
+    from registry import LiveMatch
+
+# A changed match is snapshotted once it has been quiet this long...
+SNAPSHOT_QUIET_PERIOD = 1.0
+# ...and never later than this after its first unsaved change
+SNAPSHOT_MAX_DELAY = 5.0
+# Journalled commands are fsynced at most this long after they are appended
+JOURNAL_SYNC_DELAY = 0.2
+
+@dataclass
+class PersistState:
+    """What is on disk for one live match, compared with its in-memory version"""
+    entry: 'LiveMatch'
+    snapshot_path: str
+    snapshot_version: int
+    synced_version: int
+    # First change not yet in a snapshot, and the latest change
+    dirty_since: Optional[float] = None
+    last_change: float = 0.0
+    # Snapshot as soon as possible (match finished, journal due for compaction)
+    urgent: bool = False
+    last_write_seconds: float = 0.0
+    last_error: Optional[str] = None
+    
+    def sync_due(self) -> Optional[float]:
+        if self.synced_version >= self.entry.match.version:
+            return None
+        return self.last_change + JOURNAL_SYNC_DELAY
+    
+    def snapshot_due(self) -> Optional[float]:
+        if self.dirty_since is None:
+            return None
+        if self.urgent:
+            return 0.0
+        return min(self.last_change + SNAPSHOT_QUIET_PERIOD, self.dirty_since + SNAPSHOT_MAX_DELAY)
+    
+    def next_due(self) -> Optional[float]:
+        due = [when for when in (self.sync_due(), self.snapshot_due()) if when is not None]
+        return min(due) if due else None
+
+class PersistenceWorker:
+    """Writes match snapshots and syncs journals on a background thread.
+    
+    Scoring handlers only call mark_dirty(). Rapid successive changes to a
+    match are merged into one snapshot, written after SNAPSHOT_QUIET_PERIOD
+    of quiet but no later than SNAPSHOT_MAX_DELAY after the first of them.
+    The snapshot itself is captured on the match's writer thread, so it is
+    consistent, and encoded and written here.
+    """
+    
+    def __init__(self):
+        self._states: Dict[str, PersistState] = {}
+        self._cond = threading.Condition()
+        # Held while touching a match's files, so eviction never races a write
+        self._io_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="match-persister", daemon=True)
+        self._thread.start()
+    
+    def track(self, entry: 'LiveMatch', snapshot_path: str):
+        """Start persisting a live match whose snapshot and journal are up to date on disk"""
+        version = entry.match.version
+        with self._cond:
+            self._states[entry.match.id] = PersistState(entry, snapshot_path, version, version)
+    
+    def mark_dirty(self, entry: 'LiveMatch', urgent: bool = False):
+        """Note that a match changed; called on its writer thread after each command"""
+        now = time.monotonic()
+        with self._cond:
+            state = self._states.get(entry.match.id)
+            if not state:
+                return
+            if state.dirty_since is None:
+                state.dirty_since = now
+            state.last_change = now
+            journal = entry.match.journal
+            state.urgent = state.urgent or urgent or bool(journal and journal.needs_compaction)
+            self._cond.notify()
+    
+    def save_now(self, entry: 'LiveMatch'):
+        """Snapshot a match straight away, for an explicit save from the control panel"""
+        with self._cond:
+            state = self._states.get(entry.match.id)
+        if state:
+            self._persist(state, snapshot=True)
+    
+    def release(self, entry: 'LiveMatch'):
+        """Stop tracking a match, writing its final snapshot and closing its journal.
+        
+        The match's writer must already be shut down.
+        """
+        with self._cond:
+            state = self._states.pop(entry.match.id, None)
+        with self._io_lock:
+            match = entry.match
+            if state:
+                run_blocking(match.save_to_file, state.snapshot_path)
+            if match.journal:
+                run_blocking(match.journal.close)
+                match.journal = None
+    
+    def lag(self) -> List[Dict[str, Any]]:
+        """How far each match's persisted state trails its in-memory state"""
+        now = time.monotonic()
+        with self._cond:
+            states = list(self._states.values())
+        return [
+            {
+                "match_id": state.entry.match.id,
+                "version": state.entry.match.version,
+                "synced_version": state.synced_version,
+                "snapshot_version": state.snapshot_version,
+                "unsynced_commands": max(state.entry.match.version - state.synced_version, 0),
+                "unsnapshotted_commands": max(state.entry.match.version - state.snapshot_version, 0),
+                "seconds_behind": round(now - state.dirty_since, 3) if state.dirty_since is not None else 0.0,
+                "last_write_ms": round(state.last_write_seconds * 1000, 2),
+                "last_error": state.last_error,
+            }
+            for state in states
+        ]
+    
+    def flush(self):
+        """Write everything still pending, e.g. at shutdown"""
+        with self._cond:
+            states = list(self._states.values())
+        for state in states:
+            self._persist(state, snapshot=state.dirty_since is not None)
+    
+    def stop(self):
+        """Flush pending writes and stop the worker thread"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    due = [(state, state.next_due()) for state in self._states.values()]
+                    due = [(state, when) for state, when in due if when is not None]
+                    ready = [state for state, when in due if when <= now]
+                    if ready:
+                        break
+                    self._cond.wait(timeout=min(when for _, when in due) - now if due else None)
+            for state in ready:
+                snapshot_due = state.snapshot_due()
+                self._persist(state, snapshot=snapshot_due is not None and snapshot_due <= now)
+    
+    def _capture(self, state: PersistState) -> Dict[str, Any]:
+        """Take a snapshot of the match on its writer thread"""
+        match = state.entry.match
+        try:
+            return state.entry.run(match.snapshot_data, state.snapshot_path)
+        except RuntimeError:
+            # The writer has been shut down (eviction or interpreter exit), so
+            # nothing else is mutating the match
+            return match.snapshot_data(state.snapshot_path)
+    
+    def _persist(self, state: PersistState, snapshot: bool):
+        match = state.entry.match
+        with self._io_lock:
+            if self._states.get(match.id) is not state:
+                # Released while this write was waiting
+                return
+            try:
+                started = time.perf_counter()
+                if snapshot:
+                    with self._cond:
+                        state.dirty_since = None
+                        state.urgent = False
+                    match_data = self._capture(state)
+                    run_blocking(match.write_snapshot, state.snapshot_path, match_data)
+                    state.snapshot_version = match_data["match_info"]["version"]
+                # Records up to this version have already been flushed to the OS
+                version = match.version
+                if match.journal:
+                    run_blocking(match.journal.sync)
+                state.synced_version = max(version, state.snapshot_version)
+                state.last_write_seconds = time.perf_counter() - started
+                state.last_error = None
+            except Exception as e:
+                # Keep the match dirty and try again after the usual delay
+                state.last_error = str(e)
+                with self._cond:
+                    now = time.monotonic()
+                    if snapshot and state.dirty_since is None:
+                        state.dirty_since = now
+                    state.last_change = now
+                print(f"Failed to persist match {match.id}: {e}")
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, IO
+from models import Match
+from catalog import MatchCatalog
+from persistence import PersistenceWorker
+from concurrency import run_blocking
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): only a single server process is supported there
+    fcntl = None
+
+# How long a finished match stays in memory after its last update
+FINISHED_MATCH_TTL = 30 * 60
+
+class MatchOwnedElsewhere(Exception):
+    """The match is live in another server process (see cluster.py)"""
+
+def lock_match(lock_path: str) -> Optional[IO]:
+    """Take the lock that makes this process the match's only owner, held until the file is closed"""
+    if not fcntl:
+        return None
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise MatchOwnedElsewhere(os.path.basename(lock_path))
+    return lock_file
+
+@dataclass
+class LiveMatch:
+    match: Match
+    # Last status broadcast to the match room, the base for match_delta patches
+    last_broadcast_status: Optional[Dict[str, Any]] = None
+    last_active: float = field(default_factory=time.time)
+    # Single writer thread: every read and mutation of the match is queued here
+    executor: ThreadPoolExecutor = field(
+        default_factory=lambda: ThreadPoolExecutor(max_workers=1, thread_name_prefix="match-writer"))
+    # Ownership lock on data/match_<id>.lock, released when the match is evicted
+    owner_lock: Optional[IO] = None
+    
+    def touch(self):
+        self.last_active = time.time()
+    
+    def run(self, fn, *args, **kwargs):
+        """Queue fn on this match's writer thread and wait for its result.
+        
+        Must not be called from the writer thread itself, which would deadlock.
+        """
+        return self.executor.submit(fn, *args, **kwargs).result()
+
+class MatchRegistry:
+    """Live matches held in memory, keyed by Match.id.
+    
+    Snapshots and journal fsyncs of live matches are left to a background
+    PersistenceWorker; call mark_dirty() after changing a match.
+    """
+    
+    def __init__(self, data_dir: str = "data", catalog: Optional[MatchCatalog] = None):
+        self.data_dir = data_dir
+        self.catalog = catalog
+        self.persister = PersistenceWorker()
+        self._matches: Dict[str, LiveMatch] = {}
+        self._lock = threading.Lock()
+    
+    def snapshot_path(self, match_id: str) -> str:
+        return os.path.join(self.data_dir, f"match_{match_id}.json")
+    
+    def lock_path(self, match_id: str) -> str:
+        return os.path.join(self.data_dir, f"match_{match_id}.lock")
+    
+    def _attach(self, match: Match):
+        """Keep the catalog in step with every snapshot of the match"""
+        if self.catalog:
+            match.save_listeners.append(self.catalog.record)
+    
+    def add(self, match: Match) -> LiveMatch:
+        """Register a newly created match and start journalling it"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        owner_lock = lock_match(self.lock_path(match.id))
+        self._attach(match)
+        run_blocking(match.save_to_file, self.snapshot_path(match.id))
+        match.open_journal(self.snapshot_path(match.id), sync_each_append=False)
+        run_blocking(match.journal.sync)
+        entry = LiveMatch(match, owner_lock=owner_lock)
+        self.persister.track(entry, self.snapshot_path(match.id))
+        with self._lock:
+            self._matches[match.id] = entry
+        return entry
+    
+    def load(self, match_id: str) -> LiveMatch:
+        """Return a live match, loading it from disk if it is not in memory"""
+        with self._lock:
+            entry = self._matches.get(match_id)
+            if entry:
+                entry.touch()
+                return entry
+            
+            filepath = self.snapshot_path(match_id)
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(f"No saved match {match_id}")
+            # Raises MatchOwnedElsewhere if another server process has it live
+            owner_lock = lock_match(self.lock_path(match_id))
+            try:
+                match = run_blocking(Match.load_from_file, filepath)
+            except Exception:
+                if owner_lock:
+                    owner_lock.close()
+                raise
+            self._attach(match)
+            match.open_journal(filepath, sync_each_append=False)
+            entry = LiveMatch(match, owner_lock=owner_lock)
+            self.persister.track(entry, filepath)
+            self._matches[match_id] = entry
+            return entry
+    
+    def get(self, match_id: Optional[str]) -> Optional[LiveMatch]:
+        with self._lock:
+            return self._matches.get(match_id) if match_id else None
+    
+    def latest(self) -> Optional[LiveMatch]:
+        """The most recently active match, for clients that don't name one"""
+        with self._lock:
+            if not self._matches:
+                return None
+            return max(self._matches.values(), key=lambda entry: entry.last_active)
+    
+    def live_matches(self) -> List[LiveMatch]:
+        with self._lock:
+            return list(self._matches.values())
+    
+    def evict(self, match_id: str) -> bool:
+        """Write a final snapshot and drop the match from memory"""
+        with self._lock:
+            entry = self._matches.pop(match_id, None)
+        if not entry:
+            return False
+        
+        # Let queued commands finish before the final snapshot
+        entry.executor.shutdown(wait=True)
+        self.persister.release(entry)
+        if entry.owner_lock:
+            entry.owner_lock.close()
+        return True
+    
+    def mark_dirty(self, entry: LiveMatch, urgent: bool = False):
+        """Schedule a live match to be persisted; call on its writer thread after a change"""
+        self.persister.mark_dirty(entry, urgent)
+    
+    def close_inherited_locks(self):
+        """Drop the ownership locks a process forked from this one inherited.
+        
+        A flock is held until every copy of its file is closed, so a worker
+        process forked while matches are live would otherwise keep them locked
+        after this process evicts them. Call only in the forked process.
+        """
+        for entry in list(self._matches.values()):
+            if entry.owner_lock:
+                entry.owner_lock.close()
+    
+    def close(self):
+        """Flush every live match to disk, e.g. at shutdown"""
+        self.persister.stop()
+    
+    def evict_finished(self, ttl: float = FINISHED_MATCH_TTL) -> List[str]:
+        """Evict finished matches that have had no activity for ttl seconds"""
+        cutoff = time.time() - ttl
+        with self._lock:
+            stale = [match_id for match_id, entry in self._matches.items()
+                     if entry.match.is_finished and entry.last_active < cutoff]
+        return [match_id for match_id in stale if self.evict(match_id)]
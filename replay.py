@@ -0,0 +1,181 @@
+"""Rebuild matches from their command stream and check stored totals against the replay.
+
+    python replay.py [data_dir] [--workers N] [--strict]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import List, Dict, Optional, Any
+from models import Match, serialize_dataclass
+from journal import MatchJournal, journal_path_for, CREATE_SEQ
+
+def read_command_stream(snapshot_path: str) -> Optional[List[Dict[str, Any]]]:
+    """The match's full command stream from its journal, or None if the journal is incomplete"""
+    records = MatchJournal.read(journal_path_for(snapshot_path))
+    if records and records[0]["cmd"] == "create":
+        return records
+    return None
+
+def replay(records: List[Dict[str, Any]]) -> Match:
+    """Build a Match purely from an ordered command stream starting with its create record"""
+    header = records[0]
+    if header["cmd"] != "create":
+        raise ValueError("Command stream must start with a create record")
+    match = Match.create(**header["args"])
+    match.replay_commands(records[1:])
+    return match
+
+def synthesize_command_stream(stored: Match) -> List[Dict[str, Any]]:
+    """Best-effort command stream for a match saved without a full journal.
+    
+    Commands are inferred from the stored balls (each ball records the bowler
+    and the batters at the crease before it). Only the overs of the current
+    innings are stored, so a match saved during the second innings can't be
+    rebuilt past its setup and will show up with differences.
+    """
+    records = [{"seq": CREATE_SEQ, "cmd": "create", "args": stored.creation_args()}]
+    scratch = Match.create(**stored.creation_args())
+    
+    def command(cmd: str, **args):
+        args = {key: value.value if isinstance(value, Enum) else value for key, value in args.items()}
+        record = {"seq": scratch.version, "cmd": cmd, "args": args}
+        records.append(record)
+        scratch._replay_command(record)
+    
+    for team in (stored.team1, stored.team2):
+        for player in team.players:
+            command("add_player", name=player, team=team.name)
+    if stored.toss_winner:
+        command("set_toss", winner=stored.toss_winner, decision=stored.toss_decision)
+    if not stored.is_started or stored.current_innings != 1 or not stored.overs:
+        return records
+    
+    first_balls = [over.balls[0] for over in stored.overs if over.balls]
+    opener = first_balls[0] if first_balls else None
+    command("start_innings",
+            striker=opener.prev_striker if opener else stored.striker,
+            non_striker=opener.prev_non_striker if opener else stored.non_striker,
+            bowler=stored.overs[0].bowler)
+    
+    def bring_in(striker: Optional[str], non_striker: Optional[str]):
+        """Add whichever batter the stored state has at the crease that the replay doesn't"""
+        at_crease = {scratch.striker, scratch.non_striker}
+        for batter in (striker, non_striker):
+            if batter and batter not in at_crease:
+                command("set_new_batter", batter=batter)
+                return
+    
+    for index, over in enumerate(stored.overs):
+        if index > 0:
+            command("set_new_bowler", bowler=over.bowler)
+        for ball in over.balls:
+            bring_in(ball.prev_striker, ball.prev_non_striker)
+            command("add_ball", runs=ball.runs, is_wicket=ball.is_wicket, wicket_type=ball.wicket_type,
+                    dismissed_player=ball.dismissed_player, extra_type=ball.extra_type,
+                    extra_runs=ball.extra_runs)
+    bring_in(stored.striker, stored.non_striker)
+    return records
+
+def match_totals(match: Match) -> Dict[str, Any]:
+    """The derived state that load_from_file takes on trust"""
+    return {
+        "team1": serialize_dataclass(match.team1),
+        "team2": serialize_dataclass(match.team2),
+        "players": {name: serialize_dataclass(player) for name, player in match.players.items()},
+        "partnerships": [serialize_dataclass(p) for p in match.partnerships],
+        "fall_of_wickets": list(match.fall_of_wickets),
+        "striker": match.striker,
+        "non_striker": match.non_striker,
+        "bowler": match.bowler,
+        "current_innings": match.current_innings,
+        "current_over": match.current_over,
+        "current_ball": match.current_ball,
+        "is_finished": match.is_finished,
+        "winner": match.winner,
+        "match_result": match.match_result,
+        "over_summaries": [over.summary for over in match.overs]
+    }
+
+def diff_values(path: str, stored: Any, replayed: Any, differences: List[str]):
+    if isinstance(stored, dict) and isinstance(replayed, dict):
+        for key in sorted(set(stored) | set(replayed), key=str):
+            diff_values(f"{path}.{key}" if path else str(key), stored.get(key), replayed.get(key), differences)
+    elif isinstance(stored, list) and isinstance(replayed, list) and len(stored) == len(replayed):
+        for index, (stored_item, replayed_item) in enumerate(zip(stored, replayed)):
+            diff_values(f"{path}[{index}]", stored_item, replayed_item, differences)
+    elif stored != replayed:
+        differences.append(f"{path}: stored {stored!r} != replayed {replayed!r}")
+
+def diff_match(stored: Match, replayed: Match) -> List[str]:
+    """Every derived total where the stored match disagrees with its replay"""
+    differences = []
+    diff_values("", match_totals(stored), match_totals(replayed), differences)
+    return differences
+
+def replay_file(snapshot_path: str) -> Dict[str, Any]:
+    """Replay one saved match and compare it with what is stored"""
+    report = {"file": os.path.basename(snapshot_path), "source": None, "commands": 0,
+              "balls": 0, "seconds": 0.0, "differences": [], "error": None}
+    try:
+        stored = Match.load_from_file(snapshot_path)
+        records = read_command_stream(snapshot_path)
+        report["source"] = "journal" if records else "balls"
+        if records is None:
+            records = synthesize_command_stream(stored)
+        
+        started = time.perf_counter()
+        replayed = replay(records)
+        report["seconds"] = time.perf_counter() - started
+        report["commands"] = len(records)
+        report["balls"] = sum(1 for record in records if record["cmd"] == "add_ball")
+        report["differences"] = diff_match(stored, replayed)
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+    return report
+
+def replay_archive(data_dir: str = "data", workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Replay every saved match in data_dir, spread over a process pool"""
+    paths = sorted(os.path.join(data_dir, filename) for filename in os.listdir(data_dir)
+                   if filename.startswith("match_") and filename.endswith(".json"))
+    if workers == 1 or len(paths) < 2:
+        return [replay_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(replay_file, paths, chunksize=16))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay saved matches and diff their stored totals")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--workers", type=int, default=None, help="replay processes (default: CPU count)")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 if any match differs")
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    reports = replay_archive(args.data_dir, args.workers)
+    elapsed = time.perf_counter() - started
+    
+    mismatched = 0
+    for report in reports:
+        if report["error"]:
+            status = f"ERROR {report['error']}"
+        elif report["differences"]:
+            status = f"{len(report['differences'])} differences"
+        else:
+            status = "ok"
+        print(f"{report['file']:32} {report['source'] or '-':8} {report['balls']:6} balls  {status}")
+        for difference in report["differences"][:10]:
+            print(f"    {difference}")
+        mismatched += bool(report["error"] or report["differences"])
+    
+    balls = sum(report["balls"] for report in reports)
+    replay_seconds = sum(report["seconds"] for report in reports)
+    print(f"\n{len(reports)} matches, {balls} balls, {mismatched} with differences, {elapsed:.2f}s wall")
+    if replay_seconds:
+        print(f"Replay throughput: {balls / replay_seconds:,.0f} balls/sec per process")
+    if args.strict and mismatched:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,11 @@ class CricketControl {
       return;
     }
 
-    this.socket = io();
+    this.socket = io({
+      transports: socketTransports,
+      query: { page: 'control', ...wireFormatQuery() },
+    });
+    this.wire = new WireDecoder(this.socket);
     this.currentMatch = null;
     this.pendingNewBatter = null; // Track when we need new batter after bowler change
     this.pendingBall = {
@@ -18,6 +22,8 @@ class CricketControl {
       extraType: null,
       extraRuns: 0,
     };
+    // Pages of the saved-match picker loaded so far for the current filters
+    this.savedMatches = { page: 0, loaded: 0, request: 0 };
     this.initializeSocket();
     this.loadSavedMatches();
     this.setupEventListeners();
@@ -27,6 +33,12 @@ class CricketControl {
     this.socket.on("connect", () => {
       console.log("Connected to server");
       this.updateConnectionStatus(true);
+      // Rejoin our match room after a reconnect
+      if (this.currentMatch) {
+        this.socket.emit("join_match", {
+          match_id: this.currentMatch.match_id,
+        });
+      }
     });
 
     this.socket.on("disconnect", () => {
@@ -34,7 +46,7 @@ class CricketControl {
       this.updateConnectionStatus(false);
     });
 
-    this.socket.on("match_created", (matchData) => {
+    this.wire.on(this.socket, "match_created", (matchData) => {
       console.log("Match created event received:", matchData);
       this.currentMatch = matchData;
       this.showMessage("Match created successfully!", "success");
@@ -54,7 +66,7 @@ class CricketControl {
       this.updateUndoButtonState();
     });
 
-    this.socket.on("match_update", (matchData) => {
+    this.wire.on(this.socket, "match_update", (matchData) => {
       console.log(
         "match_update received - isStarted:",
         matchData ? matchData.is_started : "no data",
@@ -62,14 +74,15 @@ class CricketControl {
         matchData && matchData.overs ? matchData.overs.length : 0
       );
       this.currentMatch = matchData;
-      this.updateMatchDisplay();
-      this.updateUndoButtonState();
+      this.refreshMatchState();
+    });
 
-      // Populate player selects if they're empty (happens when loading from file)
-      const newBowlerSelect = document.getElementById("new-bowler-select");
-      if (newBowlerSelect && newBowlerSelect.children.length <= 1) {
-        // Only has the default "Select Player" option, so populate the dropdowns
-        this.populatePlayerSelects();
+    this.wire.on(this.socket, "match_delta", (delta) => {
+      if (applyMatchDelta(this.currentMatch, delta)) {
+        this.refreshMatchState();
+      } else {
+        // Missed an update or joined mid-sequence, ask for a full snapshot
+        this.emitForMatch("request_resync");
       }
     });
 
@@ -129,12 +142,78 @@ class CricketControl {
 
     this.socket.on("ball_undone", (result) => {
       console.log("Ball undone:", result);
-      this.showMessage("Last ball undone successfully", "success");
-      this.resetBallInput();
-      this.updateUndoButtonState();
+      this.handleHistoryMove(result);
+    });
+
+    this.socket.on("ball_redone", (result) => {
+      console.log("Ball redone:", result);
+      this.handleHistoryMove(result);
+    });
+
+    this.socket.on("match_rewound", (result) => {
+      console.log("Match rewound:", result);
+      this.handleHistoryMove(result);
     });
   }
 
+  handleHistoryMove(result) {
+    this.showMessage(result.message, "success");
+    this.resetBallInput();
+    this.updateUndoButtonState();
+
+    // Whatever the scorer was being asked for belongs to the old position
+    ["new-bowler-modal", "new-batter-modal", "second-innings-modal"].forEach(
+      (modalId) => this.closeModal(modalId)
+    );
+    this.pendingNewBatter = null;
+    this.showSection("scoring-section");
+
+    const match = this.currentMatch;
+    if (!match || match.is_finished) {
+      return;
+    }
+
+    // The new position may be waiting for players, as after a ball
+    if (match.current_innings === 2 && !match.striker) {
+      this.showSecondInningsModal();
+      return;
+    }
+    const lastOver = match.overs[match.overs.length - 1];
+    const lastWicket = match.fall_of_wickets[match.fall_of_wickets.length - 1];
+    const needsBatter =
+      lastWicket &&
+      (lastWicket.player === match.striker ||
+        lastWicket.player === match.non_striker);
+    if (lastOver && lastOver.over_number < match.current_over) {
+      this.showNewBowlerModal();
+      if (needsBatter) {
+        this.pendingNewBatter = lastWicket.player;
+      }
+    } else if (needsBatter) {
+      this.showNewBatterModal();
+    }
+  }
+
+  emitForMatch(event, data = {}) {
+    // Scoring events name the match they apply to, the server hosts several
+    this.socket.emit(event, {
+      ...data,
+      match_id: this.currentMatch ? this.currentMatch.match_id : null,
+    });
+  }
+
+  refreshMatchState() {
+    this.updateMatchDisplay();
+    this.updateUndoButtonState();
+
+    // Populate player selects if they're empty (happens when loading from file)
+    const newBowlerSelect = document.getElementById("new-bowler-select");
+    if (newBowlerSelect && newBowlerSelect.children.length <= 1) {
+      // Only has the default "Select Player" option, so populate the dropdowns
+      this.populatePlayerSelects();
+    }
+  }
+
   handleMatchComplete(result) {
     this.showMessage(`Match Complete! ${result.match_result}`, "success");
     this.showSection("match-complete-section");
@@ -239,6 +318,25 @@ class CricketControl {
     document
       .getElementById("team2-name")
       .addEventListener("input", this.updateTossOptions.bind(this));
+
+    // Saved-match filters start the picker again from its first page
+    let teamFilterTimer = null;
+    document
+      .getElementById("saved-match-team")
+      .addEventListener("input", () => {
+        clearTimeout(teamFilterTimer);
+        teamFilterTimer = setTimeout(() => this.loadSavedMatches(), 300);
+      });
+    const filterIds = [
+      "saved-match-from",
+      "saved-match-to",
+      "saved-match-finished",
+    ];
+    filterIds.forEach((id) => {
+      document
+        .getElementById(id)
+        .addEventListener("change", () => this.loadSavedMatches());
+    });
   }
 
   updateConnectionStatus(connected) {
@@ -267,24 +365,79 @@ class CricketControl {
         `;
   }
 
-  loadSavedMatches() {
-    fetch("/api/matches")
-      .then((response) => response.json())
-      .then((matches) => {
-        const select = document.getElementById("saved-matches");
-        select.innerHTML = '<option value="">Select a saved match</option>';
-        matches.forEach((match) => {
-          const option = document.createElement("option");
-          option.value = match.id;
-          option.textContent = `Match ${match.id}`;
-          select.appendChild(option);
-        });
-      })
-      .catch((error) => {
-        console.error("Error loading saved matches:", error);
-      });
+  savedMatchFilters() {
+    const params = new URLSearchParams();
+    const filters = {
+      team: document.getElementById("saved-match-team").value.trim(),
+      from: document.getElementById("saved-match-from").value,
+      to: document.getElementById("saved-match-to").value,
+      finished: document.getElementById("saved-match-finished").value,
+    };
+    Object.entries(filters).forEach(([name, value]) => {
+      if (value) params.set(name, value);
+    });
+    return params;
+  }
+
+  // Fetch one page of saved matches into the picker: the first page for the
+  // current filters, or with more set, the page after the ones already shown
+  async loadSavedMatches(more = false) {
+    const state = this.savedMatches;
+    // A newer load (new filters) makes responses to older ones stale
+    const requestId = ++state.request;
+    const page = more ? state.page + 1 : 1;
+    const params = this.savedMatchFilters();
+    params.set("page", page);
+    params.set("per_page", SAVED_MATCHES_PAGE_SIZE);
+    const moreButton = document.getElementById("saved-matches-more");
+    moreButton.disabled = true;
+
+    let matches, total;
+    try {
+      const response = await fetch(`/api/matches?${params}`);
+      const body = await response.json();
+      if (!response.ok) {
+        throw new Error(body.error || `HTTP ${response.status}`);
+      }
+      matches = body;
+      total = parseInt(response.headers.get("X-Total-Count"), 10) || 0;
+    } catch (error) {
+      if (requestId === state.request) {
+        document.getElementById("saved-matches-count").textContent =
+          error.message;
+        moreButton.disabled = false;
+      }
+      console.error("Error loading saved matches:", error);
+      return;
+    }
+    if (requestId !== state.request) return;
+
+    const select = document.getElementById("saved-matches");
+    if (!more) {
+      select.innerHTML = '<option value="">Select a saved match</option>';
+      state.loaded = 0;
+    }
+    matches.forEach((match) => {
+      const option = document.createElement("option");
+      option.value = match.id;
+      const status = match.is_finished
+        ? match.match_result
+        : match.is_started
+        ? "In progress"
+        : "Not started";
+      option.textContent = `${match.team1} vs ${match.team2} (${match.played_at}) - ${status}`;
+      select.appendChild(option);
+    });
+    state.page = page;
+    state.loaded += matches.length;
+
+    document.getElementById("saved-matches-count").textContent =
+      `Showing ${state.loaded} of ${total}`;
+    moreButton.style.display = state.loaded < total ? "" : "none";
+    moreButton.disabled = false;
   }
 
+
   showSection(sectionId) {
     document.querySelectorAll("section").forEach((section) => {
       section.style.display = "none";
@@ -538,36 +691,31 @@ class CricketControl {
       return;
     }
 
+    const redoButton = document.querySelector('button[onclick="redoBall()"]');
+    const rewindButton = document.querySelector(
+      'button[onclick="rewindToBall()"]'
+    );
     const isActive = this.isMatchActive();
 
-    // Enable undo if there's an active match and balls have been played
+    // The server works out what can be undone or redone, across innings too
     if (isActive && this.currentMatch) {
-      // Check if there are any balls that can be undone
-      let hasPlayedBalls = false;
-      let totalBalls = 0;
-
-      if (this.currentMatch.overs && this.currentMatch.overs.length > 0) {
-        // Count all balls across all overs
-        this.currentMatch.overs.forEach((over) => {
-          if (over.balls && over.balls.length > 0) {
-            totalBalls += over.balls.length;
-          }
-        });
-        hasPlayedBalls = totalBalls > 0;
-      }
-
       console.log("UNDO BUTTON STATE:", {
         isMatchActive: isActive,
-        hasOvers: this.currentMatch.overs ? this.currentMatch.overs.length : 0,
-        totalBalls: totalBalls,
-        hasPlayedBalls: hasPlayedBalls,
-        willEnable: hasPlayedBalls,
+        canUndo: this.currentMatch.can_undo,
+        canRedo: this.currentMatch.can_redo,
       });
 
-      undoButton.disabled = !hasPlayedBalls;
+      undoButton.disabled = !this.currentMatch.can_undo;
+      if (redoButton) redoButton.disabled = !this.currentMatch.can_redo;
+      if (rewindButton) {
+        rewindButton.disabled =
+          !this.currentMatch.can_undo && !this.currentMatch.can_redo;
+      }
     } else {
       console.log("UNDO BUTTON DISABLED: No active match or match not started");
       undoButton.disabled = true;
+      if (redoButton) redoButton.disabled = true;
+      if (rewindButton) rewindButton.disabled = true;
     }
   }
 
@@ -643,6 +791,8 @@ class CricketControl {
 
 // Initialize the control panel
 let controlPanel;
+// Saved matches fetched per page of the saved-match picker
+const SAVED_MATCHES_PAGE_SIZE = 50;
 
 function initializeControlPanel() {
   console.log("Initializing control panel...");
@@ -768,7 +918,7 @@ function startInnings() {
     return;
   }
 
-  controlPanel.socket.emit("start_innings", {
+  controlPanel.emitForMatch("start_innings", {
     striker: striker,
     non_striker: nonStriker,
     bowler: bowler,
@@ -848,7 +998,7 @@ function submitBall() {
     }
   }
 
-  controlPanel.socket.emit("add_ball", ballData);
+  controlPanel.emitForMatch("add_ball", ballData);
 }
 
 function undoLastBall() {
@@ -858,7 +1008,37 @@ function undoLastBall() {
   }
 
   if (confirm("Are you sure you want to undo the last ball?")) {
-    controlPanel.socket.emit("undo_last_ball");
+    controlPanel.emitForMatch("undo_last_ball");
+  }
+}
+
+function redoBall() {
+  if (!controlPanel.isMatchActive()) {
+    controlPanel.showMessage("No active match", "error");
+    return;
+  }
+
+  controlPanel.emitForMatch("redo");
+}
+
+function rewindToBall() {
+  if (!controlPanel.isMatchActive()) {
+    controlPanel.showMessage("No active match", "error");
+    return;
+  }
+
+  const over = document.getElementById("rewind-over").value.trim();
+  if (!/^\d+\.[0-5]$/.test(over)) {
+    controlPanel.showMessage("Enter an over as overs.balls, e.g. 12.3", "error");
+    return;
+  }
+  const innings = document.getElementById("rewind-innings").value;
+
+  if (confirm(`Take the match back to ${over}? Later balls can be redone.`)) {
+    controlPanel.emitForMatch("rewind_to", {
+      over: over,
+      innings: innings ? parseInt(innings) : undefined,
+    });
   }
 }
 
@@ -869,7 +1049,7 @@ function setNewBowler() {
     return;
   }
 
-  controlPanel.socket.emit("set_new_bowler", { bowler: bowler });
+  controlPanel.emitForMatch("set_new_bowler", { bowler: bowler });
 }
 
 function setNewBatter() {
@@ -879,7 +1059,7 @@ function setNewBatter() {
     return;
   }
 
-  controlPanel.socket.emit("set_new_batter", { batter: batter });
+  controlPanel.emitForMatch("set_new_batter", { batter: batter });
 }
 
 function startSecondInnings() {
@@ -900,7 +1080,7 @@ function startSecondInnings() {
     return;
   }
 
-  controlPanel.socket.emit("start_second_innings", {
+  controlPanel.emitForMatch("start_second_innings", {
     striker: striker,
     non_striker: nonStriker,
     bowler: bowler,
@@ -915,6 +1095,11 @@ function createNewMatch() {
 // Flag upload handling
 let team1FlagUrl = "";
 let team2FlagUrl = "";
+// Each team's saved-flag picker lists flags whose team name starts with the
+// name typed for it, a page at a time, so it stays quick with thousands saved
+const FLAG_PICKER_SIZE = 50;
+const flagSearchTimers = {};
+const flagSearchRequests = { team1: 0, team2: 0 };
 
 function setupFlagUploadListeners() {
   const team1FlagInput = document.getElementById("team1-flag");
@@ -946,6 +1131,16 @@ function setupFlagUploadListeners() {
     });
   }
 
+  ["team1", "team2"].forEach((teamType) => {
+    const nameElement = document.getElementById(`${teamType}-name`);
+    if (nameElement) {
+      nameElement.addEventListener("input", function () {
+        clearTimeout(flagSearchTimers[teamType]);
+        flagSearchTimers[teamType] = setTimeout(() => loadSavedFlags(teamType), 200);
+      });
+    }
+  });
+
   // Load saved flags when listeners are set up
   loadSavedFlags();
 }
@@ -1009,41 +1204,61 @@ async function handleFlagUpload(event, teamType) {
   }
 }
 
-async function loadSavedFlags() {
+async function loadSavedFlags(teamType) {
+  if (!teamType) {
+    loadSavedFlags("team1");
+    loadSavedFlags("team2");
+    return;
+  }
+
+  const nameElement = document.getElementById(`${teamType}-name`);
+  const prefix = nameElement ? nameElement.value.trim() : "";
+  // Responses can arrive out of order while the name is being typed
+  const requestId = ++flagSearchRequests[teamType];
+
   try {
-    const response = await fetch("/api/saved-flags");
-    const result = await response.json();
+    let result = await fetchSavedFlags(prefix);
+    if (prefix && result.flags && result.flags.length === 0) {
+      // No flag saved for this name yet, offer the others
+      result = await fetchSavedFlags("");
+    }
 
-    if (result.flags) {
-      populateFlagDropdowns(result.flags);
+    if (result.flags && requestId === flagSearchRequests[teamType]) {
+      populateFlagDropdown(teamType, result.flags);
     }
   } catch (error) {
     console.error("Error loading saved flags:", error);
   }
 }
 
-function populateFlagDropdowns(flags) {
-  const team1Dropdown = document.getElementById("team1-saved-flags");
-  const team2Dropdown = document.getElementById("team2-saved-flags");
+async function fetchSavedFlags(prefix) {
+  const response = await fetch(
+    `/api/saved-flags?q=${encodeURIComponent(prefix)}&per_page=${FLAG_PICKER_SIZE}`
+  );
+  return response.json();
+}
 
-  // Clear existing options except the first one
-  [team1Dropdown, team2Dropdown].forEach((dropdown) => {
-    if (dropdown) {
-      // Keep only the first option
-      while (dropdown.children.length > 1) {
-        dropdown.removeChild(dropdown.lastChild);
-      }
+function populateFlagDropdown(teamType, flags) {
+  const dropdown = document.getElementById(`${teamType}-saved-flags`);
+  if (!dropdown) return;
 
-      // Add saved flags as options
-      flags.forEach((flag) => {
-        const option = document.createElement("option");
-        option.value = flag.url;
-        option.textContent = flag.team_name;
-        option.setAttribute("data-filename", flag.filename);
-        dropdown.appendChild(option);
-      });
-    }
+  // Keep only the first option
+  while (dropdown.children.length > 1) {
+    dropdown.removeChild(dropdown.lastChild);
+  }
+
+  // Add saved flags as options
+  flags.forEach((flag) => {
+    const option = document.createElement("option");
+    option.value = flag.url;
+    option.textContent = flag.team_name;
+    option.setAttribute("data-filename", flag.filename);
+    dropdown.appendChild(option);
   });
+
+  // Keep showing a flag picked before the list changed
+  const selectedUrl = teamType === "team1" ? team1FlagUrl : team2FlagUrl;
+  dropdown.value = flags.some((flag) => flag.url === selectedUrl) ? selectedUrl : "";
 }
 
 function handleSavedFlagSelection(event, teamType) {
@@ -1,8 +1,16 @@
 class CricketDisplay {
   constructor() {
-    this.socket = io();
+    this.socket = io({
+      transports: socketTransports,
+      query: { page: 'display', ...wireFormatQuery() },
+    });
+    this.wire = new WireDecoder(this.socket);
     this.currentMatch = null;
+    // Match to follow, e.g. /display?match=20250922_174906 (defaults to the latest live match)
+    this.matchId = new URLSearchParams(window.location.search).get("match");
     this.previousOvers = [];
+    // Latest win_probability estimate of the match
+    this.winProbability = null;
     this.initializeSocket();
   }
 
@@ -12,6 +20,7 @@ class CricketDisplay {
       this.updateConnectionStatus(true);
       // Set default state after connection
       this.showDefaultState();
+      this.socket.emit("join_match", { match_id: this.matchId });
     });
 
     this.socket.on("disconnect", () => {
@@ -19,7 +28,7 @@ class CricketDisplay {
       this.updateConnectionStatus(false);
     });
 
-    this.socket.on("match_update", (matchData) => {
+    this.wire.on(this.socket, "match_update", (matchData) => {
       console.log("Match update received:", matchData);
       console.log("Match finished status:", matchData.is_finished);
       console.log("Match winner:", matchData.winner);
@@ -32,6 +41,32 @@ class CricketDisplay {
       this.updateDisplay();
     });
 
+    this.socket.on("match_available", (data) => {
+      // Displays not pinned to a match follow whichever match was started last
+      if (!this.matchId) {
+        this.socket.emit("join_match", { match_id: data.match_id });
+      }
+    });
+
+    this.wire.on(this.socket, "match_delta", (delta) => {
+      console.log("Match delta received:", delta);
+      if (applyMatchDelta(this.currentMatch, delta)) {
+        this.updateDisplay();
+      } else {
+        // Missed an update or joined mid-sequence, ask for a full snapshot
+        this.socket.emit("request_resync", {
+          match_id: this.currentMatch ? this.currentMatch.match_id : null,
+        });
+      }
+    });
+
+    this.socket.on("win_probability", (estimate) => {
+      console.log("Win probability received:", estimate);
+      if (this.currentMatch && estimate.match_id !== this.currentMatch.match_id) return;
+      this.winProbability = estimate;
+      this.updateWinProbability();
+    });
+
     this.socket.on("ball_added", (result) => {
       console.log("Ball added result:", result);
       if (result.action === "match_complete") {
@@ -101,6 +136,7 @@ class CricketDisplay {
     this.updatePlayerCards();
     this.updateOverInfo();
     this.updateStats();
+    this.updateWinProbability();
     this.updateLastWicket();
 
     // Update scorecard if it's currently visible
@@ -310,21 +346,9 @@ class CricketDisplay {
       }
     }
 
-    // Update current run rate - calculate from actual balls bowled
-    const teamRuns = battingTeam.runs || 0;
-
-    // Calculate total balls bowled from current_over and current_ball
-    const totalBalls = (currentOver - 1) * 6 + currentBall;
-    const actualOvers = totalBalls > 0 ? totalBalls / 6 : 0;
-
-    const runRate =
-      actualOvers > 0 ? (teamRuns / actualOvers).toFixed(2) : "0.00";
-    console.log("Run rate calculation:", {
-      teamRuns,
-      totalBalls,
-      actualOvers,
-      runRate,
-    });
+    // Run rates, target and balls left come worked out in the analytics block
+    const analytics = this.currentMatch.analytics || {};
+    const runRate = (analytics.current_run_rate || 0).toFixed(2);
 
     const currentRrElement = document.getElementById("current-rr");
     if (currentRrElement) {
@@ -345,24 +369,11 @@ class CricketDisplay {
     }
 
     // Update target info based on match state
-    if (
-      this.currentMatch.current_innings === 2 &&
-      bowlingTeam.runs !== undefined
-    ) {
-      const target = bowlingTeam.runs + 1;
-      const currentRuns = battingTeam.runs || 0;
-      const runsNeeded = target - currentRuns;
-
-      // Calculate remaining balls
-      const totalBalls = this.currentMatch.total_overs * 6;
-      const ballsPlayed = (currentOver - 1) * 6 + currentBall;
-      const ballsRemaining = totalBalls - ballsPlayed;
-
-      // Calculate required run rate
-      const requiredRR =
-        ballsRemaining > 0
-          ? ((runsNeeded / ballsRemaining) * 6).toFixed(2)
-          : "0.00";
+    if (analytics.target !== undefined) {
+      const target = analytics.target;
+      const runsNeeded = analytics.runs_needed;
+      const ballsRemaining = analytics.balls_remaining;
+      const requiredRR = (analytics.required_run_rate || 0).toFixed(2);
 
       // Update target-info with comprehensive information
       document.getElementById(
@@ -603,29 +614,12 @@ class CricketDisplay {
     console.log("Current batting team:", currentBattingTeam);
     console.log("Current innings:", currentInnings);
 
-    // Get all balls from all overs, but only from current innings/batting team
-    const allBalls = [];
-    const overs = this.currentMatch.overs || [];
-
-    // Collect balls only from the current batting team's overs
-    overs.forEach((over) => {
-      if (over.balls && over.balls.length > 0) {
-        // Check if this over belongs to current batting team by checking the innings
-        // We'll include all overs for now and rely on match data structure
-        over.balls.forEach((ball, ballIndex) => {
-          allBalls.push({
-            ...ball,
-            overNumber: over.over_number || 1,
-            ballInOver: ballIndex + 1,
-          });
-        });
-      }
-    });
-
-    console.log("All balls collected for current team:", allBalls);
-
-    // Get the last 12 balls from current batting team only
-    const recentBalls = allBalls.slice(-12);
+    // The server keeps the current innings' last 12 deliveries in the analytics block
+    const analytics = this.currentMatch.analytics || {};
+    const recentBalls = (analytics.recent_balls || []).map((ball) => ({
+      ...ball,
+      overNumber: ball.over,
+    }));
     console.log("Last 12 balls from current team:", recentBalls);
 
     // Hide over section if no balls from current team or no balls at all
@@ -839,6 +833,29 @@ class CricketDisplay {
       .join("");
   }
 
+  updateWinProbability() {
+    const stat = document.getElementById("win-probability-stat");
+    if (!stat) return;
+
+    const estimate = this.winProbability;
+    const match = this.currentMatch;
+    // Estimates arrive after the ball they follow; hide one left over from another match or innings
+    if (!estimate || !match || match.is_finished || estimate.match_id !== match.match_id ||
+        estimate.innings !== match.current_innings) {
+      stat.style.display = "none";
+      return;
+    }
+
+    const battingTeam = match.batting_team;
+    const chance = Math.round((estimate.win_probability[battingTeam] || 0) * 100);
+    let text = `${battingTeam} ${chance}%`;
+    if (match.current_innings === 1) {
+      text += ` | PROJ ${Math.round(estimate.projected_score.mean)}`;
+    }
+    document.getElementById("win-probability-value").textContent = text;
+    stat.style.display = "block";
+  }
+
   updateStats() {
     if (!this.currentMatch) return;
 
@@ -857,13 +874,13 @@ class CricketDisplay {
 
       stats.push(`Runs: ${battingTeam.runs}`);
       stats.push(`Wickets: ${battingTeam.wickets}`);
-      stats.push(`Balls: ${battingTeam.balls}`);
+      const analytics = this.currentMatch.analytics || {};
+      stats.push(`Balls: ${analytics.balls_bowled || 0}`);
 
-      if (this.currentMatch.current_innings === 2) {
-        const bowlingTeam = team1.name === battingTeamName ? team2 : team1;
-        const target = bowlingTeam.runs + 1;
-        const needed = target - battingTeam.runs;
-        stats.push(`Need ${needed} runs to win`);
+      if (analytics.target !== undefined) {
+        stats.push(`Need ${analytics.runs_needed} runs to win`);
+      } else if (analytics.projected_total !== undefined) {
+        stats.push(`Projected: ${analytics.projected_total}`);
       }
     }
 
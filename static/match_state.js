@@ -0,0 +1,23 @@
+// Shared by the control panel and the display: applies a match_delta patch
+// from the server onto the full match status received in match_update.
+// Returns false when the patch does not follow on from the status we hold,
+// in which case the caller should emit "request_resync" for a fresh snapshot.
+function applyMatchDelta(match, delta) {
+  if (
+    !match ||
+    match.match_id !== delta.match_id ||
+    match.version !== delta.base_version
+  ) {
+    return false;
+  }
+
+  Object.assign(match, delta.changes);
+  Object.assign(match.players, delta.players);
+
+  // Overs are replaced from the first one that changed onwards
+  match.overs.length = delta.overs_from;
+  delta.overs.forEach((over) => match.overs.push(over));
+
+  match.version = delta.version;
+  return true;
+}
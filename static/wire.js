@@ -0,0 +1,146 @@
+// Shared by the control panel and the display: decodes match payloads sent in
+// the wire format the page asked for. Plain JSON is the default; add
+// ?format=msgpack and/or ?compression=deflate to the page URL to receive
+// MessagePack and/or deflated binary payloads instead (the server confirms
+// the format it will use in a "wire_format" event).
+
+// Socket.IO query parameters requesting the wire format named in the page URL
+function wireFormatQuery() {
+  const params = new URLSearchParams(window.location.search);
+  const query = {};
+  if (params.get("format") === "msgpack") {
+    query.format = "msgpack";
+  }
+  // Deflate needs the Compression Streams API to decode
+  if (params.get("compression") === "deflate" && typeof DecompressionStream !== "undefined") {
+    query.compression = "deflate";
+  }
+  return query;
+}
+
+class WireDecoder {
+  constructor(socket) {
+    this.format = { format: "json", compression: "none" };
+    // Decoding deflated payloads is asynchronous; later payloads wait their turn
+    // so deltas are still applied in the order they were sent
+    this.pending = Promise.resolve();
+    this.queued = 0;
+    socket.on("wire_format", (format) => {
+      this.format = format;
+    });
+  }
+
+  // socket.on(event, handler) for an event carrying a match payload
+  on(socket, event, handler) {
+    socket.on(event, (payload) => {
+      const deflated = payload instanceof ArrayBuffer && this.format.compression === "deflate";
+      if (!deflated && !this.queued) {
+        handler(this.decodeBytes(payload));
+        return;
+      }
+      this.queued += 1;
+      this.pending = this.pending
+        .then(() => this.decode(payload))
+        .then(handler)
+        .catch((error) => console.error(`Could not decode ${event}:`, error))
+        .finally(() => {
+          this.queued -= 1;
+        });
+    });
+  }
+
+  async decode(payload) {
+    if (payload instanceof ArrayBuffer && this.format.compression === "deflate") {
+      const stream = new Blob([payload]).stream().pipeThrough(new DecompressionStream("deflate"));
+      payload = await new Response(stream).arrayBuffer();
+    }
+    return this.decodeBytes(payload);
+  }
+
+  decodeBytes(payload) {
+    if (!(payload instanceof ArrayBuffer)) {
+      return payload;
+    }
+    if (this.format.format === "msgpack") {
+      return decodeMsgpack(payload);
+    }
+    return JSON.parse(new TextDecoder().decode(payload));
+  }
+}
+
+// MessagePack decoder covering every type the server sends (no extension types)
+function decodeMsgpack(buffer) {
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  const text = new TextDecoder();
+  let offset = 0;
+
+  const str = (length) => {
+    const value = text.decode(bytes.subarray(offset, offset + length));
+    offset += length;
+    return value;
+  };
+  const array = (length) => {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) {
+      value[i] = read();
+    }
+    return value;
+  };
+  const map = (length) => {
+    const value = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  };
+  const bin = (length) => {
+    const value = buffer.slice(offset, offset + length);
+    offset += length;
+    return value;
+  };
+  const next = (size, getter) => {
+    const value = getter.call(view, offset);
+    offset += size;
+    return value;
+  };
+
+  function read() {
+    const type = bytes[offset++];
+    if (type <= 0x7f) return type;
+    if (type <= 0x8f) return map(type & 0x0f);
+    if (type <= 0x9f) return array(type & 0x0f);
+    if (type <= 0xbf) return str(type & 0x1f);
+    if (type >= 0xe0) return type - 0x100;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(next(1, view.getUint8));
+      case 0xc5: return bin(next(2, view.getUint16));
+      case 0xc6: return bin(next(4, view.getUint32));
+      case 0xca: return next(4, view.getFloat32);
+      case 0xcb: return next(8, view.getFloat64);
+      case 0xcc: return next(1, view.getUint8);
+      case 0xcd: return next(2, view.getUint16);
+      case 0xce: return next(4, view.getUint32);
+      case 0xcf: return Number(next(8, view.getBigUint64));
+      case 0xd0: return next(1, view.getInt8);
+      case 0xd1: return next(2, view.getInt16);
+      case 0xd2: return next(4, view.getInt32);
+      case 0xd3: return Number(next(8, view.getBigInt64));
+      case 0xd9: return str(next(1, view.getUint8));
+      case 0xda: return str(next(2, view.getUint16));
+      case 0xdb: return str(next(4, view.getUint32));
+      case 0xdc: return array(next(2, view.getUint16));
+      case 0xdd: return array(next(4, view.getUint32));
+      case 0xde: return map(next(2, view.getUint16));
+      case 0xdf: return map(next(4, view.getUint32));
+      default:
+        throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  }
+
+  return read();
+}
@@ -0,0 +1,311 @@
+"""Career and season statistics across every finished match saved in data/.
+
+Ball-by-ball data is loaded once into NumPy columns and every table is built
+with vectorized group-bys (np.bincount over interned player ids), so queries
+cost a few array passes however many matches are archived. The web app runs
+queries in a worker process via run_query() so the Socket.IO server stays
+responsive while the archive is loaded.
+"""
+import json
+import os
+from array import array
+from typing import List, Dict, Optional, Any, Tuple
+import numpy as np
+from models import Match, WicketType, ExtraType
+from ballstore import BallStore, PlayerTable, WICKET_CODES, EXTRA_CODES, NO_PLAYER
+from replay import read_command_stream
+from analytics import PHASES, phase_bounds, phase_index
+
+# Dismissals not credited to the bowler
+NON_BOWLER_WICKETS = (WICKET_CODES[WicketType.RUN_OUT], WICKET_CODES[WicketType.RETIRED])
+
+BATTING_SORT_KEYS = ("runs", "average", "strike_rate", "balls", "fours", "sixes", "boundary_pct", "dot_pct")
+BOWLING_SORT_KEYS = ("wickets", "economy", "average", "strike_rate", "balls", "runs", "dot_pct")
+
+def _capture_innings(snapshot_path: str) -> Tuple[Dict[str, Any], List[tuple]]:
+    """(match info, innings) for one saved match.
+    
+    Each innings is (number, batting team, bowling team, overs). Matches with a
+    full journal are replayed; older files only hold the innings they have
+    innings files for, plus the one in progress when they were saved.
+    """
+    records = read_command_stream(snapshot_path)
+    if records is None:
+        match = Match.load_from_file(snapshot_path)
+    else:
+        match = Match.create(**records[0]["args"])
+        match.replay_commands(records[1:])
+    
+    innings_list = []
+    for innings in match.completed_innings:
+        innings = innings.loaded()
+        innings_list.append((innings.number, innings.batting_team, innings.bowling_team, innings.overs))
+    if match.overs and not match.find_innings(match.current_innings):
+        batting = match.batting_team.name if match.batting_team else ""
+        bowling = match.bowling_team.name if match.bowling_team else ""
+        innings_list.append((match.current_innings, batting, bowling, match.overs))
+    return {"id": match.id, "total_overs": match.total_overs}, innings_list
+
+def _column(values: array, dtype) -> np.ndarray:
+    """A NumPy view of a BallStore column, without copying it"""
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype=dtype)
+
+def _per_ball(over_values: array, balls_per_over: np.ndarray, dtype) -> np.ndarray:
+    """Spread a column with one value per over out to one value per ball"""
+    return np.repeat(_column(over_values, np.int32), balls_per_over).astype(dtype)
+
+class BallTable:
+    """Every archived delivery as parallel NumPy columns.
+    
+    The balls themselves are held in a BallStore and the ball columns are views
+    of its arrays; the per-over innings, team and phase are spread out to
+    their balls.
+    """
+    
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = data_dir
+        self.store = BallStore()
+        self.players = self.store.players
+        self.teams = PlayerTable()
+        self.match_ids = self.store.match_ids
+        over_columns = {name: array("i") for name in (
+            "match", "season", "innings", "phase", "batting_team", "bowling_team")}
+        
+        for filename, _ in finished_snapshots(data_dir):
+            try:
+                info, innings_list = _capture_innings(os.path.join(data_dir, filename))
+            except (OSError, ValueError, KeyError):
+                continue
+            match_index = len(self.match_ids)
+            season = int(info["id"][:4]) if info["id"][:4].isdigit() else 0
+            bounds = phase_bounds(info["total_overs"])
+            overs = [over for *_, innings_overs in innings_list for over in innings_overs]
+            self.store.append_match(info["id"], overs)
+            for innings, batting, bowling, innings_overs in innings_list:
+                for over in innings_overs:
+                    over_columns["match"].append(match_index)
+                    over_columns["season"].append(season)
+                    over_columns["innings"].append(innings)
+                    over_columns["phase"].append(phase_index(over.over_number, bounds))
+                    over_columns["batting_team"].append(self.teams.id_for(batting))
+                    over_columns["bowling_team"].append(self.teams.id_for(bowling))
+        
+        store = self.store
+        balls_per_over = np.diff(np.append(_column(store.over_start, np.int32), len(store)))
+        self.match = _per_ball(over_columns["match"], balls_per_over, np.int32)
+        self.season = _per_ball(over_columns["season"], balls_per_over, np.int16)
+        self.innings = _per_ball(over_columns["innings"], balls_per_over, np.int8)
+        self.over = np.repeat(_column(store.over_number, np.int16), balls_per_over)
+        self.phase = _per_ball(over_columns["phase"], balls_per_over, np.int8)
+        self.batting_team = _per_ball(over_columns["batting_team"], balls_per_over, np.int32)
+        self.bowling_team = _per_ball(over_columns["bowling_team"], balls_per_over, np.int32)
+        self.batter = _column(store.prev_striker, np.int32)
+        self.bowler = _column(store.bowler, np.int32)
+        self.runs = _column(store.runs, np.int8)
+        self.extra_runs = _column(store.extra_runs, np.int8)
+        self.extra = _column(store.extra_code, np.int8)
+        self.is_wicket = _column(store.is_wicket, np.int8).view(bool)
+        self.wicket = _column(store.wicket_code, np.int8)
+        self.dismissed = np.where(self.is_wicket, _column(store.dismissed, np.int32), NO_PLAYER).astype(np.int32)
+        
+        # Derived columns, following the scoring rules in models.py
+        self.total_runs = self.runs + self.extra_runs
+        self.legal = (self.extra != EXTRA_CODES[ExtraType.WIDE]) & (self.extra != EXTRA_CODES[ExtraType.NO_BALL])
+        self.bowler_wicket = self.is_wicket & ~np.isin(self.wicket, NON_BOWLER_WICKETS)
+        self.boundary = (self.runs == 4) | (self.runs == 6)
+    
+    def __len__(self) -> int:
+        return len(self.match)
+    
+    def seasons(self) -> List[int]:
+        return [int(season) for season in np.unique(self.season) if season]
+    
+    def mask(self, season: Optional[int] = None, phase: Optional[str] = None,
+             batting_team: Optional[str] = None, bowling_team: Optional[str] = None) -> np.ndarray:
+        """Boolean row filter for the common query parameters"""
+        mask = np.ones(len(self), dtype=bool)
+        if season:
+            mask &= self.season == season
+        if phase:
+            if phase not in PHASES:
+                raise ValueError(f"Unknown phase: {phase}")
+            mask &= self.phase == PHASES.index(phase)
+        for team, column in ((batting_team, self.batting_team), (bowling_team, self.bowling_team)):
+            if team:
+                team_id = self.teams.names.index(team) if team in self.teams.names else -2
+                mask &= column == team_id
+        return mask
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator * scale / np.maximum(denominator, 1), 0.0)
+
+def _group_sum(ids: np.ndarray, mask: np.ndarray, size: int, weights: np.ndarray = None) -> np.ndarray:
+    """Per-player sum of weights (or row count) over the masked rows"""
+    ids = ids[mask]
+    valid = ids >= 0
+    return np.bincount(ids[valid], weights=None if weights is None else weights[mask][valid], minlength=size)
+
+def _innings_scores(table: BallTable, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(batter, runs) for every batting innings among the masked rows, plus innings count per batter"""
+    size = len(table.players.names)
+    rows = mask & (table.batter >= 0)
+    keys = (table.match[rows].astype(np.int64) * 4 + table.innings[rows]) * max(size, 1) + table.batter[rows]
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    scores = np.bincount(inverse, weights=table.runs[rows], minlength=len(unique_keys))
+    batters = (unique_keys % max(size, 1)).astype(np.int64)
+    return batters, scores, np.bincount(batters, minlength=size)
+
+def batting_table(table: BallTable, season: Optional[int] = None, phase: Optional[str] = None,
+                  team: Optional[str] = None, min_balls: int = 1, sort: str = "runs",
+                  limit: int = 50) -> List[Dict[str, Any]]:
+    """Batting aggregates per player"""
+    if sort not in BATTING_SORT_KEYS:
+        raise ValueError(f"Unknown sort: {sort}")
+    size = len(table.players.names)
+    mask = table.mask(season, phase, batting_team=team)
+    faced = mask & table.legal
+    
+    runs = _group_sum(table.batter, mask, size, table.runs)
+    balls = _group_sum(table.batter, faced, size)
+    fours = _group_sum(table.batter, mask & (table.runs == 4), size)
+    sixes = _group_sum(table.batter, mask & (table.runs == 6), size)
+    dots = _group_sum(table.batter, faced & (table.runs == 0), size)
+    outs = _group_sum(table.dismissed, mask & table.is_wicket, size)
+    batters, scores, innings = _innings_scores(table, mask)
+    highest = np.zeros(size)
+    np.maximum.at(highest, batters, scores)
+    
+    columns = {
+        "runs": runs, "balls": balls, "fours": fours, "sixes": sixes,
+        "average": _ratio(runs, outs), "strike_rate": _ratio(runs, balls, 100),
+        "dot_pct": _ratio(dots, balls, 100), "boundary_pct": _ratio(fours + sixes, balls, 100),
+    }
+    selected = np.nonzero(balls >= max(min_balls, 1))[0]
+    order = selected[np.argsort(-columns[sort][selected], kind="stable")][:limit]
+    return [
+        {
+            "player": table.players.names[player],
+            "innings": int(innings[player]),
+            "runs": int(runs[player]),
+            "balls": int(balls[player]),
+            "outs": int(outs[player]),
+            "not_outs": int(max(innings[player] - outs[player], 0)),
+            "highest": int(highest[player]),
+            "average": round(float(columns["average"][player]), 2) if outs[player] else None,
+            "strike_rate": round(float(columns["strike_rate"][player]), 2),
+            "fours": int(fours[player]),
+            "sixes": int(sixes[player]),
+            "dot_pct": round(float(columns["dot_pct"][player]), 1),
+            "boundary_pct": round(float(columns["boundary_pct"][player]), 1),
+        }
+        for player in order
+    ]
+
+def bowling_table(table: BallTable, season: Optional[int] = None, phase: Optional[str] = None,
+                  team: Optional[str] = None, min_balls: int = 1, sort: str = "wickets",
+                  limit: int = 50) -> List[Dict[str, Any]]:
+    """Bowling aggregates per player"""
+    if sort not in BOWLING_SORT_KEYS:
+        raise ValueError(f"Unknown sort: {sort}")
+    size = len(table.players.names)
+    mask = table.mask(season, phase, bowling_team=team)
+    bowled = mask & table.legal
+    
+    runs = _group_sum(table.bowler, mask, size, table.total_runs)
+    balls = _group_sum(table.bowler, bowled, size)
+    wickets = _group_sum(table.bowler, mask & table.bowler_wicket, size)
+    dots = _group_sum(table.bowler, bowled & (table.total_runs == 0), size)
+    boundaries = _group_sum(table.bowler, mask & table.boundary, size)
+    
+    columns = {
+        "wickets": wickets, "runs": runs, "balls": balls,
+        "economy": _ratio(runs, balls, 6), "average": _ratio(runs, wickets),
+        "strike_rate": _ratio(balls, wickets), "dot_pct": _ratio(dots, balls, 100),
+    }
+    selected = np.nonzero(balls >= max(min_balls, 1))[0]
+    # Lower is better for economy, average and strike rate
+    direction = 1 if sort in ("economy", "average", "strike_rate") else -1
+    order = selected[np.argsort(direction * columns[sort][selected], kind="stable")][:limit]
+    return [
+        {
+            "player": table.players.names[player],
+            "overs": f"{int(balls[player]) // 6}.{int(balls[player]) % 6}",
+            "balls": int(balls[player]),
+            "runs": int(runs[player]),
+            "wickets": int(wickets[player]),
+            "economy": round(float(columns["economy"][player]), 2),
+            "average": round(float(columns["average"][player]), 2) if wickets[player] else None,
+            "strike_rate": round(float(columns["strike_rate"][player]), 2) if wickets[player] else None,
+            "dot_pct": round(float(columns["dot_pct"][player]), 1),
+            "boundary_pct": round(float(_ratio(boundaries, balls, 100)[player]), 1),
+        }
+        for player in order
+    ]
+
+def player_profile(table: BallTable, name: str, season: Optional[int] = None) -> Dict[str, Any]:
+    """One player's batting and bowling, overall and split by phase"""
+    def find(rows):
+        return next((row for row in rows if row["player"] == name), None)
+    
+    profile = {"player": name, "season": season, "batting": {}, "bowling": {}}
+    for phase in (None,) + PHASES:
+        key = phase or "overall"
+        profile["batting"][key] = find(batting_table(table, season, phase, limit=len(table.players.names)))
+        profile["bowling"][key] = find(bowling_table(table, season, phase, limit=len(table.players.names)))
+    return profile
+
+# Per-process record of whether each snapshot was finished: path -> (mtime_ns, is_finished)
+_finished_cache: Dict[str, Tuple[int, bool]] = {}
+
+def _is_finished(entry: os.DirEntry) -> bool:
+    """Whether a snapshot is of a finished match, read again only once the file has changed"""
+    mtime = entry.stat().st_mtime_ns
+    known = _finished_cache.get(entry.path)
+    if known is None or known[0] != mtime:
+        try:
+            with open(entry.path, "r") as f:
+                finished = bool(json.load(f)["match_info"]["is_finished"])
+        except (OSError, ValueError, KeyError):
+            finished = False
+        known = _finished_cache[entry.path] = (mtime, finished)
+    return known[1]
+
+def finished_snapshots(data_dir: str) -> List[Tuple[str, int]]:
+    """(filename, mtime) of the snapshots of finished matches, by filename.
+    
+    Journals, lock files, innings files and the snapshots of matches still
+    being scored are left out, so scoring a ball never changes the archive.
+    """
+    with os.scandir(data_dir) as entries:
+        return sorted((entry.name, entry.stat().st_mtime_ns) for entry in entries
+                      if entry.name.startswith("match_") and entry.name.endswith(".json")
+                      and _is_finished(entry))
+
+def archive_fingerprint(data_dir: str) -> Tuple:
+    """Changes whenever a finished match is added, removed or rewritten"""
+    return tuple(finished_snapshots(data_dir))
+
+# Per-process cache of the loaded archive: (data_dir, fingerprint, BallTable)
+_table_cache: Optional[Tuple[str, Tuple, BallTable]] = None
+
+def load_table(data_dir: str = "data") -> BallTable:
+    """The archive as a BallTable, reloaded only when the finished matches in data/ have changed"""
+    global _table_cache
+    fingerprint = archive_fingerprint(data_dir)
+    if _table_cache is None or _table_cache[0] != data_dir or _table_cache[1] != fingerprint:
+        _table_cache = (data_dir, fingerprint, BallTable(data_dir))
+    return _table_cache[2]
+
+QUERIES = {
+    "batting": batting_table,
+    "bowling": bowling_table,
+    "player": player_profile,
+}
+
+def run_query(data_dir: str, query: str, **params) -> Any:
+    """Entry point for worker processes: load (or reuse) the archive and run one query"""
+    table = load_table(data_dir)
+    if query == "seasons":
+        return {"seasons": table.seasons(), "matches": len(table.match_ids), "balls": len(table)}
+    return QUERIES[query](table, **params)
@@ -0,0 +1,146 @@
+"""HTTP read path for match status: conditional GETs, gzip, long-polling and Server-Sent Events.
+
+Every match update broadcast over Socket.IO is also published to a StatusFeed,
+which keeps the latest status of each match. It is encoded (and gzipped) at
+most once per version, however many scoreboards poll it, and a request
+naming the version it already holds (If-None-Match, ?since=) can get a 304
+or wait for the next version instead of another copy of the same bytes.
+"""
+import gzip
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from flask import Request, Response
+
+import fastjson
+import metrics
+
+# How long a reverse proxy may serve a status without asking again, and keep
+# serving it while it fetches the next one; browsers always revalidate
+SHARED_MAX_AGE = 1
+STALE_WHILE_REVALIDATE = 5
+# Longest a long-poll request is held (?wait=)
+MAX_WAIT = 30
+# Comment line sent on an idle event stream so proxies keep it open
+KEEPALIVE_INTERVAL = 15
+# Smaller bodies aren't worth compressing
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+class StatusSnapshot:
+    """One version of a match's status, encoded on first use"""
+    
+    def __init__(self, match_id: str, status: Dict[str, Any]):
+        self.match_id = match_id
+        self.status = status
+        self.version: int = status["version"]
+        self._json: Optional[bytes] = None
+        self._gzip: Optional[bytes] = None
+    
+    @property
+    def etag(self) -> str:
+        return f"{self.match_id}.{self.version}"
+    
+    def json(self) -> bytes:
+        if self._json is None:
+            started = time.perf_counter()
+            self._json = fastjson.dumps(self.status)
+            metrics.STATUS_ENCODE_SECONDS.observe(time.perf_counter() - started)
+            metrics.STATUS_BYTES.observe(len(self._json))
+        return self._json
+    
+    def gzipped(self) -> bytes:
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.json(), GZIP_LEVEL, mtime=0)
+        return self._gzip
+
+class StatusFeed:
+    """Latest status of each live match, with waiting for the next one"""
+    
+    def __init__(self):
+        self._snapshots: Dict[str, StatusSnapshot] = {}
+        self._changed = threading.Condition()
+    
+    def publish(self, match_id: str, status: Dict[str, Any]) -> StatusSnapshot:
+        """Record a match's status as broadcast, waking requests waiting for it"""
+        with self._changed:
+            snapshot = self._snapshots.get(match_id)
+            if snapshot is None or status["version"] != snapshot.version:
+                snapshot = self._snapshots[match_id] = StatusSnapshot(match_id, status)
+                self._changed.notify_all()
+            return snapshot
+    
+    def latest(self, match_id: str) -> Optional[StatusSnapshot]:
+        with self._changed:
+            return self._snapshots.get(match_id)
+    
+    def close(self, match_id: str):
+        """Forget a match that is no longer live, ending its event streams"""
+        with self._changed:
+            if self._snapshots.pop(match_id, None):
+                self._changed.notify_all()
+    
+    def wait(self, match_id: str, since: int, timeout: float) -> Optional[StatusSnapshot]:
+        """The match's latest status once its version is past since, or when timeout runs out.
+        
+        None if the match closed (or was never published).
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                snapshot = self._snapshots.get(match_id)
+                remaining = deadline - time.monotonic()
+                if snapshot is None or snapshot.version > since or remaining <= 0:
+                    return snapshot
+                self._changed.wait(remaining)
+
+def held_version(request: Request, match_id: str) -> Optional[int]:
+    """Version of the match the client already has, from ?since= or its If-None-Match ETag"""
+    since = request.args.get("since", type=int)
+    if since is not None:
+        return since
+    for etag in request.if_none_match.as_set(include_weak=True):
+        tag_match_id, _, version = etag.rpartition(".")
+        if tag_match_id == match_id and version.isdigit():
+            return int(version)
+    return None
+
+def status_response(snapshot: StatusSnapshot, request: Request, cacheable: bool = True) -> Response:
+    """The status as JSON, gzipped if the client accepts it, or 304 if the client's ETag is current"""
+    body = snapshot.json()
+    response = Response(mimetype="application/json")
+    if len(body) >= GZIP_MIN_SIZE and request.accept_encodings["gzip"]:
+        body = snapshot.gzipped()
+        response.content_encoding = "gzip"
+    response.set_data(body)
+    response.vary.add("Accept-Encoding")
+    # Weak, so the gzipped and plain bodies of one version share it
+    response.set_etag(snapshot.etag, weak=True)
+    if cacheable:
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.s_maxage = SHARED_MAX_AGE
+        response.cache_control.stale_while_revalidate = STALE_WHILE_REVALIDATE
+    else:
+        # A long-poll answer is only meant for the client that waited for it
+        response.cache_control.no_store = True
+    return response.make_conditional(request)
+
+def event_stream(feed: StatusFeed, snapshot: StatusSnapshot, last_version: Optional[int]) -> Iterator[str]:
+    """Server-Sent Events: a "status" event for every new version, then "closed" when the match ends.
+    
+    Event ids are match versions, so a reconnecting EventSource (which sends
+    Last-Event-ID) only gets the status again if it has moved on.
+    """
+    match_id = snapshot.match_id
+    since = -1 if last_version is None else last_version
+    yield "retry: 2000\n\n"
+    while snapshot is not None:
+        if snapshot.version > since:
+            since = snapshot.version
+            yield f"id: {since}\nevent: status\ndata: {snapshot.json().decode('ascii')}\n\n"
+        else:
+            yield ": keepalive\n\n"
+        snapshot = feed.wait(match_id, since, KEEPALIVE_INTERVAL)
+    yield "event: closed\ndata: {}\n\n"
@@ -0,0 +1,87 @@
+import pytest
+import models
+from models import Match, ExtraType, WicketType
+
+@pytest.fixture(autouse=True)
+def check_aggregates(monkeypatch):
+    """Have every Over check its running aggregates on each add_ball() and pop_ball()"""
+    monkeypatch.setattr(models, "CHECK_AGGREGATES", True)
+
+def every_over(match):
+    return [over for innings in match.completed_innings for over in innings.overs] + match.overs
+
+def assert_aggregates_recounted(match):
+    """Check the running aggregates of every over, archived or live, against a recount"""
+    for over in every_over(match):
+        over.check_aggregates()
+        recount = models.Over(over.over_number, over.bowler, list(over.balls))
+        assert (over.runs, over.wickets, over.legal_balls, over.summary) == (
+            recount.runs, recount.wickets, recount.legal_balls, recount.summary)
+
+def two_over_match():
+    """A two-over match with extras, wickets and bowler changes, well into the second innings"""
+    match = Match("A", "B", 2)
+    for number in range(1, 12):
+        match.add_player(f"A{number}", "A")
+        match.add_player(f"B{number}", "B")
+    match.set_toss("A", "bat")
+    match.start_innings("A1", "A2", "B1")
+    match.add_ball(0, extra_type=ExtraType.WIDE, extra_runs=1)
+    for runs in (1, 4):
+        match.add_ball(runs)
+    match.add_ball(0, is_wicket=True, wicket_type=WicketType.BOWLED)
+    match.set_new_batter("A3")
+    match.add_ball(2, extra_type=ExtraType.NO_BALL, extra_runs=1)
+    for runs in (6, 0, 1):
+        match.add_ball(runs)
+    match.set_new_bowler("B2")
+    match.add_ball(0, extra_type=ExtraType.LEG_BYE, extra_runs=1)
+    for runs in (2, 0, 4, 1, 3):
+        match.add_ball(runs)
+    match.start_second_innings("B1", "B2", "A1")
+    for runs in (4, 0, 1):
+        match.add_ball(runs)
+    match.add_ball(0, extra_type=ExtraType.WIDE, extra_runs=1)
+    match.add_ball(0, is_wicket=True, wicket_type=WicketType.CAUGHT)
+    match.set_new_batter("B3")
+    for runs in (2, 6):
+        match.add_ball(runs)
+    match.set_new_bowler("A2")
+    match.add_ball(1)
+    return match
+
+def test_aggregates_follow_undo_redo_and_rewind_across_an_innings_break():
+    match = two_over_match()
+    assert len(match.completed_innings) == 1 and len(match.overs) == 2
+    assert_aggregates_recounted(match)
+    
+    # Within an over, back over the over break, back into the first innings
+    # and forward again
+    steps = [
+        lambda: match.undo_last_ball(),
+        lambda: match.undo(3),
+        lambda: match.redo(2),
+        lambda: match.undo(8),
+        lambda: match.redo(100),
+        lambda: match.rewind_to(1, 1, 3),
+        lambda: match.rewind_to(2, 0, 5),
+        lambda: match.undo(100),
+        lambda: match.redo(100),
+        lambda: match.rewind_to(1, 0, 2),
+    ]
+    for step in steps:
+        assert step()["success"]
+        assert_aggregates_recounted(match)
+    
+    # Then play on from the rewound position, dropping what could be redone
+    match.add_ball(0, extra_type=ExtraType.WIDE, extra_runs=1)
+    match.add_ball(4)
+    assert match.overs[-1].summary == "Wd1 1 4 Wd1 4"
+    assert_aggregates_recounted(match)
+
+def test_a_drifted_aggregate_is_caught_on_the_next_ball():
+    match = two_over_match()
+    match.overs[-1]._runs += 1
+    
+    with pytest.raises(AssertionError):
+        match.add_ball(1)
@@ -0,0 +1,77 @@
+import json
+import os
+import pytest
+from catalog import MatchCatalog, _check_date
+
+def save(data_dir, match_id, team1, team2, total_overs=20, is_finished=True):
+    """Write the match_info a saved match file holds, as Match.save_to_file would"""
+    path = os.path.join(data_dir, f"match_{match_id}.json")
+    info = {"id": match_id, "team1_name": team1, "team2_name": team2, "total_overs": total_overs,
+            "is_started": True, "is_finished": is_finished,
+            "winner": team1 if is_finished else "", "match_result": ""}
+    with open(path, "w") as f:
+        json.dump({"match_info": info}, f)
+    return path
+
+@pytest.fixture
+def catalog(tmp_path):
+    data_dir = str(tmp_path)
+    save(data_dir, "20240105_140000_aaaaaa", "Lions", "Tigers", 20)
+    save(data_dir, "20240301_090000_bbbbbb", "tigers", "Eagles", 50)
+    save(data_dir, "20240301_190000_cccccc", "Eagles", "Lions", 10, is_finished=False)
+    save(data_dir, "20240420_120000_dddddd", "Hawks", "Owls", 20)
+    catalog = MatchCatalog(data_dir)
+    assert catalog.sync() == 4
+    return catalog
+
+def ids(result):
+    matches, _ = result
+    return [match["id"][-6:] for match in matches]
+
+def test_query_filters(catalog):
+    assert ids(catalog.query(team="TIGERS")) == ["bbbbbb", "aaaaaa"]
+    assert ids(catalog.query(date_from="2024-03-01")) == ["dddddd", "cccccc", "bbbbbb"]
+    # The end date takes in the whole day
+    assert ids(catalog.query(date_from="2024-03-01", date_to="2024-03-01")) == ["cccccc", "bbbbbb"]
+    assert ids(catalog.query(finished=False)) == ["cccccc"]
+    assert ids(catalog.query(team="lions", finished=True)) == ["aaaaaa"]
+    assert catalog.query(team="Rhinos") == ([], 0)
+
+def test_query_sorting_and_paging(catalog):
+    assert ids(catalog.query(sort="date")) == ["aaaaaa", "bbbbbb", "cccccc", "dddddd"]
+    assert ids(catalog.query(sort="team1")) == ["cccccc", "dddddd", "aaaaaa", "bbbbbb"]
+    assert ids(catalog.query(sort="-overs")) == ["bbbbbb", "dddddd", "aaaaaa", "cccccc"]
+    with pytest.raises(ValueError):
+        catalog.query(sort="venue")
+    
+    pages = [catalog.query(sort="date", page=page, per_page=3) for page in (1, 2, 3)]
+    assert [ids(page) for page in pages] == [["aaaaaa", "bbbbbb", "cccccc"], ["dddddd"], []]
+    assert [total for _, total in pages] == [4, 4, 4]
+    assert catalog.query(finished=True, per_page=1)[1] == 3
+
+@pytest.mark.parametrize("value", ["2024-13-01", "01/03/2024", "2024-03-01 12:00", "yesterday", "' OR 1=1 --"])
+def test_bad_dates_are_rejected(catalog, value):
+    with pytest.raises(ValueError):
+        _check_date(value, "from")
+    with pytest.raises(ValueError):
+        catalog.query(date_to=value)
+
+def test_check_date_normalises():
+    assert _check_date("2024-3-1", "from") == "2024-03-01"
+
+def test_sync_picks_up_added_and_removed_files(catalog):
+    data_dir = catalog.data_dir
+    save(data_dir, "20240501_100000_eeeeee", "Owls", "Lions")
+    os.remove(os.path.join(data_dir, "match_20240105_140000_aaaaaa.json"))
+    with open(os.path.join(data_dir, "match_broken.json"), "w") as f:
+        f.write("{")
+    
+    assert catalog.sync() == 1
+    assert ids(catalog.query()) == ["eeeeee", "dddddd", "cccccc", "bbbbbb"]
+    assert catalog.sync() == 0
+    
+    # A file rewritten outside the app is indexed again
+    path = save(data_dir, "20240301_190000_cccccc", "Eagles", "Lions", 10)
+    os.utime(path, (1, 1))
+    assert catalog.sync() == 1
+    assert ids(catalog.query(finished=False)) == []
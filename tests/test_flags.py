@@ -0,0 +1,77 @@
+import os
+import struct
+import zlib
+import pytest
+import flags
+from flags import FlagStore
+
+def png(color):
+    """A 4x2 PNG of one colour, built by hand so the tests don't need Pillow"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + bytes(color) * 4 for _ in range(2))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 4, 2, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+def test_the_same_image_is_stored_once(tmp_path):
+    store = FlagStore(str(tmp_path))
+    first = store.save(png((255, 153, 51)), "PNG", "India")
+    files = sorted(os.listdir(tmp_path))
+    
+    assert store.save(png((255, 153, 51)), "png", "India") == first
+    again = store.save(png((255, 153, 51)), "png", "Bharat")
+    assert again.hash == first.hash and again.files == first.files
+    assert again.teams == ["India", "Bharat"]
+    assert sorted(os.listdir(tmp_path)) == files
+    assert store.read(first.hash).teams == ["India", "Bharat"]
+    assert first.files["original"] == f"{first.hash}.png"
+    
+    other = store.save(png((0, 0, 255)), "png", "India")
+    assert other.hash != first.hash
+    assert len(store.records()) == 2
+
+def test_a_non_image_upload_is_rejected(tmp_path):
+    pytest.importorskip("PIL")
+    store = FlagStore(str(tmp_path))
+    
+    with pytest.raises(ValueError):
+        store.save(b"<?php echo 'not a flag'; ?>", "png", "India")
+    assert os.listdir(tmp_path) == []
+    assert store.search() == ([], 0)
+    
+    record = store.save(png((255, 153, 51)), "png", "India")
+    assert {"original", "thumb", "display"} <= set(record.files)
+    assert all(flags.is_stored_name(name) for name in record.files.values())
+
+def test_prefix_search_pages_through_matching_teams(tmp_path):
+    store = FlagStore(str(tmp_path))
+    teams = ["Nepal", "netherlands", "New Zealand", "Namibia", "Nigeria", "Nauru", "Niue", "Oman", "Kenya"]
+    for number, team in enumerate(teams):
+        store.save(png((number, 0, 0)), "png", team)
+    # One flag for two teams lists it under each
+    store.save(png((0, 0, 0)), "png", "Nepal B")
+    
+    def page(prefix, number):
+        entries, total = store.search(prefix, page=number, per_page=3)
+        return [entry["team_name"] for entry in entries], total
+    
+    assert page("ne", 1) == (["Nepal", "Nepal B", "netherlands"], 4)
+    assert page("NE", 2) == (["New Zealand"], 4)
+    assert page("ne", 3) == ([], 4)
+    assert [page("n", number) for number in (1, 2, 3)] == [
+        (["Namibia", "Nauru", "Nepal"], 8),
+        (["Nepal B", "netherlands", "New Zealand"], 8),
+        (["Nigeria", "Niue"], 8),
+    ]
+    assert page("", 4) == (["Oman"], 10)
+    assert page("q", 1) == ([], 0)
+
+def test_search_sees_uploads_from_another_store(tmp_path):
+    store = FlagStore(str(tmp_path))
+    store.save(png((1, 2, 3)), "png", "Nepal")
+    assert store.search("ne")[1] == 1
+    
+    # Another worker process writing to the same directory
+    FlagStore(str(tmp_path)).save(png((4, 5, 6)), "png", "Netherlands")
+    entries, total = store.search("ne")
+    assert total == 2 and [entry["team_name"] for entry in entries] == ["Nepal", "Netherlands"]
@@ -0,0 +1,103 @@
+import glob
+import os
+import shutil
+import pytest
+from models import Match, ExtraType, WicketType
+from journal import MatchJournal
+from replay import synthesize_command_stream, replay, match_totals
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def sample_matches():
+    """Saved samples in the current innings with balls to undo (all saved without a journal)"""
+    paths = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "match_*.json"))):
+        match = Match.load_from_file(path)
+        if match.is_started and any(over.balls for over in match.overs):
+            paths.append(path)
+    return paths
+
+@pytest.mark.parametrize("path", sample_matches(), ids=os.path.basename)
+def test_undo_a_match_saved_without_a_journal(tmp_path, path):
+    snapshot_path = shutil.copy(path, tmp_path)
+    match = Match.load_from_file(snapshot_path)
+    records = synthesize_command_stream(match)
+    last_ball = max(index for index, record in enumerate(records) if record["cmd"] == "add_ball")
+    saved = match_totals(match)
+    
+    assert match.undo_last_ball()["success"]
+    assert match_totals(match) == match_totals(replay(records[:last_ball]))
+    assert match.redo()["success"]
+    assert match_totals(match) == saved
+
+def test_undo_across_the_snapshot_of_a_match_saved_without_a_journal(tmp_path):
+    snapshot_path = shutil.copy(sample_matches()[-1], tmp_path)
+    match = Match.load_from_file(snapshot_path)
+    runs = match.batting_team.runs
+    match.open_journal(snapshot_path)
+    match.add_ball(4)
+    
+    assert match.undo(2)["undone"] == 2
+    assert match.redo(2)["redone"] == 2
+    assert match.batting_team.runs == runs + 4
+
+def played(commands):
+    """A T20 match that has had the given (command, args) pairs after the toss and openers"""
+    match = Match("A", "B", 20)
+    for number in range(1, 12):
+        match.add_player(f"A{number}", "A")
+        match.add_player(f"B{number}", "B")
+    match.set_toss("A", "bat")
+    match.start_innings("A1", "A2", "B1")
+    for command, args in commands:
+        getattr(match, command)(**args)
+    return match
+
+def test_undo_balls_of_the_over_in_progress():
+    wide = ("add_ball", {"runs": 0, "extra_type": ExtraType.WIDE, "extra_runs": 1})
+    # Enough deliveries for the analytics to have dropped the first from their recent balls
+    overs = [wide] * 3 + [("add_ball", {"runs": runs}) for runs in (1, 4, 0, 6, 2, 1)] + [
+        ("set_new_bowler", {"bowler": "B2"}),
+        ("add_ball", {"runs": 1}),
+        ("add_ball", {"runs": 4}),
+        wide,
+        ("add_ball", {"runs": 0, "is_wicket": True, "wicket_type": WicketType.BOWLED}),
+        ("set_new_batter", {"batter": "A3"}),
+        ("add_ball", {"runs": 3}),
+    ]
+    match = played(overs)
+    
+    # Back to the last ball, over the wicket and new batter, to the start of
+    # over 2 and (by way of a checkpoint) into over 1
+    for steps, kept in ((1, 15), (2, 13), (5, 10), (6, 8)):
+        match.redo(10)
+        assert match.undo(steps)["undone"] == steps
+        expected = played(overs[:kept])
+        assert match_totals(match) == match_totals(expected)
+        assert match.analytics_data()["innings"] == expected.analytics_data()["innings"]
+
+def test_reload_after_redo_across_an_innings_break(tmp_path):
+    path = str(tmp_path / "match_test.json")
+    match = Match("A", "B", 1)
+    match.open_journal(path)
+    for number in range(1, 12):
+        match.add_player(f"A{number}", "A")
+        match.add_player(f"B{number}", "B")
+    match.set_toss("A", "bat")
+    match.start_innings("A1", "A2", "B1")
+    for runs in (1, 2, 4, 0, 6, 1):
+        match.add_ball(runs)
+    match.start_second_innings("B1", "B2", "A1")
+    match.add_ball(4)
+    match.save_to_file(path)
+    
+    # Back into the first innings and forward again, after the snapshot
+    assert match.undo(3)["undone"] == 3
+    assert match.redo(3)["redone"] == 3
+    match.journal._file.close()
+    
+    reloaded = Match.load_from_file(path)
+    replayed = replay(MatchJournal.read(match.journal.path))
+    innings = [summary["ended_at"] for summary in match.get_current_status()["innings"]]
+    assert [summary["ended_at"] for summary in reloaded.get_current_status()["innings"]] == innings
+    assert [completed.ended_at for completed in replayed.completed_innings] == innings
@@ -0,0 +1,36 @@
+from models import Match
+
+def start_match(snapshot_path: str) -> Match:
+    match = Match("A", "B", 20)
+    match.open_journal(snapshot_path)
+    for i in range(11):
+        match.add_player(f"A{i}", "A")
+        match.add_player(f"B{i}", "B")
+    match.set_toss("A", "bat")
+    match.start_innings("A0", "A1", "B0")
+    return match
+
+def crash(match: Match):
+    """Drop the match the way a killed process would, without a final snapshot"""
+    match.journal._file.close()
+
+def test_records_after_a_torn_tail_survive_reload(tmp_path):
+    path = str(tmp_path / "match_test.json")
+    match = start_match(path)
+    match.save_to_file(path)
+    match.add_ball(1)
+    match.add_ball(2)
+    crash(match)
+    with open(match.journal.path, "a") as f:
+        f.write('{"seq":99,"cmd":"add_ba')
+    
+    resumed = Match.load_from_file(path)
+    assert resumed.batting_team.runs == 3
+    resumed.open_journal(path)
+    resumed.add_ball(4)
+    resumed.add_ball(4)
+    crash(resumed)
+    
+    reloaded = Match.load_from_file(path)
+    assert reloaded.batting_team.runs == 11
+    assert reloaded.version == resumed.version
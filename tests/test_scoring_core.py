@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import scoring_core
+
+# Timings only mean something against a baseline recorded on the same machine
+# and the same Python, so the comparison itself is opt-in
+RUN_BENCHMARKS = os.environ.get("CRICKET_BENCHMARKS") == "1"
+
+def test_every_benchmark_runs_and_has_a_baseline():
+    results = scoring_core.run_benchmarks(rounds=1)
+    
+    assert set(results) == set(scoring_core.load_baseline())
+    assert all(result["seconds"] > 0 and result["relative"] > 0 for result in results.values())
+
+def test_slowdowns_are_measured_in_calibration_units():
+    baseline = {"t20.add_ball": {"seconds": 1e-5, "relative": 0.01},
+                "t20.undo_last_ball": {"seconds": 1e-5, "relative": 0.01}}
+    results = {
+        # Twice the time on a machine running at half speed is no change
+        "t20.add_ball": {"seconds": 2e-5, "relative": 0.01},
+        "t20.undo_last_ball": {"seconds": 1e-5, "relative": 0.013},
+        "t20.new_benchmark": {"seconds": 1e-5, "relative": 0.01},
+    }
+    
+    changes = scoring_core.slowdowns(results, baseline)
+    assert changes.keys() == {"t20.add_ball", "t20.undo_last_ball"}
+    assert changes["t20.add_ball"] == pytest.approx(0)
+    assert changes["t20.undo_last_ball"] == pytest.approx(0.3)
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="set CRICKET_BENCHMARKS=1 to compare timings with the baseline")
+def test_scoring_core_is_no_slower_than_its_baseline():
+    changes = scoring_core.slowdowns(scoring_core.run_benchmarks(rounds=15), scoring_core.load_baseline())
+    
+    slower = {name: f"{change:+.0%}" for name, change in changes.items() if change > scoring_core.DEFAULT_THRESHOLD}
+    assert slower == {}
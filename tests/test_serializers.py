@@ -0,0 +1,49 @@
+import models
+from models import Match, Ball, ExtraType, WicketType, serialize_dataclass, _serialize_reflective
+
+def mid_innings_match():
+    """A two-over match part way through the second innings, after a wicket, extras and an over break"""
+    match = Match("A", "B", 2)
+    for number in range(1, 12):
+        match.add_player(f"A{number}", "A")
+        match.add_player(f"B{number}", "B")
+    match.set_toss("B", "bowl")
+    match.start_innings("A1", "A2", "B1")
+    for runs in (1, 4, 0, 6, 2, 1):
+        match.add_ball(runs)
+    match.set_new_bowler("B2")
+    for runs in (0, 1, 4, 4, 0, 2):
+        match.add_ball(runs)
+    match.start_second_innings("B1", "B2", "A1")
+    match.add_ball(0, extra_type=ExtraType.WIDE, extra_runs=1)
+    match.add_ball(0, is_wicket=True, wicket_type=WicketType.CAUGHT, dismissed_player="B1")
+    match.set_new_batter("B3")
+    match.add_ball(1, extra_type=ExtraType.NO_BALL, extra_runs=1)
+    match.add_ball(4)
+    return match
+
+def everything_serialized(match, path):
+    objects = [match.team1, match.team2, *match.players.values(), *match.partnerships,
+               match.current_partnership, *match.overs, *(ball for over in match.overs for ball in over.balls),
+               *match.completed_innings]
+    return [serialize_dataclass(obj) for obj in objects], match._build_current_status(), match.snapshot_data(path)
+
+def test_generated_serializers_match_the_reflective_one(tmp_path, monkeypatch):
+    match = mid_innings_match()
+    path = str(tmp_path / "match_test.json")
+    generated = everything_serialized(match, path)
+    for cls in (models.Team, models.Player, models.Partnership, models.Over, Ball):
+        assert models._serializers[cls] is not _serialize_reflective
+    
+    # The same match again with every type, nested ones too, serialized reflectively
+    monkeypatch.setattr(models, "_serializers", {})
+    monkeypatch.setattr(models, "_compile_serializer", lambda obj: _serialize_reflective)
+    assert everything_serialized(match, path) == generated
+
+def test_an_instance_with_extra_attributes_is_serialized_reflectively():
+    ball = Ball(4, bowler="B1")
+    serialize_dataclass(Ball(1, bowler="B1"))
+    ball.note = "edge"
+    
+    assert serialize_dataclass(ball) == _serialize_reflective(ball)
+    assert serialize_dataclass(ball)["note"] == "edge"
@@ -0,0 +1,45 @@
+import os
+import numpy as np
+import stats
+from models import Match, ExtraType, WicketType
+
+def finished_match(data_dir):
+    """A one-over match played to a finish and saved to data_dir"""
+    match = Match("A", "B", 1)
+    for number in range(1, 12):
+        match.add_player(f"A{number}", "A")
+        match.add_player(f"B{number}", "B")
+    match.set_toss("A", "bat")
+    match.start_innings("A1", "A2", "B1")
+    for runs in (1, 4):
+        match.add_ball(runs)
+    match.add_ball(0, extra_type=ExtraType.WIDE, extra_runs=1)
+    match.add_ball(0, is_wicket=True, wicket_type=WicketType.BOWLED, dismissed_player="A2")
+    match.set_new_batter("A3")
+    for runs in (6, 0, 2):
+        match.add_ball(runs)
+    match.start_second_innings("B1", "B2", "A1")
+    for runs in (0, 1, 6, 4, 0, 1):
+        match.add_ball(runs)
+    assert match.is_finished
+    match.save_to_file(os.path.join(data_dir, f"match_{match.id}.json"))
+    return match
+
+def test_ball_table_columns_are_read_from_its_ball_store(tmp_path):
+    match = finished_match(str(tmp_path))
+    table = stats.BallTable(str(tmp_path))
+    balls = [(innings.number, over.over_number, ball)
+             for innings in match.completed_innings for over in innings.overs for ball in over.balls]
+    
+    assert table.match_ids == [match.id] and len(table) == len(table.store) == len(balls)
+    assert [table.store.ball(index).to_ball() for index in range(len(table))] == [ball for *_, ball in balls]
+    assert table.innings.tolist() == [number for number, _, _ in balls]
+    assert table.over.tolist() == [over_number for _, over_number, _ in balls]
+    assert [table.players.name_for(player) for player in table.batter] == [ball.prev_striker for *_, ball in balls]
+    assert [table.teams.names[team] for team in table.batting_team] == ["A"] * 7 + ["B"] * 6
+    assert np.array_equal(table.dismissed >= 0, table.is_wicket)
+    
+    batting = {row["player"]: row for row in stats.batting_table(table)}
+    assert batting["A1"]["runs"] == 1 and batting["A2"]["outs"] == 1 and batting["A3"]["runs"] == 8
+    bowling = {row["player"]: row for row in stats.bowling_table(table)}
+    assert (bowling["B1"]["runs"], bowling["B1"]["wickets"], bowling["B1"]["balls"]) == (14, 1, 6)
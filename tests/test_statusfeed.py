@@ -0,0 +1,75 @@
+import gzip
+import json
+import threading
+import time
+from flask import Flask, request
+from statusfeed import StatusFeed, held_version, status_response
+
+app = Flask(__name__)
+
+def status(version, padding=0):
+    return {"version": version, "score": "120/3", "commentary": "x" * padding}
+
+def respond(snapshot, **headers):
+    with app.test_request_context("/api/match/status", headers=headers):
+        return status_response(snapshot, request)
+
+def test_current_etag_gets_a_304():
+    feed = StatusFeed()
+    snapshot = feed.publish("m1", status(3))
+    
+    fresh = respond(snapshot)
+    assert fresh.status_code == 200 and json.loads(fresh.get_data()) == status(3)
+    assert fresh.headers["ETag"] == 'W/"m1.3"'
+    assert respond(snapshot, **{"If-None-Match": fresh.headers["ETag"]}).status_code == 304
+    assert respond(snapshot, **{"If-None-Match": '"m1.3"'}).status_code == 304
+    
+    # An older version, or the same version of another match, gets the body
+    assert respond(snapshot, **{"If-None-Match": 'W/"m1.2"'}).status_code == 200
+    assert respond(snapshot, **{"If-None-Match": 'W/"m2.3"'}).status_code == 200
+    newer = feed.publish("m1", status(4))
+    assert respond(newer, **{"If-None-Match": fresh.headers["ETag"]}).status_code == 200
+
+def test_gzipped_and_plain_bodies_share_an_etag():
+    snapshot = StatusFeed().publish("m1", status(3, padding=4096))
+    
+    zipped = respond(snapshot, **{"Accept-Encoding": "gzip"})
+    plain = respond(snapshot)
+    assert zipped.content_encoding == "gzip" and plain.content_encoding is None
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert zipped.headers["ETag"] == plain.headers["ETag"]
+
+def test_held_version_from_since_or_etag():
+    def held(path, **headers):
+        with app.test_request_context(path, headers=headers):
+            return held_version(request, "m1")
+    
+    assert held("/?since=7") == 7
+    assert held("/", **{"If-None-Match": 'W/"m1.5"'}) == 5
+    assert held("/?since=7", **{"If-None-Match": 'W/"m1.5"'}) == 7
+    assert held("/", **{"If-None-Match": 'W/"m2.5", "m1.x"'}) is None
+
+def test_long_poll_wakes_on_a_new_version():
+    feed = StatusFeed()
+    feed.publish("m1", status(3))
+    publisher = threading.Timer(0.2, lambda: (feed.publish("m1", status(3)), feed.publish("m1", status(4))))
+    
+    started = time.monotonic()
+    publisher.start()
+    snapshot = feed.wait("m1", 3, timeout=10)
+    publisher.join()
+    assert snapshot.version == 4
+    assert time.monotonic() - started < 5
+
+def test_long_poll_gives_up_or_ends():
+    feed = StatusFeed()
+    feed.publish("m1", status(3))
+    
+    started = time.monotonic()
+    assert feed.wait("m1", 3, timeout=0.1).version == 3
+    assert time.monotonic() - started >= 0.1
+    # A client that is behind gets the latest straight away
+    assert feed.wait("m1", 1, timeout=10).version == 3
+    
+    threading.Timer(0.1, feed.close, ("m1",)).start()
+    assert feed.wait("m1", 3, timeout=10) is None
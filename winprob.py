@@ -0,0 +1,273 @@
+"""Live win probability and projected score by Monte Carlo simulation.
+
+Each estimate plays the rest of the match out thousands of times at once with
+NumPy: every step samples one legal delivery (and any wide or no ball bowled
+before it) for every simulation still going, from per-phase outcome rates
+learned from the finished matches archived in data/. Simulated first innings go on to
+simulate a chase of each total, so both innings give a win probability.
+
+The web app runs estimate() in a worker process, so the simulations never hold
+up the scoring broadcast, and caches the latest estimate of each match by version.
+"""
+import threading
+import time
+import zlib
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+from analytics import PHASES, phase_bounds, phase_index
+from concurrency import run_blocking
+import metrics
+import stats
+
+# Outcomes of a legal delivery: runs scored off it, with a wicket last
+OUTCOME_RUNS = np.array([0, 1, 2, 3, 4, 6, 0], dtype=np.int16)
+WICKET = len(OUTCOME_RUNS) - 1
+# Outcome of a legal delivery by the runs scored off it (fives count as fours, more as sixes)
+RUNS_OUTCOME = np.array([0, 1, 2, 3, 4, 4, 5], dtype=np.int8)
+
+# Outcome rates for when the archive holds too few deliveries to go on, per phase
+DEFAULT_RATES = np.array([
+    [0.47, 0.27, 0.06, 0.005, 0.12, 0.03, 0.045],
+    [0.36, 0.40, 0.08, 0.005, 0.08, 0.03, 0.045],
+    [0.30, 0.33, 0.09, 0.005, 0.12, 0.07, 0.085],
+])
+# Wides and no balls per legal delivery; each is worth a run
+DEFAULT_EXTRA_RATE = 0.05
+# The default rates count as this many archived deliveries in each phase, so
+# a handful of saved matches nudges them rather than replacing them
+PRIOR_BALLS = 300
+
+# Simulations per estimate, run in batches until they are done or the time budget is spent
+SIMULATIONS = 5000
+BATCH = 1000
+TIME_BUDGET = 0.2
+# How long to wait for the worker process before giving up on an estimate
+ESTIMATE_TIMEOUT = 10
+# Seconds between looks at data/ for newly finished matches to learn from
+MODEL_REFRESH_INTERVAL = 30.0
+
+class OutcomeModel:
+    """Per-phase probabilities of each outcome of a legal delivery, and the rate of wides and no balls"""
+    
+    def __init__(self, rates: np.ndarray, extra_rate: float):
+        self.rates = rates / rates.sum(axis=1, keepdims=True)
+        self.cumulative = np.cumsum(self.rates, axis=1)
+        self.cumulative[:, -1] = 1.0
+        self.extra_rate = extra_rate
+    
+    @classmethod
+    def learn(cls, table: stats.BallTable) -> 'OutcomeModel':
+        """Rates from the archived deliveries, smoothed towards DEFAULT_RATES"""
+        legal = table.legal
+        outcome = np.where(table.is_wicket[legal], WICKET,
+                           RUNS_OUTCOME[np.clip(table.total_runs[legal], 0, len(RUNS_OUTCOME) - 1)])
+        counts = np.bincount(table.phase[legal].astype(np.int64) * len(OUTCOME_RUNS) + outcome,
+                             minlength=len(PHASES) * len(OUTCOME_RUNS)).reshape(len(PHASES), len(OUTCOME_RUNS))
+        rates = counts + PRIOR_BALLS * DEFAULT_RATES
+        legal_count = int(legal.sum())
+        extra_rate = ((len(table) - legal_count + PRIOR_BALLS * DEFAULT_EXTRA_RATE)
+                      / (legal_count + PRIOR_BALLS))
+        return cls(rates, extra_rate)
+
+# Per-process cache of the learned model: (data_dir, archive fingerprint, when it was checked, OutcomeModel)
+_model_cache: Optional[Tuple[str, Tuple, float, OutcomeModel]] = None
+
+def load_model(data_dir: str = "data") -> OutcomeModel:
+    """The outcome model of the archive, learned again only when its finished matches change.
+    
+    data/ is looked at no more than once every MODEL_REFRESH_INTERVAL seconds,
+    and the archive is only loaded (and let go again) to learn from.
+    """
+    global _model_cache
+    now = time.monotonic()
+    if _model_cache is not None and _model_cache[0] == data_dir and now - _model_cache[2] < MODEL_REFRESH_INTERVAL:
+        return _model_cache[3]
+    fingerprint = stats.archive_fingerprint(data_dir)
+    if _model_cache is not None and _model_cache[0] == data_dir and _model_cache[1] == fingerprint:
+        model = _model_cache[3]
+    else:
+        model = OutcomeModel.learn(stats.BallTable(data_dir))
+    _model_cache = (data_dir, fingerprint, now, model)
+    return model
+
+def simulate_innings(model: OutcomeModel, rng: np.random.Generator, runs, wickets: int, balls_bowled: int,
+                     total_overs: int, target=None, n: int = BATCH) -> np.ndarray:
+    """Final totals of n simulations of the rest of an innings.
+    
+    runs and target may be arrays with a value per simulation; an innings stops
+    at 10 wickets, at the end of its overs or once it reaches its target.
+    """
+    totals = np.zeros(n, dtype=np.int32) + runs
+    fallen = np.full(n, wickets, dtype=np.int8)
+    bounds = phase_bounds(total_overs)
+    for ball in range(balls_bowled, total_overs * 6):
+        active = fallen < 10
+        if target is not None:
+            active &= totals < target
+        if not active.any():
+            break
+        cumulative = model.cumulative[phase_index(ball // 6 + 1, bounds)]
+        outcome = np.searchsorted(cumulative, rng.random(n), side="right")
+        extras = rng.random(n) < model.extra_rate
+        totals += np.where(active, OUTCOME_RUNS[outcome] + extras, 0)
+        fallen += active & (outcome == WICKET)
+    return totals
+
+def simulation_inputs(match) -> Optional[Dict[str, Any]]:
+    """What estimate() needs of a match in progress, or None if there is nothing to estimate.
+    
+    Cheap enough to take on the match's writer thread after every command.
+    """
+    if match.is_finished or not match.batting_team or not match.bowling_team:
+        return None
+    return {
+        "match_id": match.id,
+        "version": match.version,
+        "innings": match.current_innings,
+        "batting_team": match.batting_team.name,
+        "bowling_team": match.bowling_team.name,
+        "runs": match.batting_team.runs,
+        "wickets": match.batting_team.wickets,
+        "balls_bowled": (match.current_over - 1) * 6 + match.current_ball if match.current_over else 0,
+        "total_overs": match.total_overs,
+        "target": match.bowling_team.runs + 1 if match.current_innings == 2 else None
+    }
+
+def estimate(data_dir: str, inputs: Dict[str, Any], simulations: int = SIMULATIONS,
+             time_budget: float = TIME_BUDGET) -> Dict[str, Any]:
+    """Entry point for worker processes: win probability and projected total of the innings in progress.
+    
+    The random numbers are seeded by match and version, so the same state always gives the same estimate.
+    """
+    model = load_model(data_dir)
+    # The time budget is for simulating; learning a new model doesn't eat into it
+    started = time.perf_counter()
+    rng = np.random.default_rng([zlib.crc32(inputs["match_id"].encode()), inputs["version"]])
+    total_overs = inputs["total_overs"]
+    target = inputs["target"]
+    totals, wins, ties = [], 0, 0
+    done = 0
+    while done < simulations:
+        # Always at least one batch, however tight the budget
+        if done and time.perf_counter() - started > time_budget:
+            break
+        n = min(BATCH, simulations - done)
+        innings = simulate_innings(model, rng, inputs["runs"], inputs["wickets"], inputs["balls_bowled"],
+                                   total_overs, target, n)
+        if target is None:
+            # Chase each simulated total; the batting side wins if the chase falls short
+            chase = simulate_innings(model, rng, 0, 0, 0, total_overs, innings + 1, n)
+            wins += int(np.count_nonzero(chase < innings))
+            ties += int(np.count_nonzero(chase == innings))
+        else:
+            wins += int(np.count_nonzero(innings >= target))
+            ties += int(np.count_nonzero(innings == target - 1))
+        totals.append(innings)
+        done += n
+    
+    totals = np.concatenate(totals)
+    batting = (wins + ties / 2) / done
+    return {
+        "match_id": inputs["match_id"],
+        "version": inputs["version"],
+        "innings": inputs["innings"],
+        "win_probability": {
+            inputs["batting_team"]: round(batting, 3),
+            inputs["bowling_team"]: round(1 - batting, 3)
+        },
+        "tie_probability": round(ties / done, 3),
+        "projected_score": {
+            "mean": round(float(totals.mean()), 1),
+            "low": int(np.percentile(totals, 10)),
+            "high": int(np.percentile(totals, 90))
+        },
+        "simulations": done,
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+
+class WinProbabilityWorker:
+    """Estimates live matches in a worker process, from a background thread.
+    
+    Scoring handlers only call request() after broadcasting. Just the newest
+    state of each match waits to be estimated, so a burst of balls costs one
+    estimate rather than one per ball, and the latest estimate of each match
+    is kept for clients that join later. publish is called with every estimate.
+    
+    Nothing is estimated until start(). new_pool makes the executor (one
+    worker process), again if its process dies.
+    """
+    
+    def __init__(self, new_pool: Callable[[], Executor], publish: Callable[[Dict[str, Any]], None],
+                 data_dir: str = "data"):
+        self._new_pool = new_pool
+        self._pool: Optional[Executor] = None
+        self._publish = publish
+        self._data_dir = data_dir
+        # match id -> simulation inputs of its newest state not yet estimated
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # match id -> its latest estimate
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="win-probability", daemon=True)
+    
+    def start(self):
+        """Start the worker process (learning the model while nothing waits for it) and the thread feeding it"""
+        self._pool = self._new_pool()
+        self._pool.submit(load_model, self._data_dir)
+        self._thread.start()
+    
+    def request(self, match):
+        """Queue an estimate of a match's current state; called on its writer thread"""
+        inputs = simulation_inputs(match)
+        with self._cond:
+            if inputs is None:
+                self._pending.pop(match.id, None)
+                return
+            latest = self._latest.get(match.id)
+            if latest and latest["version"] == inputs["version"]:
+                return
+            self._pending[match.id] = inputs
+            self._cond.notify()
+    
+    def latest(self, match_id: str) -> Optional[Dict[str, Any]]:
+        """The newest estimate of a match, if any"""
+        with self._cond:
+            return self._latest.get(match_id)
+    
+    def forget(self, match_id: str):
+        with self._cond:
+            self._pending.pop(match_id, None)
+            self._latest.pop(match_id, None)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                match_id = next(iter(self._pending))
+                inputs = self._pending.pop(match_id)
+            try:
+                future = self._pool.submit(estimate, self._data_dir, inputs)
+                result = run_blocking(future.result, ESTIMATE_TIMEOUT)
+            except BrokenProcessPool as e:
+                print(f"Win probability process died ({e}), starting a new one")
+                broken, self._pool = self._pool, self._new_pool()
+                broken.shutdown(wait=False, cancel_futures=True)
+                continue
+            except TimeoutError:
+                # Abandon it; a newer state of the match may be waiting already
+                future.cancel()
+                print(f"Win probability estimate for match {match_id} took longer than {ESTIMATE_TIMEOUT}s")
+                continue
+            except Exception as e:
+                print(f"Failed to estimate win probability for match {match_id}: {e}")
+                continue
+            metrics.WIN_PROBABILITY_SECONDS.observe(result["seconds"])
+            with self._cond:
+                latest = self._latest.get(match_id)
+                if latest and latest["version"] > result["version"]:
+                    continue
+                self._latest[match_id] = result
+            self._publish(result)
@@ -0,0 +1,71 @@
+"""Wire formats a Socket.IO client can ask for the match payloads to be sent in.
+
+Plain JSON is the default and goes out as a normal Socket.IO event. A client
+can instead ask (with ?format= and ?compression= on its connection) for
+MessagePack and/or zlib deflate, in which case match_update and match_delta
+carry a single binary attachment that static/wire.js decodes.
+"""
+import zlib
+from typing import Any, NamedTuple, Optional, Union
+
+import fastjson
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = ("json", "msgpack") if msgpack else ("json",)
+COMPRESSIONS = ("none", "deflate")
+
+# zlib level for deflated payloads; beyond 6 the status barely shrinks but takes longer
+DEFLATE_LEVEL = 6
+
+class WireFormat(NamedTuple):
+    format: str = "json"
+    compression: str = "none"
+    
+    @property
+    def name(self) -> str:
+        return self.format if self.compression == "none" else f"{self.format}+{self.compression}"
+    
+    @property
+    def is_binary(self) -> bool:
+        return self != DEFAULT
+
+DEFAULT = WireFormat()
+
+def negotiate(format: Optional[str], compression: Optional[str]) -> WireFormat:
+    """The closest supported wire format to what a client asked for (JSON and no compression by default)"""
+    return WireFormat(format if format in FORMATS else "json",
+                      compression if compression in COMPRESSIONS else "none")
+
+def variants():
+    """Every wire format this server can send"""
+    return [WireFormat(format, compression) for format in FORMATS for compression in COMPRESSIONS]
+
+def room(match_id: str, wire_format: WireFormat) -> str:
+    """Socket.IO room for clients of a match that use wire_format (the match id itself for plain JSON)"""
+    return match_id if not wire_format.is_binary else f"{match_id}#{wire_format.name}"
+
+def encode(payload: Any, wire_format: WireFormat) -> Union[Any, bytes]:
+    """payload as emitted to clients using wire_format: unchanged for plain JSON, bytes otherwise"""
+    if not wire_format.is_binary:
+        return payload
+    if wire_format.format == "msgpack":
+        data = msgpack.packb(payload)
+    else:
+        data = fastjson.dumps(payload)
+    if wire_format.compression == "deflate":
+        data = zlib.compress(data, DEFLATE_LEVEL)
+    return data
+
+def decode(data: Union[Any, bytes], wire_format: WireFormat) -> Any:
+    """Inverse of encode(), as the clients do it"""
+    if not wire_format.is_binary:
+        return data
+    if wire_format.compression == "deflate":
+        data = zlib.decompress(data)
+    if wire_format.format == "msgpack":
+        return msgpack.unpackb(data)
+    return fastjson.SocketIOJSON.loads(data)